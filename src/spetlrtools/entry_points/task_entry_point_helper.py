@@ -1,6 +1,4 @@
-from typing import List
-
-from spetlr.entry_points import TaskEntryPoint
+from typing import List, Union
 
 from spetlrtools.helpers import ModuleHelper
 
@@ -10,7 +8,8 @@ class TaskEntryPointHelper:
     def get_all_task_entry_points(
         packages: List[str],
         output_txt_file: str = None,
-        entry_point_objects: List[type] = None,
+        entry_point_objects: List[Union[type, str]] = None,
+        static: bool = False,
     ) -> dict:
         """
         Returns a dictionary of entry points for all `TaskEntryPoint` objects found
@@ -21,9 +20,15 @@ class TaskEntryPointHelper:
                 A list of package names to search for `TaskEntryPoint` objects.
             output_txt_file (str, optional) default = None:
                 The name of a text file to write the entry points to.
-            entry_point_objects (List[type], optional) default = None:
+            entry_point_objects (List[Union[type, str]], optional) default = None:
                 One or more objects to get entry points from. Use for custom base
-                classes that has a `task()` abstract class method.
+                classes that has a `task()` abstract class method. With `static`,
+                the names of the classes can be given instead.
+            static (bool, optional) default = False:
+                If True, the classes are found by reading the source files, without
+                importing the packages, see `ModuleHelper.find_classes_of_type`.
+                Then neither spetlr nor the dependencies of the packages need to be
+                installed.
 
         Returns:
             dict:
@@ -37,23 +42,25 @@ class TaskEntryPointHelper:
 
         entry_point_objs = {}
 
-        if entry_point_objects is not None:
-            for entry_point_object in entry_point_objects:
-                for package in packages:
-                    entry_point_objs.update(
-                        ModuleHelper.get_classes_of_type(
-                            package=package,
-                            obj=entry_point_object,
-                            main_classes=False,
-                            sub_classes=True,
-                        )
-                    )
-        else:
+        if entry_point_objects is None:
+            if static:
+                entry_point_objects = ["TaskEntryPoint"]
+            else:
+                from spetlr.entry_points import TaskEntryPoint
+
+                entry_point_objects = [TaskEntryPoint]
+
+        get_classes = (
+            ModuleHelper.find_classes_of_type
+            if static
+            else ModuleHelper.get_classes_of_type
+        )
+        for entry_point_object in entry_point_objects:
             for package in packages:
                 entry_point_objs.update(
-                    ModuleHelper.get_classes_of_type(
+                    get_classes(
                         package=package,
-                        obj=TaskEntryPoint,
+                        obj=entry_point_object,
                         main_classes=False,
                         sub_classes=True,
                     )
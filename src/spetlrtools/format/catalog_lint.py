@@ -0,0 +1,218 @@
+"""
+Linting of the column names and types of all tables of a catalog at once.
+
+The columns of all matching tables are read in one query of the information
+schema, instead of reading the schema of one table at a time. The checks run in
+the spark executors with mapInPandas, so thousands of tables are checked in
+parallel, and the violations can be appended to a delta table.
+"""
+
+import datetime
+import re
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+import pandas as pd
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame
+from pyspark.sql.types import (
+    ArrayType,
+    DataType,
+    MapType,
+    NullType,
+    StructField,
+    StructType,
+)
+from spetlr.spark import Spark
+
+from spetlrtools.format.naming import CAMEL_CASE, NamingConvention, validate_names
+
+LINT_RESULT_SCHEMA = (
+    "table_catalog string, table_schema string, table_name string, "
+    "path string, rule string, message string, suggestion string, "
+    "linted_at timestamp, run_id string"
+)
+
+
+@dataclass(frozen=True)
+class TypeRule:
+    """Columns whose name matches the column_pattern must not have a type that
+    matches the type_pattern, e.g. TypeRule("no float amounts", "float|double",
+    ".*[aA]mount"). The patterns must match in full, the type ignoring case."""
+
+    name: str
+    type_pattern: str
+    column_pattern: str = ".*"
+
+
+def _like(glob: str) -> str:
+    """A glob pattern, with * and ?, as a sql like pattern."""
+    return glob.replace("_", "\\_").replace("*", "%").replace("?", "_")
+
+
+def _split_top_level(text: str, sep: str) -> List[str]:
+    parts, depth, start = [], 0, 0
+    in_quotes = False
+    for i, char in enumerate(text):
+        if char == "`":
+            in_quotes = not in_quotes
+        elif in_quotes:
+            continue
+        elif char in "<(":
+            depth += 1
+        elif char in ">)":
+            depth -= 1
+        elif char == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _field(text: str) -> Tuple[str, str]:
+    """The name and type of a struct field like `a b`:int or a: int NOT NULL."""
+    text = text.strip()
+    if not text.startswith("`"):
+        name, _, rest = text.partition(":")
+        return name.strip(), rest.strip()
+
+    # `` is an escaped backquote within the name
+    end = text.index("`", 1)
+    while text[end + 1 : end + 2] == "`":
+        end = text.index("`", end + 2)
+    name, rest = text[1:end].replace("``", "`"), text[end + 1 :]
+    return name, rest.strip().lstrip(":").strip()
+
+
+def parse_type_names(type_string: str) -> DataType:
+    """
+    The nesting of a type string of the information schema, like
+    struct<a:int,b:array<struct<c:string>>>. Only the structs, arrays and maps are
+    parsed, which is all that the naming checks need; other types give NullType.
+    """
+    text = type_string.strip()
+    lower = text.lower()
+    if lower.startswith("struct<") and text.endswith(">"):
+        inner = text[len("struct<") : -1]
+        fields = []
+        for part in _split_top_level(inner, ","):
+            if not part.strip():
+                continue
+            name, rest = _field(part)
+            # drop trailing NOT NULL and COMMENT clauses
+            rest = _split_top_level(rest.strip(), " ")[0]
+            fields.append(StructField(name, parse_type_names(rest)))
+        return StructType(fields)
+    if lower.startswith("array<") and text.endswith(">"):
+        return ArrayType(parse_type_names(text[len("array<") : -1]))
+    if lower.startswith("map<") and text.endswith(">"):
+        key, value = _split_top_level(text[len("map<") : -1], ",")
+        return MapType(parse_type_names(key), parse_type_names(value))
+    return NullType()
+
+
+def _lint_columns(
+    convention: NamingConvention, type_rules: List[TypeRule], linted_at, run_id: str
+):
+    column_patterns = [re.compile(rule.column_pattern) for rule in type_rules]
+    type_patterns = [re.compile(rule.type_pattern, re.I) for rule in type_rules]
+
+    def lint(batches: Iterable[pd.DataFrame]) -> Iterable[pd.DataFrame]:
+        for batch in batches:
+            results = []
+            for row in batch.itertuples(index=False):
+                table = (row.table_catalog, row.table_schema, row.table_name)
+                schema = StructType(
+                    [StructField(row.column_name, parse_type_names(row.data_type))]
+                )
+                for v in validate_names(schema, convention).violations:
+                    message = f"{v.name} is not {v.convention}"
+                    results.append(
+                        (*table, v.path, v.convention, message, v.suggestion)
+                    )
+
+                for rule, columns, types in zip(
+                    type_rules, column_patterns, type_patterns
+                ):
+                    if columns.fullmatch(row.column_name) and types.fullmatch(
+                        row.data_type
+                    ):
+                        message = f"{row.column_name} must not be {row.data_type}"
+                        results.append(
+                            (*table, row.column_name, rule.name, message, None)
+                        )
+
+            yield pd.DataFrame(
+                [(*r, linted_at, run_id) for r in results],
+                columns=[
+                    "table_catalog",
+                    "table_schema",
+                    "table_name",
+                    "path",
+                    "rule",
+                    "message",
+                    "suggestion",
+                    "linted_at",
+                    "run_id",
+                ],
+            )
+
+    return lint
+
+
+def lint_catalog(
+    catalog_pattern: str = "*",
+    schema_pattern: str = "*",
+    table_pattern: str = "*",
+    convention: NamingConvention = CAMEL_CASE,
+    type_rules: List[TypeRule] = None,
+    result_table: str = None,
+    columns_table: str = "system.information_schema.columns",
+    type_column: str = "full_data_type",
+) -> DataFrame:
+    """
+    Check the names of all columns, and of their nested fields, in the matching
+    tables against the naming convention, and their types against the type rules.
+
+    :param catalog_pattern: The catalogs to lint, a glob pattern like "dev_*"
+    :param schema_pattern: The schemas to lint, a glob pattern
+    :param table_pattern: The tables to lint, a glob pattern
+    :param convention: The naming convention, see spetlrtools.format.naming
+    :param type_rules: Optional, the types that columns must not have
+    :param result_table: Optional, a delta table that the violations are appended to
+    :param columns_table: The information schema columns view. On the hive
+        metastore, use a view with the same columns.
+    :param type_column: The column with the full type of the column
+    :return: A dataframe of the violations, one row per path and rule, with the
+        time and a unique id of the run
+    """
+    columns = (
+        Spark.get()
+        .table(columns_table)
+        .where(f.col("table_catalog").like(_like(catalog_pattern)))
+        .where(f.col("table_schema").like(_like(schema_pattern)))
+        .where(f.col("table_name").like(_like(table_pattern)))
+        .where(f.col("table_schema") != "information_schema")
+        .select(
+            "table_catalog",
+            "table_schema",
+            "table_name",
+            "column_name",
+            f.col(type_column).alias("data_type"),
+        )
+    )
+
+    # an aware timestamp is stored as the same instant whatever the session time
+    # zone, and the run id finds the rows of this run in the result table
+    linted_at = datetime.datetime.now(datetime.timezone.utc)
+    run_id = uuid.uuid4().hex
+    result = columns.mapInPandas(
+        _lint_columns(convention, list(type_rules or []), linted_at, run_id),
+        LINT_RESULT_SCHEMA,
+    )
+
+    if result_table:
+        result.write.format("delta").mode("append").saveAsTable(result_table)
+        result = Spark.get().table(result_table).where(f.col("run_id") == run_id)
+    return result
@@ -0,0 +1,160 @@
+"""
+Validation of column names against naming conventions, at any depth of nesting.
+
+The fields of structs are checked with their path, e.g. "items[].unitPrice" for a
+field in the structs of an array, or "tags{value}.name" for the values of a map,
+like in the schema comparison of DataframeTestCase. Each violation comes with a
+suggested name, where the convention can make one.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Union
+
+from pyspark.sql import DataFrame
+from pyspark.sql.types import ArrayType, DataType, MapType, StructType
+
+# words of a name in any convention, e.g. "HTTPServer_id2" gives HTTP, Server, id, 2
+_WORDS = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def split_words(name: str) -> List[str]:
+    """The words of a name, split at case changes, digits and other characters."""
+    return _WORDS.findall(name)
+
+
+def _camel(name: str) -> str:
+    words = split_words(name)
+    return "".join(w.lower() if i == 0 else w.capitalize() for i, w in enumerate(words))
+
+
+def _pascal(name: str) -> str:
+    return "".join(w.capitalize() for w in split_words(name))
+
+
+def _snake(name: str) -> str:
+    return "_".join(w.lower() for w in split_words(name))
+
+
+@dataclass(frozen=True)
+class NamingConvention:
+    """A regex that names must match in full, and optionally a function
+    that suggests a valid name for an invalid one."""
+
+    name: str
+    pattern: re.Pattern
+    suggest: Optional[Callable[[str], str]] = None
+
+    @classmethod
+    def from_regex(cls, name: str, regex: str, suggest=None) -> "NamingConvention":
+        return cls(name, re.compile(regex), suggest)
+
+    def matches(self, name: str) -> bool:
+        return self.pattern.fullmatch(name) is not None
+
+    def suggestion(self, name: str) -> Optional[str]:
+        if self.suggest is None:
+            return None
+        suggested = self.suggest(name)
+        return suggested if suggested and self.matches(suggested) else None
+
+
+# no two upper case letters in a row
+CAMEL_CASE = NamingConvention.from_regex(
+    "camelCase", r"[a-z][a-z0-9]*(?:[A-Z](?![A-Z])[a-z0-9]*)*", _camel
+)
+PASCAL_CASE = NamingConvention.from_regex(
+    "PascalCase", r"(?:[A-Z](?![A-Z])[a-z0-9]*)+", _pascal
+)
+SNAKE_CASE = NamingConvention.from_regex(
+    "snake_case", r"[a-z][a-z0-9]*(?:_[a-z0-9]+)*", _snake
+)
+
+
+@dataclass
+class NamingViolation:
+    path: str
+    name: str
+    convention: str
+    suggestion: Optional[str] = None
+
+
+@dataclass
+class NamingReport:
+    """The names that do not follow the convention, out of the checked ones."""
+
+    checked: int = 0
+    violations: List[NamingViolation] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not self.violations
+
+    def format(self) -> str:
+        if self.passed:
+            return f"All {self.checked} checked names follow the convention."
+        lines = [
+            f"{len(self.violations)} of {self.checked} names break the convention:"
+        ]
+        for v in self.violations:
+            hint = f", suggested {v.suggestion}" if v.suggestion else ""
+            lines.append(f"    {v.path}: not {v.convention}{hint}")
+        return "\n".join(lines)
+
+
+def validate_names(
+    schema: Union[StructType, DataFrame],
+    convention: NamingConvention = CAMEL_CASE,
+    cols_to_check: Iterable[str] = None,
+    nested: bool = True,
+) -> NamingReport:
+    """
+    Check the names of the columns, and with nested also the names of the fields of
+    structs in the columns, against the naming convention.
+
+    :param schema: A schema, or a dataframe whose schema is checked
+    :param convention: The naming convention, e.g. CAMEL_CASE, SNAKE_CASE,
+        PASCAL_CASE or one made with NamingConvention.from_regex
+    :param cols_to_check: Optional, a subset of the top level columns to check
+    :param nested: If True, also check the fields of nested structs
+    :return: A NamingReport of the violations
+    """
+    if isinstance(schema, DataFrame):
+        schema = schema.schema
+
+    fields = schema.fields
+    if cols_to_check is not None:
+        cols_to_check = list(cols_to_check)
+        missing = set(cols_to_check) - set(schema.fieldNames())
+        if missing:
+            raise ValueError(f"The columns {sorted(missing)} are not in the schema.")
+        fields = [f for f in fields if f.name in cols_to_check]
+
+    report = NamingReport()
+
+    def check(path: str, name: str):
+        report.checked += 1
+        if not convention.matches(name):
+            report.violations.append(
+                NamingViolation(
+                    path, name, convention.name, convention.suggestion(name)
+                )
+            )
+
+    def walk(path: str, data_type: DataType):
+        if isinstance(data_type, StructType):
+            for f in data_type.fields:
+                field_path = f"{path}.{f.name}"
+                check(field_path, f.name)
+                walk(field_path, f.dataType)
+        elif isinstance(data_type, ArrayType):
+            walk(f"{path}[]", data_type.elementType)
+        elif isinstance(data_type, MapType):
+            walk(f"{path}{{value}}", data_type.valueType)
+
+    for f in fields:
+        check(f.name, f.name)
+        if nested:
+            walk(f.name, f.dataType)
+
+    return report
@@ -1,8 +1,9 @@
-import re
 from typing import List
 
 from pyspark.sql import DataFrame
 
+from spetlrtools.format.naming import CAMEL_CASE
+
 
 def validate_camelcased_cols(
     df: DataFrame, cols_to_check: List[str] = None, print_result: bool = False
@@ -14,6 +15,11 @@ def validate_camelcased_cols(
     :param cols_to_check: Optional, a subset of the columns in the dataframe to check.
     :param print_result: If True, then the cols which are not camelCased are printed
     :return: True if all columns are camelcased
+
+    The whole name must be camelCased, with the same rule as
+    spetlrtools.format.naming.CAMEL_CASE, so e.g. "abc_def" is not camelCased.
+    See spetlrtools.format.naming.validate_names for nested fields, other naming
+    conventions and suggested names.
     """
 
     if cols_to_check is None:
@@ -25,9 +31,7 @@ def validate_camelcased_cols(
     results_col = []
     check_passed = True
     for col in cols_to_check:
-        is_camel_cased = bool(re.match("[a-z]+([A-Z][a-zA-Z]*)?", col))
-        has_two_upper = bool(re.match(".*[A-Z][A-Z]", col))
-        if not is_camel_cased or has_two_upper:
+        if not CAMEL_CASE.matches(col):
             check_passed = False
             results_col.append(col)
 
@@ -1,30 +1,129 @@
 import json
+import warnings
+from typing import Dict, Union
 
 import pyspark.sql.functions as f
-import pyspark.sql.types as t
+from pyspark.sql import Column, Observation
 from pyspark.sql.dataframe import DataFrame
 from pyspark.sql.types import StructType
-from spetlr.spark import Spark
+
+from spetlrtools.helpers.body_decoders import BodyDecoder, Utf8Decoder
+from spetlrtools.helpers.json_parsing import (
+    CORRUPT_RECORD,
+    parse_json,
+    parse_json_column,
+)
+from spetlrtools.helpers.json_sampling import LimitSampling, Sampling
+from spetlrtools.helpers.schema_merge import merge_schemas
+from spetlrtools.helpers.SchemaRegistry import SchemaRegistry
 
 
 class ExtractEncodedBody:
+    DEFAULT_SAMPLE_ROWS = 1000
+
     def __init__(
         self,
         json_field: str = "Body",
         new_column_w_extracted_body: str = None,
         data_limit: int = None,
+        schema_registry: SchemaRegistry = None,
+        registry_key: str = None,
+        merge_new_fields: bool = True,
+        sampling: Sampling = None,
+        body_decoder: BodyDecoder = None,
     ):
+        """
+        With a schema_registry, the schema is inferred once and stored under the
+        registry_key, e.g. the eventhub topic, which defaults to the json_field.
+        Later calls of transform_df reuse the stored schema, also on streaming
+        dataframes. With merge_new_fields, the sampled rows of batch dataframes,
+        or the first DEFAULT_SAMPLE_ROWS rows without a sampling, are checked for
+        rows that do not parse against the stored schema or have new top level
+        fields, and the schema is inferred from those rows only and merged into the
+        stored one. New fields within nested structs are not detected.
+
+        The schema is inferred from the rows chosen by the sampling strategy, see
+        json_sampling. A data_limit alone takes the first rows. The sampling also
+        limits the check for new fields: a field that only appears in rows outside
+        the sample is not merged, and rows that do not parse without it end up as
+        corrupt records. Choose a sampling that spreads over all the data, e.g.
+        PartitionSampling, or one that covers the newest rows, e.g.
+        TimeWindowSampling.
+
+        The body_decoder turns the body into json text, e.g. decompressing it,
+        see body_decoders. By default, the body is utf-8 encoded json.
+        """
         self.json_field = json_field
         self.new_field_w_extracted_body = new_column_w_extracted_body or json_field
-        self._data_limit = data_limit
+        self._sampling = sampling or (LimitSampling(data_limit) if data_limit else None)
         self._fields_same_name = self.json_field == self.new_field_w_extracted_body
+        self._registry = schema_registry
+        self._registry_key = registry_key or json_field
+        self._merge_new_fields = merge_new_fields
+        self._decoder = body_decoder or Utf8Decoder()
 
     def extract_schema(self, df: DataFrame) -> StructType:
         assert self.json_field in df.columns, "The body column is not in the dataframe"
 
-        json_data = self._extract_using_rdd(df)
+        return self._infer(self._json_strings(df))
 
-        return Spark.get().read.json(json_data).schema
+    @staticmethod
+    def _infer(strings: DataFrame) -> StructType:
+        """The schema of the json strings in the value column, inferred with
+        spark.read.json on a Dataset[String], so that the bodies never pass
+        through python workers."""
+        spark = strings.sparkSession
+        jvm = getattr(spark, "_jvm", None)
+        if jvm is None:
+            raise ValueError(
+                "The JVM is not accessible, e.g. with spark connect. "
+                "Use ExtractEncodedBodyUC instead."
+            )
+
+        # Dataset.as is a python keyword
+        strings = getattr(strings._jdf, "as")(
+            jvm.org.apache.spark.sql.Encoders.STRING()
+        )
+        inferred = spark._jsparkSession.read().json(strings).schema().json()
+        return StructType.fromJson(json.loads(inferred))
+
+    def _registered_schema(self, df: DataFrame) -> StructType:
+        """The schema from the registry, inferring and storing it if needed."""
+        schema = self._registry.get(self._registry_key)
+        if schema is None:
+            if df.isStreaming:
+                raise ValueError(
+                    f"No schema is registered under {self._registry_key}. "
+                    f"Transform a batch of the data first to infer it."
+                )
+            schema = self.extract_schema(df)
+            self._registry.put(self._registry_key, schema)
+            return schema
+
+        if not self._merge_new_fields or df.isStreaming:
+            return schema
+
+        sampling = self._sampling or LimitSampling(self.DEFAULT_SAMPLE_ROWS)
+        misfits = sampling.apply(df).where(self._misfits(schema))
+        new_schema = merge_schemas(
+            [schema, self._infer(self._json_strings(misfits, sample=False))]
+        )
+        if new_schema != schema:
+            warnings.warn(
+                f"Merging new fields into the schema of {self._registry_key}."
+            )
+            self._registry.put(self._registry_key, new_schema)
+        return new_schema
+
+    def _misfits(self, schema: StructType) -> Column:
+        """Rows that do not parse against the schema, or have unknown top level fields."""
+        body = self._decoder.decode(f.col(self.json_field))
+        parsed = parse_json(body, schema)
+        names = schema.fieldNames()
+        unknown_keys = f.exists(f.json_object_keys(body), lambda k: ~k.isin(names))
+        return parsed[CORRUPT_RECORD].isNotNull() | f.coalesce(
+            unknown_keys, f.lit(False)
+        )
 
     def extract_schema_as_json(self, df: DataFrame, pretty_json: bool = False) -> str:
         schema = self.extract_schema(df)
@@ -34,37 +133,47 @@ class ExtractEncodedBody:
 
         return json.dumps(json_schema_raw, indent=4 if pretty_json else None)
 
-    def _extract_using_rdd(self, df: DataFrame):
-        # extract json data rows using name of json_field
-        json_data = df.withColumn(
-            self.json_field, f.col(self.json_field).cast(t.StringType())
-        )
-
-        # Limiting the data used for extracting schema
-        if self._data_limit:
-            json_data = json_data.limit(self._data_limit)
-
-        # extract json data rows using name of json_field
-        json_data = json_data.rdd.map(lambda row: row.asDict()[self.json_field])
-
-        return json_data
+    def _json_strings(self, df: DataFrame, sample: bool = True) -> DataFrame:
+        """The sampled body column as strings."""
+        if sample and self._sampling:
+            df = self._sampling.apply(df)
+        return df.select(
+            self._decoder.decode(f.col(self.json_field)).alias("value")
+        ).where(f.col("value").isNotNull())
 
     def transform_df(
-        self, df: DataFrame, keep_original_body: bool = False
+        self,
+        df: DataFrame,
+        keep_original_body: bool = False,
+        corrupt_record_column: str = None,
+        metrics: Union[Observation, str] = None,
     ) -> DataFrame:
+        """
+        Bodies that fail to parse, because they are malformed or do not fit the
+        schema, give null. Their text is kept in the corrupt_record_column, if
+        given. With metrics, the counts of rows, parsed rows, failed rows and body
+        bytes are observed in the same pass, see json_parsing.parse_json_column.
+        """
         if self._fields_same_name and keep_original_body:
             raise ValueError(
                 f"The field {self.json_field} is overwritten by the extracted json. Give extracted field new name to "
                 f"keep original body."
             )
 
-        # Step 1: extract the schema
-        schema = self.extract_schema(df)
+        # Step 1: extract the schema, or take it from the registry
+        if self._registry is None:
+            schema = self.extract_schema(df)
+        else:
+            schema = self._registered_schema(df)
 
         # Step 2: decode the body column
-        df_transformed = df.withColumn(
+        df_transformed = parse_json_column(
+            df,
+            self._decoder.decode(f.col(self.json_field)),
+            schema,
             self.new_field_w_extracted_body,
-            f.from_json(f.decode(self.json_field, "utf-8"), schema),
+            corrupt_record_column=corrupt_record_column,
+            metrics=metrics,
         )
 
         # Step 3: Drop the original column
@@ -72,3 +181,88 @@ class ExtractEncodedBody:
             df_transformed = df_transformed.drop(self.json_field)
 
         return df_transformed
+
+    def extract_schemas_by_type(
+        self, df: DataFrame, type_path: str = "$.type"
+    ) -> Dict[str, StructType]:
+        """
+        Infer one schema per message type, where the type is the value at the json
+        path type_path of each body. All types are inferred in one pass, by
+        wrapping each body as {"<type>": <body>} and inferring the wrapped bodies.
+        Bodies without a type are left out.
+        """
+        assert self.json_field in df.columns, "The body column is not in the dataframe"
+
+        strings = (
+            self._json_strings(df)
+            .select(f.get_json_object("value", type_path).alias("type"), "value")
+            .where(f.col("type").isNotNull())
+        )
+        # to_json escapes the type as a json string, between the brackets
+        quoted_type = f.to_json(f.array("type"))
+        quoted_type = quoted_type.substr(f.lit(2), f.length(quoted_type) - 2)
+        wrapped = strings.select(
+            f.concat(
+                f.lit("{"), quoted_type, f.lit(":"), f.col("value"), f.lit("}")
+            ).alias("value")
+        )
+        return {field.name: field.dataType for field in self._infer(wrapped).fields}
+
+    def transform_df_by_type(
+        self,
+        df: DataFrame,
+        type_path: str = "$.type",
+        separate: bool = False,
+        schemas: Dict[str, StructType] = None,
+        keep_original_body: bool = False,
+    ) -> Union[DataFrame, Dict[str, DataFrame]]:
+        """
+        Parse bodies of several message types, each against the schema of its type.
+
+        With separate, a dict of one dataframe per type is returned. Otherwise, the
+        extracted column is a struct with one field per type, where only the field
+        of the type of the row is parsed and set. Types that are not in the schemas,
+        e.g. because they were not in the sample, are not parsed.
+
+        The schemas are inferred with extract_schemas_by_type, unless given.
+        """
+        if self._fields_same_name and keep_original_body:
+            raise ValueError(
+                f"The field {self.json_field} is overwritten by the extracted json. Give extracted field new name to "
+                f"keep original body."
+            )
+
+        if schemas is None:
+            schemas = self.extract_schemas_by_type(df, type_path)
+
+        body = self._decoder.decode(f.col(self.json_field))
+        message_type = f.get_json_object(body, type_path)
+
+        def finish(df_transformed: DataFrame) -> DataFrame:
+            if (not keep_original_body) and (not self._fields_same_name):
+                df_transformed = df_transformed.drop(self.json_field)
+            return df_transformed
+
+        if separate:
+            return {
+                name: finish(
+                    df.where(message_type == name).withColumn(
+                        self.new_field_w_extracted_body, f.from_json(body, schema)
+                    )
+                )
+                for name, schema in schemas.items()
+            }
+
+        return finish(
+            df.withColumn(
+                self.new_field_w_extracted_body,
+                f.struct(
+                    *[
+                        f.when(message_type == name, f.from_json(body, schema)).alias(
+                            name
+                        )
+                        for name, schema in schemas.items()
+                    ]
+                ),
+            )
+        )
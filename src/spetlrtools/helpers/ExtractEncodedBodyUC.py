@@ -1,10 +1,16 @@
 import json
+from typing import Optional, Union
 
 import pyspark.sql.functions as f
 import pyspark.sql.types as t
+from pyspark.sql import Observation
 from pyspark.sql.dataframe import DataFrame
 from pyspark.sql.types import StructType
 
+from spetlrtools.helpers.body_decoders import BodyDecoder, Utf8Decoder
+from spetlrtools.helpers.json_parsing import parse_json_column
+from spetlrtools.helpers.json_sampling import LimitSampling, Sampling
+
 
 class ExtractEncodedBodyUC:
     """
@@ -14,19 +20,32 @@ class ExtractEncodedBodyUC:
     Attributes:
         json_field (str): Name of the column containing JSON strings to be parsed.
         new_field_w_extracted_body (str): Name of the column to store parsed JSON as a StructType.
-        _data_limit (int or None): Maximum number of rows to sample when inferring JSON schema.
+        _sampling (Sampling or None): Strategy to sample rows when inferring JSON schema.
+            A data_limit alone takes the first rows. Without either, the first
+            DEFAULT_SAMPLE_ROWS rows are used.
+        _decoder (BodyDecoder): Turns the body into JSON text, by default as utf-8.
+
+    The schema is inferred once per instance and reused by later calls.
     """
 
+    DEFAULT_SAMPLE_ROWS = 1000
+    # the sample is embedded in the query plan, which is limited in size
+    MAX_SAMPLE_BYTES = 256 * 1024
+
     def __init__(
         self,
         json_field: str = "Body",
         new_column_w_extracted_body: str = None,
         data_limit: int = None,
+        sampling: Sampling = None,
+        body_decoder: BodyDecoder = None,
     ):
         self.json_field = json_field
         self.new_field_w_extracted_body = new_column_w_extracted_body or json_field
-        self._data_limit = data_limit
+        self._sampling = sampling or (LimitSampling(data_limit) if data_limit else None)
         self._fields_have_same_name = self.json_field == self.new_field_w_extracted_body
+        self._body_schema: Optional[StructType] = None
+        self._decoder = body_decoder or Utf8Decoder()
 
     def extract_schema(self, df: DataFrame) -> StructType:
         """
@@ -43,9 +62,67 @@ class ExtractEncodedBodyUC:
         """
         assert self.json_field in df.columns, "The body column is not in the dataframe"
 
-        total_schema = self.transform_df(df).schema
+        return StructType(
+            [
+                t.StructField(
+                    self.new_field_w_extracted_body, self._infer_body_schema(df), True
+                )
+            ]
+        )
 
-        return StructType([total_schema[self.new_field_w_extracted_body]])
+    def _infer_body_schema(self, df: DataFrame) -> StructType:
+        """
+        Infer the schema of the JSON bodies of a bounded sample, and cache it.
+
+        The sampled bodies are collected and joined into one JSON array, up to
+        MAX_SAMPLE_BYTES, as the array is embedded in the query plan. Bodies that
+        are not JSON objects are left out of the sample. schema_of_json of that
+        array merges the schemas of all bodies like spark.read.json would. It is
+        evaluated while analyzing a plan over no rows, so no further job runs.
+
+        Args:
+            df (DataFrame): Input DataFrame.
+
+        Returns:
+            StructType: Schema of the JSON bodies.
+        """
+        if self._body_schema is not None:
+            return self._body_schema
+
+        sampling = self._sampling or LimitSampling(self.DEFAULT_SAMPLE_ROWS)
+        # one malformed body would make the whole array invalid, so only the
+        # objects that parse are kept, as the json text that get_json_object
+        # writes of them
+        bodies = (
+            sampling.apply(df)
+            .select(
+                f.get_json_object(
+                    self._decoder.decode(f.col(self.json_field)), "$"
+                ).alias("body")
+            )
+            .where(f.col("body").startswith("{"))
+        )
+        kept, size = [], 2
+        for row in bodies.collect():
+            size += len(row.body.encode("utf-8")) + 1
+            if kept and size > self.MAX_SAMPLE_BYTES:
+                break
+            kept.append(row.body)
+        sample = "[" + ",".join(kept) + "]"
+
+        array_type = (
+            df.sparkSession.range(0)
+            .select(f.from_json(f.lit(sample), f.schema_of_json(f.lit(sample))))
+            .schema.fields[0]
+            .dataType
+        )
+        self._body_schema = (
+            array_type.elementType
+            if isinstance(array_type, t.ArrayType)
+            and isinstance(array_type.elementType, StructType)
+            else StructType([])
+        )
+        return self._body_schema
 
     def extract_schema_as_json(self, df: DataFrame, pretty_json: bool = False) -> str:
         """
@@ -63,7 +140,11 @@ class ExtractEncodedBodyUC:
         return json.dumps(json_schema_raw, indent=4 if pretty_json else None)
 
     def transform_df(
-        self, df: DataFrame, keep_original_body: bool = False
+        self,
+        df: DataFrame,
+        keep_original_body: bool = False,
+        corrupt_record_column: str = None,
+        metrics: Union[Observation, str] = None,
     ) -> DataFrame:
         """
         Parse the JSON column into a StructType column.
@@ -72,6 +153,10 @@ class ExtractEncodedBodyUC:
             df (DataFrame): Input DataFrame.
             keep_original_body (bool): If True and names match, error is raised.
                 If False and names differ, drops original JSON column.
+            corrupt_record_column (str or None): Column for the text of the bodies
+                that fail to parse, which otherwise silently give null.
+            metrics (Observation, str or None): Observes the counts of rows, parsed
+                rows, failed rows and body bytes in the same pass.
 
         Returns:
             DataFrame: DataFrame with parsed JSON column.
@@ -84,29 +169,13 @@ class ExtractEncodedBodyUC:
                 f"The field {self.json_field} is overwritten by the extracted json. Give extracted field new name to keep original body."
             )
 
-        df_string = df.withColumn(
-            self.new_field_w_extracted_body, f.col(self.json_field).cast(t.StringType())
-        )
-
-        sample_jsons = df_string
-
-        if self._data_limit:
-            sample_jsons = sample_jsons.limit(self._data_limit)
-
-        sample_jsons = sample_jsons.select(self.new_field_w_extracted_body).agg(
-            f.first(self.new_field_w_extracted_body)
-        )
-
-        if self._data_limit:
-            sample_jsons = sample_jsons.limit(self._data_limit)
-
-        sample_jsons = sample_jsons.collect()[0][0]
-
-        df_parsed = df_string.withColumn(
+        df_parsed = parse_json_column(
+            df,
+            self._decoder.decode(f.col(self.json_field)),
+            self._infer_body_schema(df),
             self.new_field_w_extracted_body,
-            f.from_json(
-                f.col(self.new_field_w_extracted_body), f.schema_of_json(sample_jsons)
-            ),
+            corrupt_record_column=corrupt_record_column,
+            metrics=metrics,
         )
 
         if (not keep_original_body) and (not self._fields_have_same_name):
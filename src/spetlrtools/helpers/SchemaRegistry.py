@@ -0,0 +1,103 @@
+"""
+Registries of inferred json schemas, keyed by the source of the data,
+e.g. the eventhub topic.
+
+A schema is inferred once and stored, so that later jobs, and streaming jobs
+where inference is impossible, can parse the data without scanning it first.
+The schemas are stored either in a json file, which may be on dbfs through the
+/dbfs mount, or in a table with one row per update.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import warnings
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import pyspark.sql.functions as f
+from pyspark.sql.types import StructType
+from pyspark.sql.utils import AnalysisException
+from spetlr.spark import Spark
+
+
+class SchemaRegistry:
+    """Base class of the schema registries."""
+
+    def get(self, key: str) -> Optional[StructType]:
+        """The schema stored under the key, or None."""
+        raise NotImplementedError()
+
+    def put(self, key: str, schema: StructType) -> None:
+        """Store the schema under the key, replacing any earlier schema."""
+        raise NotImplementedError()
+
+
+class FileSchemaRegistry(SchemaRegistry):
+    """Schemas stored in a json file."""
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.path.is_file():
+            return {}
+        with open(self.path) as f:
+            content = json.load(f)
+        if content.get("version") != self.VERSION:
+            warnings.warn(f"Ignoring schema registry {self.path} of another version.")
+            return {}
+        return content.get("schemas", {})
+
+    def get(self, key: str) -> Optional[StructType]:
+        schema = self._load().get(key)
+        return None if schema is None else StructType.fromJson(schema)
+
+    def put(self, key: str, schema: StructType) -> None:
+        schemas = self._load()
+        schemas[key] = schema.jsonValue()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # replace the file in one step, so that readers never see half of it
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(version=self.VERSION, schemas=schemas), f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class TableSchemaRegistry(SchemaRegistry):
+    """Schemas stored in a table with the columns key, schema and updated.
+    Updates are appended, and the latest row of a key holds its schema,
+    so that the table does not need to support updates or merges."""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+    def get(self, key: str) -> Optional[StructType]:
+        try:
+            rows = (
+                Spark.get()
+                .table(self.table_name)
+                .where(f.col("key") == key)
+                .orderBy(f.col("updated").desc())
+                .limit(1)
+                .collect()
+            )
+        except AnalysisException:
+            # the table does not exist yet
+            return None
+        return StructType.fromJson(json.loads(rows[0]["schema"])) if rows else None
+
+    def put(self, key: str, schema: StructType) -> None:
+        (
+            Spark.get()
+            .createDataFrame(
+                [(key, schema.json(), datetime.datetime.now(datetime.timezone.utc))],
+                "key string, schema string, updated timestamp",
+            )
+            .write.mode("append")
+            .saveAsTable(self.table_name)
+        )
@@ -0,0 +1,104 @@
+"""
+Decoders that turn an encoded body column into json text, before the schema is
+inferred and the json is parsed by ExtractEncodedBody and ExtractEncodedBodyUC.
+
+Compressed bodies are decompressed in vectorized pandas udfs, which need pyarrow,
+see the decoders extra. Avro and protobuf bodies are decoded by the native spark
+functions, which need the spark-avro and spark-protobuf packages on the cluster,
+and are then written as json, so that the extractors work the same for all
+encodings.
+"""
+
+import gzip
+
+import pandas as pd
+import pyspark.sql.functions as f
+from pyspark.sql import Column
+from pyspark.sql.types import StringType
+
+
+class BodyDecoder:
+    """Base class of the body decoders."""
+
+    def decode(self, body: Column) -> Column:
+        """The json text of the encoded body."""
+        raise NotImplementedError()
+
+
+class Utf8Decoder(BodyDecoder):
+    """Bodies of utf-8 encoded json. This is the default."""
+
+    def decode(self, body: Column) -> Column:
+        return f.decode(body, "utf-8")
+
+
+class _DecompressingDecoder(BodyDecoder):
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+
+    def _decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decode(self, body: Column) -> Column:
+        decompress = self._decompress
+        encoding = self.encoding
+
+        @f.pandas_udf(StringType())
+        def decompressed(bodies: pd.Series) -> pd.Series:
+            return bodies.map(
+                lambda b: None if b is None else decompress(b).decode(encoding)
+            )
+
+        return decompressed(body)
+
+
+class GzipDecoder(_DecompressingDecoder):
+    """Bodies of gzip compressed json."""
+
+    def _decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdDecoder(_DecompressingDecoder):
+    """Bodies of zstd compressed json. Needs the zstandard package."""
+
+    def __init__(self, encoding: str = "utf-8"):
+        super().__init__(encoding)
+        # fail early, on the driver
+        import zstandard  # noqa: F401
+
+    def _decompress(self, data: bytes) -> bytes:
+        import zstandard
+
+        # frames without a content size need the streaming reader
+        return zstandard.ZstdDecompressor().stream_reader(data).read()
+
+
+class AvroDecoder(BodyDecoder):
+    """Avro encoded bodies, given the avro schema as json."""
+
+    def __init__(self, json_format_schema: str, options: dict = None):
+        self.json_format_schema = json_format_schema
+        self.options = options or {}
+
+    def decode(self, body: Column) -> Column:
+        from pyspark.sql.avro.functions import from_avro
+
+        return f.to_json(from_avro(body, self.json_format_schema, self.options))
+
+
+class ProtobufDecoder(BodyDecoder):
+    """Protobuf encoded bodies, given the message name and a descriptor file,
+    as made by protoc --descriptor_set_out."""
+
+    def __init__(self, message_name: str, desc_file_path: str, options: dict = None):
+        self.message_name = message_name
+        self.desc_file_path = desc_file_path
+        self.options = options or {}
+
+    def decode(self, body: Column) -> Column:
+        from pyspark.sql.protobuf.functions import from_protobuf
+
+        return f.to_json(
+            from_protobuf(body, self.message_name, self.desc_file_path, self.options)
+        )
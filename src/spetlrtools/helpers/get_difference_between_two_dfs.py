@@ -1,9 +1,33 @@
 import warnings
+from functools import reduce
 from itertools import chain
-from typing import List
+from typing import Any, Dict, List, Union
 
 import pyspark.sql.functions as f
-from pyspark.sql import DataFrame
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame
+from pyspark.sql.types import DataType
+
+_HASH_FUNCTIONS = {
+    "xxhash64": f.xxhash64,
+    "sha2": lambda c: f.sha2(c, 256),
+}
+
+
+def _serialized(cols: List[str]) -> Column:
+    """A null-safe serialization of the columns. Unlike concat_ws, null differs from
+    the empty string, and values cannot run into the neighbouring columns."""
+    return f.to_json(
+        f.struct(*[f.col(col).alias(str(i)) for i, col in enumerate(cols)]),
+        {"ignoreNullFields": "false"},
+    )
+
+
+def _comparable(col: Column, data_type: DataType) -> Column:
+    """Maps cannot be compared with =, but their json can."""
+    if "map<" in data_type.simpleString():
+        return f.to_json(col)
+    return col
 
 
 def get_difference_between_two_dfs(
@@ -12,29 +36,58 @@ def get_difference_between_two_dfs(
     join_cols: List[str],
     ignore_cols: List[str] = None,
     print_result: bool = False,
+    hash_function: str = "xxhash64",
+    partition_filter: Union[str, Column] = None,
+    salted: bool = False,
+    persist: bool = False,
 ) -> DataFrame:
     """
     This function compares two dataframe using hashing of the columns.
-    The function uses left join, which that all records from df1 are matched with records from df2.
+    The function uses a full outer join on the join columns, so that rows that are
+    only in df1 are reported as removed, rows that are only in df2 as added, and
+    rows whose other columns differ as changed. The rows are hashed over a null-safe
+    serialization of the compared columns, and which columns differ is computed in
+    the same pass.
 
     NB:
     The function only compares columns that appear in both tables.
+    The join columns must identify the rows of each dataframe uniquely. With
+    duplicate keys, the result depends on salted: without salting, every pair of
+    rows with the same key is compared, while with salting, rows with an equal
+    partner are left out before the remaining rows are paired.
 
     :param df1: A dataframe to compared with df2
     :param df2: A dataframe to compared with df1
     :param join_cols: A string list for the join column names
     :param ignore_cols: Columns to be ignored when comparing
     :param print_result: If true, the differences is printed
+    :param hash_function: "xxhash64" (fast) or "sha2" (256 bits, for very large tables)
+    :param partition_filter: A condition applied to both dataframes before comparing,
+            e.g. on a partition column, so that only the changed partitions are read
+    :param salted: If true, equal rows are first matched on the join columns and the
+            row hash, which spreads hot keys over all partitions. Only the remaining
+            rows are joined on the join columns alone. Use this for skewed join columns.
+            With unique join columns, the result is the same as without salting
+    :param persist: If true, the result is persisted, so that it is computed once
+            for all actions on it. When printing, the result is persisted while it
+            is counted and shown, so that it is not computed twice
 
     :return: A dataframe with the differences between df1 and df2
-            The column names are prefixed with df1_ or df_2 for easier comparison
+            The column names are prefixed with df1_ or df_2 for easier comparison.
+            The change_type column is "added", "removed" or "changed", and for
+            each compared column, a <col>_differs column tells if its values differ.
 
-    | join_col| df1_col1 | df2_col1 |
-    |---------|----------|----------|
-    | 1       | x        | y        |
-    |---------|----------|----------|
+    | join_col| change_type | df1_col1 | df2_col1 | col1_differs |
+    |---------|-------------|----------|----------|--------------|
+    | 1       | changed     | x        | y        | true         |
+    |---------|-------------|----------|----------|--------------|
 
     """
+    if hash_function not in _HASH_FUNCTIONS:
+        raise ValueError(
+            f"Unknown hash function {hash_function}, use one of {list(_HASH_FUNCTIONS)}"
+        )
+    row_hash = _HASH_FUNCTIONS[hash_function]
 
     # Lowering join and ignore columns
     join_cols = [col.lower() for col in join_cols]
@@ -45,62 +98,176 @@ def get_difference_between_two_dfs(
         ignore_cols = [col.lower() for col in ignore_cols]
 
     # Get columns without the ignored columns
-    df1_cols_without_ignores = set(
-        [col.lower() for col in df1.columns if col.lower() not in ignore_cols]
-    )
+    df1_cols_without_ignores = [
+        col.lower() for col in df1.columns if col.lower() not in ignore_cols
+    ]
 
-    df2_cols_without_ignores = set(
-        [col.lower() for col in df2.columns if col.lower() not in ignore_cols]
-    )
+    df2_cols_without_ignores = [
+        col.lower() for col in df2.columns if col.lower() not in ignore_cols
+    ]
 
-    if not df2_cols_without_ignores.issubset(df1_cols_without_ignores):
+    if not set(df2_cols_without_ignores).issubset(df1_cols_without_ignores):
         warnings.warn(
             "Some of the columns in df1 is not in df2. The tables will therefore always be different!\n"
             "Remember, this function only compares the columns that appear in both tables.\n"
             "Continuing..."
         )
 
-    if not df1_cols_without_ignores.issubset(df2_cols_without_ignores):
+    if not set(df1_cols_without_ignores).issubset(df2_cols_without_ignores):
         warnings.warn(
             "Some of the columns in df2 is not in df1. The tables will therefore always be different!\n"
             "Remember, this function only compares the columns that appear in both tables. \n"
             "Continuing..."
         )
 
-    # Select same columns that appear in both tables. Without the ignore_cols.
-    _cols = list(df1_cols_without_ignores & df2_cols_without_ignores)
+    # Select same columns that appear in both tables, in the order of df1.
+    # Without the ignore_cols.
+    _cols = [col for col in df1_cols_without_ignores if col in df2_cols_without_ignores]
+    compare_cols = [col for col in _cols if col not in join_cols]
+
+    # Generate hash columns, and mark the rows that exist on each side
+    def prepare(df: DataFrame) -> DataFrame:
+        return df.select(
+            *_cols,
+            row_hash(_serialized(compare_cols)).alias("row_hash"),
+            f.lit(True).alias("row_exists"),
+        )
+
+    if partition_filter is not None:
+        df1 = df1.filter(partition_filter)
+        df2 = df2.filter(partition_filter)
+
+    a = prepare(df1).alias("a")
+    b = prepare(df2).alias("b")
+    types = {field.name.lower(): field.dataType for field in a.schema.fields}
 
-    # Generate hash columns
-    df1_sub = df1.select(_cols).withColumn(
-        "row_sha2", f.sha2(f.concat_ws("||", *_cols), 256)
+    # Null-safe, so that rows with null keys are matched too
+    on = reduce(
+        lambda x, y: x & y,
+        [f.col(f"a.{col}").eqNullSafe(f.col(f"b.{col}")) for col in join_cols],
     )
-    df2_sub = df2.select(_cols).withColumn(
-        "row_sha2", f.sha2(f.concat_ws("||", *_cols), 256)
+
+    if salted:
+        # The row hash acts as a salt: all rows of a hot key no longer meet in one
+        # partition. Only the rows without an equal partner remain, which are few.
+        exact = a.join(
+            b, on & (f.col("a.row_hash") == f.col("b.row_hash")), "full_outer"
+        )
+        a = exact.filter(f.col("b.row_exists").isNull()).select("a.*").alias("a")
+        b = exact.filter(f.col("a.row_exists").isNull()).select("b.*").alias("b")
+
+    change_type = (
+        f.when(f.col("b.row_exists").isNull(), "removed")
+        .when(f.col("a.row_exists").isNull(), "added")
+        .when(f.col("a.row_hash") != f.col("b.row_hash"), "changed")
     )
 
     # Select the order as a.col1, b.col1, a.col2, b.col2.... this way it is easier to see differences.
     # Also prefixes df1_ and df2_
-
     order_list = [
-        [f.col(f"a.{col}").alias(f"df1_{col}"), f.col(f"b.{col}").alias(f"df2_{col}")]
-        for col in _cols
-        if col not in ignore_cols + join_cols
+        [
+            f.col(f"a.{col}").alias(f"df1_{col}"),
+            f.col(f"b.{col}").alias(f"df2_{col}"),
+            (
+                ~_comparable(f.col(f"a.{col}"), types[col]).eqNullSafe(
+                    _comparable(f.col(f"b.{col}"), types[col])
+                )
+            ).alias(f"{col}_differs"),
+        ]
+        for col in compare_cols
     ]
 
     order_list = list(chain.from_iterable(order_list))
 
     # Generating the differences
-    _join_cols_a = [f"a.{col}" for col in join_cols]
+    _join_cols = [f.coalesce(f"a.{col}", f"b.{col}").alias(col) for col in join_cols]
 
     df_res = (
-        df1_sub.alias("a")
-        .join(df2_sub.alias("b"), join_cols, "left")
-        .filter("a.row_sha2 != b.row_sha2")
-        .select(*_join_cols_a, *order_list)
+        a.join(b, on, "full_outer")
+        .select(*_join_cols, change_type.alias("change_type"), *order_list)
+        .filter(f.col("change_type").isNotNull())
     )
 
+    if persist or print_result:
+        df_res = df_res.persist(StorageLevel.MEMORY_AND_DISK)
+
     if print_result:
         print(f"The number of records with differences: {df_res.count()}")
         df_res.show()
+        if not persist:
+            df_res.unpersist()
 
     return df_res
+
+
+def get_difference_summary(
+    df1: DataFrame,
+    df2: DataFrame,
+    join_cols: List[str],
+    ignore_cols: List[str] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Summarize the differences between df1 and df2 per column instead of per row.
+    All counters are computed in a single aggregation over the differences, so the
+    comparison runs as one spark job, however wide the tables are.
+
+    The keyword arguments are passed on to get_difference_between_two_dfs.
+
+    :return: A dict like
+        {
+            "added": 1, "removed": 0, "changed": 2,
+            "columns": {
+                "col1": {
+                    "mismatches": 2,          # changed rows where col1 differs
+                    "null_count_change": -1,  # nulls in df2 minus nulls in df1
+                    "example_key": (1,),      # join columns of a mismatching row
+                },
+            },
+        }
+    """
+    diff = get_difference_between_two_dfs(df1, df2, join_cols, ignore_cols, **kwargs)
+    join_cols = [col.lower() for col in join_cols]
+    compare_cols = [
+        col[len("df1_") :] for col in diff.columns if col.startswith("df1_")
+    ]
+
+    change_type = f.col("change_type")
+    changed = change_type == "changed"
+    in_df1 = change_type != "added"
+    in_df2 = change_type != "removed"
+
+    counters = [
+        f.count(f.when(change_type == kind, True)).alias(kind)
+        for kind in ["added", "removed", "changed"]
+    ]
+    for i, col in enumerate(compare_cols):
+        differs = changed & f.col(f"{col}_differs")
+        counters += [
+            f.count(f.when(differs, True)).alias(f"mismatches_{i}"),
+            (
+                f.count(f.when(in_df2 & f.col(f"df2_{col}").isNull(), True))
+                - f.count(f.when(in_df1 & f.col(f"df1_{col}").isNull(), True))
+            ).alias(f"null_count_change_{i}"),
+            f.min(f.when(differs, f.struct(*join_cols))).alias(f"example_key_{i}"),
+        ]
+
+    totals = diff.agg(*counters).collect()[0]
+
+    return {
+        "added": totals["added"],
+        "removed": totals["removed"],
+        "changed": totals["changed"],
+        "columns": {
+            col: {
+                "mismatches": totals[f"mismatches_{i}"],
+                "null_count_change": totals[f"null_count_change_{i}"],
+                "example_key": (
+                    None
+                    if totals[f"example_key_{i}"] is None
+                    else tuple(totals[f"example_key_{i}"])
+                ),
+            }
+            for i, col in enumerate(compare_cols)
+        },
+    }
@@ -0,0 +1,87 @@
+"""
+Parsing of json bodies that keeps track of the bodies that fail to parse.
+
+from_json silently returns nulls for malformed bodies and for bodies that do not
+fit the schema. Here, the bodies are parsed with a corrupt record field, so that
+failed bodies can be kept in a column of their own, and counted with observe()
+in the same pass as the parsing.
+"""
+
+from typing import Union
+
+import pyspark.sql.functions as f
+from pyspark.sql import Column, DataFrame, Observation
+from pyspark.sql.types import StringType, StructField, StructType
+
+CORRUPT_RECORD = "_corrupt_record"
+
+_PARSED = "__spetlr_parsed"
+
+
+def with_corrupt_record(schema: StructType) -> StructType:
+    """The schema with a field that receives the bodies that fail to parse.
+    An inferred schema may have the field already, if the sample had malformed bodies.
+    """
+    fields = [field for field in schema.fields if field.name != CORRUPT_RECORD]
+    return StructType(fields + [StructField(CORRUPT_RECORD, StringType())])
+
+
+def parse_json(body: Column, schema: StructType) -> Column:
+    """Parse the body, putting the text of failed bodies in the corrupt record field."""
+    return f.from_json(
+        body,
+        with_corrupt_record(schema),
+        {"columnNameOfCorruptRecord": CORRUPT_RECORD},
+    )
+
+
+def parse_json_column(
+    df: DataFrame,
+    body: Column,
+    schema: StructType,
+    target: str,
+    corrupt_record_column: str = None,
+    metrics: Union[Observation, str] = None,
+) -> DataFrame:
+    """
+    Parse the json body into the target column. Bodies that fail to parse give
+    null, and their text is put in the corrupt_record_column, if given.
+    If the schema has a _corrupt_record field, e.g. one inferred from a sample
+    with malformed bodies, the target keeps the field, and failed bodies give a
+    struct with only that field set, like from_json did before.
+
+    With metrics, an Observation or, for streaming, a name for the query
+    listener, the number of rows, of parsed and of failed rows and the bytes of
+    the bodies are observed while the dataframe is computed.
+    """
+    df = df.withColumn(_PARSED, parse_json(body, schema))
+    parsed = f.col(_PARSED)
+    corrupt = parsed[CORRUPT_RECORD]
+
+    if metrics is not None:
+        df = df.observe(
+            metrics,
+            f.count(f.lit(1)).alias("rows"),
+            f.count(f.when(parsed.isNotNull() & corrupt.isNull(), True)).alias(
+                "rows_parsed"
+            ),
+            f.count(f.when(corrupt.isNotNull(), True)).alias("rows_failed"),
+            f.coalesce(f.sum(f.length(body.cast("binary"))), f.lit(0)).alias("bytes"),
+        )
+
+    if CORRUPT_RECORD in schema.fieldNames():
+        df = df.withColumn(target, parsed)
+    else:
+        df = df.withColumn(
+            target, f.when(corrupt.isNull(), parsed.dropFields(CORRUPT_RECORD))
+        )
+    if corrupt_record_column:
+        df = df.withColumn(corrupt_record_column, corrupt)
+    return df.drop(_PARSED)
+
+
+def split_corrupt_records(df: DataFrame, corrupt_record_column: str):
+    """Split a parsed dataframe into the parsed rows and the failed rows. The two
+    dataframes share their plan, so cache the input to parse only once."""
+    failed = f.col(corrupt_record_column).isNotNull()
+    return df.where(~failed).drop(corrupt_record_column), df.where(failed)
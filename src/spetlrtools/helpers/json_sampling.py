@@ -0,0 +1,92 @@
+"""
+Sampling strategies for inferring the schema of json bodies from a part of the data.
+
+limit() always reads the first partitions, so fields that only appear in later data
+are missed. The other strategies spread the sample over the whole dataframe.
+All of them run in spark, without a shuffle of the data.
+"""
+
+import datetime
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame
+
+# monotonically_increasing_id keeps the row number within the partition in the
+# lower 33 bits
+_ROW_IN_PARTITION_MASK = (1 << 33) - 1
+
+
+class Sampling:
+    """Base class of the sampling strategies."""
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        raise NotImplementedError()
+
+
+class LimitSampling(Sampling):
+    """The first n rows."""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        return df.limit(self.n)
+
+
+class FractionSampling(Sampling):
+    """A random fraction of the rows."""
+
+    def __init__(self, fraction: float, seed: int = None):
+        self.fraction = fraction
+        self.seed = seed
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        return df.sample(fraction=self.fraction, seed=self.seed)
+
+
+class PartitionSampling(Sampling):
+    """The first rows of every partition, so that each file or eventhub
+    partition contributes to the sample."""
+
+    def __init__(self, rows_per_partition: int):
+        self.rows_per_partition = rows_per_partition
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        row_in_partition = f.monotonically_increasing_id().bitwiseAND(
+            _ROW_IN_PARTITION_MASK
+        )
+        return df.where(row_in_partition < self.rows_per_partition)
+
+
+class ReservoirSampling(Sampling):
+    """n rows drawn uniformly from all rows. Each partition keeps only its n rows
+    with the smallest random numbers, like a reservoir, before they are merged."""
+
+    def __init__(self, n: int, seed: int = None):
+        self.n = n
+        self.seed = seed
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        return df.orderBy(f.rand(self.seed)).limit(self.n)
+
+
+class TimeWindowSampling(Sampling):
+    """The rows of a time window, by a timestamp column like the enqueued time
+    of eventhub data. The window ends now, unless an end is given."""
+
+    def __init__(
+        self,
+        time_column: str,
+        window: datetime.timedelta,
+        end: datetime.datetime = None,
+    ):
+        self.time_column = time_column
+        self.window = window
+        self.end = end
+
+    def apply(self, df: DataFrame) -> DataFrame:
+        end = self.end or datetime.datetime.now(datetime.timezone.utc)
+        return df.where(
+            (f.col(self.time_column) > f.lit(end - self.window))
+            & (f.col(self.time_column) <= f.lit(end))
+        )
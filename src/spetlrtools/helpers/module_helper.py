@@ -1,9 +1,92 @@
+import ast
 import importlib
 import pkgutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from inspect import getmembers, isclass
+from pathlib import Path
 from types import ModuleType
-from typing import Dict, Union
+from typing import Dict, List, Optional, Tuple, Union
+
+# below this many files, parsing in one process is faster than starting a pool
+_PARALLEL_FILES = 64
+
+
+def _top_level(body: List[ast.stmt]):
+    """The statements of a module body, including those in top level if and try
+    blocks, like conditional imports."""
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.Try)):
+            for block in [
+                node.body,
+                node.orelse,
+                *[h.body for h in getattr(node, "handlers", [])],
+                getattr(node, "finalbody", []),
+            ]:
+                yield from _top_level(block)
+
+
+def _scan_classes(path: str) -> Optional[List[Tuple[str, Optional[List[str]]]]]:
+    """
+    The classes defined at the top level of a source file, with the names of their
+    bases. The bases of a class are None if they cannot be named without running
+    the module, e.g. when they come from a function call, a variable or a star
+    import. None for a file that does not parse.
+    """
+    try:
+        tree = ast.parse(Path(path).read_bytes(), filename=path)
+    except SyntaxError:
+        return None
+
+    imported = {}
+    assigned = set()
+    star_import = False
+    statements = list(_top_level(tree.body))
+    for node in statements:
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name == "*":
+                    star_import = True
+                else:
+                    imported[alias.asname or alias.name] = alias.name
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            assigned.update(t.id for t in targets if isinstance(t, ast.Name))
+
+    def base_name(node: ast.expr) -> Optional[str]:
+        if isinstance(node, ast.Subscript):
+            # Generic[T] and the like
+            node = node.value
+        if isinstance(node, ast.Attribute):
+            return node.attr
+        if isinstance(node, ast.Name):
+            if node.id in imported:
+                return imported[node.id]
+            if node.id in assigned or star_import:
+                return None
+            return node.id
+        return None
+
+    classes = []
+    for node in statements:
+        if isinstance(node, ast.ClassDef):
+            bases = [base_name(base) for base in node.bases]
+            classes.append((node.name, None if None in bases else bases))
+    return classes
+
+
+def _find_source(name: str) -> Path:
+    """The package directory or module file of a module name, found on the
+    python path without importing anything."""
+    parts = name.split(".")
+    for entry in sys.path:
+        location = Path(entry or ".").joinpath(*parts)
+        if (location / "__init__.py").is_file():
+            return location
+        if location.with_suffix(".py").is_file():
+            return location.with_suffix(".py")
+    raise ModuleNotFoundError(f"No module named '{name}'")
 
 
 class ModuleHelper:
@@ -39,6 +122,45 @@ class ModuleHelper:
 
         return modules
 
+    @staticmethod
+    def get_module_files(location: Union[str, Path]) -> Dict[str, Path]:
+        """
+        Retrieves the source files of all modules below a location without
+        importing anything.
+
+        Args:
+            location (Union[str, Path]):
+                Either a package directory (containing an `__init__.py`), whose
+                modules are named from the package, or a directory on the python
+                path, like `src`, whose modules and packages are top level.
+
+        Returns:
+            Dict[str, Path]: A dictionary from module name to source file.
+        """
+        # absolute, since pkgutil caches its finders by the path string
+        location = Path(location).resolve()
+        files = {}
+
+        if (location / "__init__.py").exists():
+            files[location.name] = location / "__init__.py"
+            prefix = f"{location.name}."
+        else:
+            prefix = ""
+
+        for ModuleInfo in pkgutil.iter_modules([str(location)]):
+            module_name = f"{prefix}{ModuleInfo.name}"
+
+            if ModuleInfo.ispkg:
+                for name, path in ModuleHelper.get_module_files(
+                    location / ModuleInfo.name
+                ).items():
+                    files[f"{prefix}{name}"] = path
+
+            elif (location / f"{ModuleInfo.name}.py").exists():
+                files[module_name] = location / f"{ModuleInfo.name}.py"
+
+        return files
+
     @staticmethod
     def get_classes_of_type(
         package: Union[str, ModuleType],
@@ -89,3 +211,81 @@ class ModuleHelper:
                             }
 
         return objects
+
+    @staticmethod
+    def find_classes_of_type(
+        package: str,
+        obj: Union[type, str],
+        main_classes: bool = True,
+        sub_classes: bool = True,
+        workers: int = None,
+    ) -> Dict[str, dict]:
+        """
+        Finds the classes of a specified type in a package or module, like
+        get_classes_of_type, but by reading the source files instead of importing
+        them. Only the modules where a base class cannot be named from the source
+        are imported.
+
+        Unlike get_classes_of_type, only the classes defined in a module are
+        found, not those imported into it.
+
+        Args:
+            package (str):
+                The name of the package or module.
+            obj (Union[type, str]):
+                The type of classes to find, or its name.
+            main_classes (bool) default = True:
+                If the main classes of the type obj should be found.
+            sub_classes (bool) default = True:
+                If the sub classes of the type obj should be found.
+            workers (int, optional) default = None:
+                The number of processes that parse the source files. By default,
+                large packages are parsed by one process per cpu.
+
+        Returns:
+            Dict[str, dict]:
+                A dictionary containing all classes of the specified type, with
+                the module name, class name and source file of each.
+        """
+        obj_name = obj if isinstance(obj, str) else obj.__name__
+
+        location = _find_source(package)
+        if location.is_dir():
+            prefix = package.rpartition(".")[0]
+            files = {
+                f"{prefix}.{name}" if prefix else name: path
+                for name, path in ModuleHelper.get_module_files(location).items()
+                if path.name != "__init__.py"
+            }
+        else:
+            files = {package: location}
+
+        paths = [str(path) for path in files.values()]
+        if workers == 1 or (workers is None and len(paths) < _PARALLEL_FILES):
+            scans = [_scan_classes(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                scans = list(pool.map(_scan_classes, paths, chunksize=16))
+
+        objects = {}
+        for (module_name, path), classes in zip(files.items(), scans):
+            if classes is None or any(bases is None for _, bases in classes):
+                # fall back to the classes of the imported module
+                module = importlib.import_module(module_name)
+                classes = [
+                    (cls_name, [base.__name__ for base in cls.__bases__])
+                    for cls_name, cls in getmembers(module, isclass)
+                    if cls.__module__ == module_name
+                ]
+
+            for cls_name, bases in classes:
+                if (main_classes and cls_name == obj_name) or (
+                    sub_classes and obj_name in bases
+                ):
+                    objects[f"{module_name}.{cls_name}"] = {
+                        "module_name": module_name,
+                        "cls_name": cls_name,
+                        "path": path,
+                    }
+
+        return objects
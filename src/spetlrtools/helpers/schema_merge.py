@@ -0,0 +1,41 @@
+"""
+Merging of inferred json schemas.
+
+A field that is only in one of the schemas is kept, nested structs are merged
+field by field, also inside arrays and map values. Where the types conflict,
+the type of the first schema wins, so that a schema that is already in use does
+not change under its readers.
+"""
+
+from functools import reduce
+from typing import Iterable
+
+from pyspark.sql.types import ArrayType, DataType, MapType, StructField, StructType
+
+
+def merge_types(type1: DataType, type2: DataType) -> DataType:
+    """The merge of two data types, preferring the first on conflicts."""
+    if isinstance(type1, StructType) and isinstance(type2, StructType):
+        fields2 = {f.name: f for f in type2.fields}
+        merged = []
+        for f in type1.fields:
+            if f.name in fields2:
+                data_type = merge_types(f.dataType, fields2.pop(f.name).dataType)
+                f = StructField(f.name, data_type, True, f.metadata)
+            merged.append(f)
+        return StructType(merged + list(fields2.values()))
+
+    if isinstance(type1, ArrayType) and isinstance(type2, ArrayType):
+        return ArrayType(merge_types(type1.elementType, type2.elementType), True)
+
+    if isinstance(type1, MapType) and isinstance(type2, MapType):
+        return MapType(
+            type1.keyType, merge_types(type1.valueType, type2.valueType), True
+        )
+
+    return type1
+
+
+def merge_schemas(schemas: Iterable[StructType]) -> StructType:
+    """The merge of the schemas, preferring earlier schemas on type conflicts."""
+    return reduce(merge_types, schemas, StructType([]))
@@ -0,0 +1,380 @@
+"""
+An in-process stand-in for the small part of the databricks rest api that is used
+by DbCli, RemoteLocation and RunDetails. It allows submit -> upload -> fetch to be
+exercised and benchmarked without a live workspace.
+
+Supported endpoints:
+- host metadata:  GET  /.well-known/databricks-config
+- current user:   GET  /api/2.0/preview/scim/v2/Me
+- instance pools: GET  /api/2.0/instance-pools/list
+- workspace:      POST /api/2.0/workspace/mkdirs, /api/2.0/workspace/import
+- dbfs:           POST /api/2.0/dbfs/mkdirs, create, add-block, close, put
+                  GET  /api/2.0/dbfs/read
+- jobs:           POST /api/2.x/jobs/runs/submit, /api/2.x/jobs/runs/cancel
+                  GET  /api/2.x/jobs/runs/get, /api/2.x/jobs/runs/get-output
+
+Simulated tasks run in parallel, and each one terminates `task_duration` seconds
+after the submission of the run. Every request is delayed by `latency` seconds.
+"""
+
+import base64
+import itertools
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set
+from urllib.parse import parse_qs, urlparse
+
+from databricks.sdk import WorkspaceClient
+
+from spetlrtools.test_job.dbcli import DbCli
+
+
+class FakeApiError(Exception):
+    def __init__(self, status: int, error_code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+        self.message = message
+
+
+@dataclass
+class FakeTask:
+    task_key: str
+    run_id: int
+    fail: bool
+    end_time: int = 0
+    cancelled: bool = False
+
+
+@dataclass
+class FakeRun:
+    run_id: int
+    run_name: str
+    start: float
+    tasks: List[FakeTask] = field(default_factory=list)
+
+
+class FakeWorkspace:
+    """Thread-safe fake databricks workspace served over http on localhost.
+
+    Use as a context manager. .connect() makes DbCli use the fake workspace."""
+
+    user_name = "fake.user@spetlr.org"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        task_duration: float = 1.0,
+        failing_tasks: Set[str] = None,
+        instance_pools: Dict[str, str] = None,
+        throttle_every: int = 0,
+    ):
+        """
+        :param latency: seconds added to the handling of each request
+        :param task_duration: seconds from submission until each task terminates
+        :param failing_tasks: task keys whose simulated run fails
+        :param instance_pools: pool name to pool id lookup served by the pools api
+        :param throttle_every: answer every n-th request with 429. 0 disables.
+        """
+        self.latency = latency
+        self.task_duration = task_duration
+        self.failing_tasks = set(failing_tasks or [])
+        self.instance_pools = instance_pools or {}
+        self.throttle_every = throttle_every
+
+        self.calls = Counter()
+        self.throttled = 0
+        self.dbfs: Dict[str, bytes] = {}
+        self.workspace: Dict[str, bytes] = {}
+        self.dirs: Set[str] = set()
+        self.runs: Dict[int, FakeRun] = {}
+        self.task_runs: Dict[int, FakeTask] = {}
+
+        self._handles: Dict[int, List] = {}
+        self._ids = itertools.count(1000)
+        self._requests = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeWorkspace":
+        fake = self
+
+        class Handler(_FakeHandler):
+            workspace = fake
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeWorkspace":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.stop()
+
+    def client(self) -> WorkspaceClient:
+        """A new WorkspaceClient pointing at this fake workspace."""
+        return DbCli.make_client(host=self.url, token="fake-token")
+
+    def connect(self) -> WorkspaceClient:
+        """Make all DbCli instances use this fake workspace."""
+        DbCli.w = self.client()
+        return DbCli.w
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def handle(self, method: str, path: str, query: dict, body: dict) -> dict:
+        """Dispatch one api request. Returns the json response body."""
+        # the jobs api exists in several versions with the same semantics for our use
+        endpoint = re.sub(r"^/api/2\.\d+/", "/api/", path)
+
+        with self._lock:
+            self.calls[f"{method} {endpoint}"] += 1
+            request_number = next(self._requests)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.throttle_every and request_number % self.throttle_every == 0:
+            with self._lock:
+                self.throttled += 1
+            raise FakeApiError(429, "REQUEST_LIMIT_EXCEEDED", "Too many requests.")
+
+        handlers = {
+            ("GET", "/.well-known/databricks-config"): self._host_metadata,
+            ("GET", "/api/preview/scim/v2/Me"): self._me,
+            ("GET", "/api/instance-pools/list"): self._list_pools,
+            ("POST", "/api/workspace/mkdirs"): self._workspace_mkdirs,
+            ("POST", "/api/workspace/import"): self._workspace_import,
+            ("POST", "/api/dbfs/mkdirs"): self._dbfs_mkdirs,
+            ("POST", "/api/dbfs/create"): self._dbfs_create,
+            ("POST", "/api/dbfs/add-block"): self._dbfs_add_block,
+            ("POST", "/api/dbfs/close"): self._dbfs_close,
+            ("POST", "/api/dbfs/put"): self._dbfs_put,
+            ("GET", "/api/dbfs/read"): self._dbfs_read,
+            ("POST", "/api/jobs/runs/submit"): self._submit,
+            ("POST", "/api/jobs/runs/cancel"): self._cancel,
+            ("GET", "/api/jobs/runs/get"): self._get_run,
+            ("GET", "/api/jobs/runs/get-output"): self._get_run_output,
+        }
+        try:
+            handler = handlers[(method, endpoint)]
+        except KeyError:
+            raise FakeApiError(404, "ENDPOINT_NOT_FOUND", f"No fake for {path}")
+
+        with self._lock:
+            return handler({**query, **body})
+
+    # current user and pools
+
+    def _host_metadata(self, params: dict) -> dict:
+        # newer sdk versions probe this when a client is created
+        return {"workspace_id": "0"}
+
+    def _me(self, params: dict) -> dict:
+        return {"userName": self.user_name}
+
+    def _list_pools(self, params: dict) -> dict:
+        return {
+            "instance_pools": [
+                {"instance_pool_name": name, "instance_pool_id": pool_id}
+                for name, pool_id in self.instance_pools.items()
+            ]
+        }
+
+    # workspace and dbfs files
+
+    def _workspace_mkdirs(self, params: dict) -> dict:
+        self.dirs.add(params["path"])
+        return {}
+
+    def _workspace_import(self, params: dict) -> dict:
+        self.workspace[params["path"]] = base64.b64decode(params.get("content", ""))
+        return {}
+
+    def _dbfs_mkdirs(self, params: dict) -> dict:
+        self.dirs.add(params["path"])
+        return {}
+
+    def _dbfs_create(self, params: dict) -> dict:
+        path = params["path"]
+        if path in self.dbfs and not params.get("overwrite"):
+            raise FakeApiError(
+                400, "RESOURCE_ALREADY_EXISTS", f"A file already exists at {path}"
+            )
+        handle = next(self._ids)
+        self._handles[handle] = [path, b""]
+        return {"handle": handle}
+
+    def _dbfs_add_block(self, params: dict) -> dict:
+        self._handles[params["handle"]][1] += base64.b64decode(params["data"])
+        return {}
+
+    def _dbfs_close(self, params: dict) -> dict:
+        path, data = self._handles.pop(params["handle"])
+        self.dbfs[path] = data
+        return {}
+
+    def _dbfs_put(self, params: dict) -> dict:
+        self.dbfs[params["path"]] = base64.b64decode(params.get("contents", ""))
+        return {}
+
+    def _dbfs_read(self, params: dict) -> dict:
+        path = params["path"]
+        if path not in self.dbfs:
+            raise FakeApiError(
+                404, "RESOURCE_DOES_NOT_EXIST", f"No file or directory exists at {path}"
+            )
+        offset = int(params.get("offset", 0))
+        chunk = self.dbfs[path][offset : offset + int(params.get("length", 2**20))]
+        return {"bytes_read": len(chunk), "data": base64.b64encode(chunk).decode()}
+
+    # jobs
+
+    def _submit(self, params: dict) -> dict:
+        run = FakeRun(
+            run_id=next(self._ids),
+            run_name=params.get("run_name", "Untitled"),
+            start=time.time(),
+        )
+        for task in params.get("tasks", []):
+            fake_task = FakeTask(
+                task_key=task["task_key"],
+                run_id=next(self._ids),
+                fail=task["task_key"] in self.failing_tasks,
+            )
+            run.tasks.append(fake_task)
+            self.task_runs[fake_task.run_id] = fake_task
+        self.runs[run.run_id] = run
+        return {"run_id": run.run_id}
+
+    def _get_fake_run(self, params: dict) -> FakeRun:
+        try:
+            return self.runs[int(params["run_id"])]
+        except KeyError:
+            raise FakeApiError(400, "INVALID_PARAMETER_VALUE", "Run does not exist")
+
+    def _advance(self, run: FakeRun):
+        """Let simulated time pass for all tasks in the run."""
+        now = time.time()
+        if now - run.start >= self.task_duration:
+            for task in run.tasks:
+                if not task.end_time:
+                    task.end_time = int((run.start + self.task_duration) * 1000)
+
+    def _cancel(self, params: dict) -> dict:
+        run = self._get_fake_run(params)
+        self._advance(run)
+        for task in run.tasks:
+            if not task.end_time:
+                task.cancelled = True
+                task.end_time = int(time.time() * 1000)
+        return {}
+
+    @staticmethod
+    def _task_state(task: FakeTask) -> dict:
+        if not task.end_time:
+            return {"life_cycle_state": "RUNNING"}
+        if task.cancelled:
+            return {"life_cycle_state": "TERMINATED", "result_state": "CANCELED"}
+        if task.fail:
+            return {"life_cycle_state": "TERMINATED", "result_state": "FAILED"}
+        return {"life_cycle_state": "TERMINATED", "result_state": "SUCCESS"}
+
+    def _get_run(self, params: dict) -> dict:
+        run = self._get_fake_run(params)
+        self._advance(run)
+
+        tasks = [
+            {
+                "task_key": task.task_key,
+                "run_id": task.run_id,
+                "attempt_number": 0,
+                "state": self._task_state(task),
+                "end_time": task.end_time,
+            }
+            for task in run.tasks
+        ]
+        ended = all(task.end_time for task in run.tasks)
+        if not ended:
+            state = {"life_cycle_state": "RUNNING"}
+        elif all(t["state"]["result_state"] == "SUCCESS" for t in tasks):
+            state = {"life_cycle_state": "TERMINATED", "result_state": "SUCCESS"}
+        elif any(task.cancelled for task in run.tasks):
+            state = {"life_cycle_state": "TERMINATED", "result_state": "CANCELED"}
+        else:
+            state = {"life_cycle_state": "TERMINATED", "result_state": "FAILED"}
+
+        return {
+            "run_id": run.run_id,
+            "run_name": run.run_name,
+            "run_page_url": f"{self.url}/#job/runs/{run.run_id}",
+            "state": state,
+            "end_time": (
+                max((task.end_time for task in run.tasks), default=0) if ended else 0
+            ),
+            "tasks": tasks,
+        }
+
+    def _get_run_output(self, params: dict) -> dict:
+        try:
+            task = self.task_runs[int(params["run_id"])]
+        except KeyError:
+            raise FakeApiError(400, "INVALID_PARAMETER_VALUE", "Run does not exist")
+        return {"logs": f"Simulated output of task {task.task_key}"}
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    workspace: FakeWorkspace
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # keep the benchmark output clean
+        pass
+
+    def _serve(self, method: str):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else {}
+
+        try:
+            status, response = 200, self.workspace.handle(method, url.path, query, body)
+        except FakeApiError as e:
+            status = e.status
+            response = {"error_code": e.error_code, "message": e.message}
+
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
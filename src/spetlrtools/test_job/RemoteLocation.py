@@ -51,12 +51,17 @@ class RemoteLocation:
 
     _dbwsc: WorkspaceClient
 
-    date = datetime.datetime.now().isoformat()  # mockable as class member
+    date: str = None  # mockable as class member
 
     def __init__(self, stage_area: str):
+        if self.date is None:
+            # each location gets its own time stamp so that concurrent submissions
+            # from one process do not share a remote folder
+            self.date = datetime.datetime.now().isoformat()
         self.stage_area = Path(stage_area)
-        self._dbwsc = DbCli().get_client()
-        self.me = self._dbwsc.current_user.me().user_name
+        self._db = DbCli()
+        self._dbwsc = self._db.get_client()
+        self.me = self._db.whoami()
         self.remote_home_to_base = ""
         self.remote_home = PosixPath()
 
@@ -107,12 +112,13 @@ class RemoteLocation:
         """The full path of the work area once it has been uploaded to databricks."""
         raise NotImplementedError()
 
-    def upload(self, dry_run=False):
+    def upload(self, dry_run=False, verbose=True):
         """Upload the staging area to databricks, either under dbfs root or under the workspace home folder."""
         if dry_run:
             print("Not uploading test job folder - Action skipped for dry-run.")
         else:
-            print("Now uploading test job folder")
+            if verbose:
+                print("Now uploading test job folder")
             self._upload_dir(self.remote_home, self.stage_area)
 
     def _upload_dir(self, remote, local):
@@ -140,12 +146,15 @@ class WorkspaceLocation(RemoteLocation):
         return str(self.remote_home / self.remote_home_to_base)
 
     def _mkdirs(self, path: str):
-        self._dbwsc.workspace.mkdirs(path)
+        self._db.call(self._dbwsc.workspace.mkdirs, path)
 
     def _upload_object(self, path: str, f: BinaryIO):
         content = base64.b64encode(f.read()).decode()
-        self._dbwsc.workspace.import_(
-            path=path, content=content, format=workspace.ImportFormat.AUTO
+        self._db.call(
+            self._dbwsc.workspace.import_,
+            path=path,
+            content=content,
+            format=workspace.ImportFormat.AUTO,
         )
 
 
@@ -162,7 +171,12 @@ class DbfsLocation(RemoteLocation):
         return str(self.remote_home / self.remote_home_to_base)
 
     def _mkdirs(self, path: str):
-        self._dbwsc.dbfs.mkdirs(path)
+        self._db.call(self._dbwsc.dbfs.mkdirs, path)
 
     def _upload_object(self, path: str, f: BinaryIO):
-        self._dbwsc.dbfs.upload(path=path, src=f)
+        def upload():
+            # a retried upload must start from the beginning of the file again
+            f.seek(0)
+            self._dbwsc.dbfs.upload(path=path, src=f, overwrite=True)
+
+        self._db.call(upload)
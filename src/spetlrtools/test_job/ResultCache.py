@@ -0,0 +1,186 @@
+"""
+Cache of passed test tasks, keyed by a fingerprint of everything that goes into
+the task: the files of the test archive, except the other task folders next to
+the task that the task does not import from, the wheels, the cluster, the spark
+libraries, the pytest arguments and the main script. A task whose fingerprint is
+in the cache has passed before with byte-identical inputs and does not need to
+run again.
+
+The cache is a json file, either local or on dbfs if the location starts with
+'dbfs:/', so that it can be shared between ci agents.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.impact import ImportGraph
+
+
+def _hash_file(digest, path: Path, name: str):
+    digest.update(name.encode() + b"\0")
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    digest.update(b"\0")
+
+
+def inputs_fingerprint(
+    wheels: Iterable[Union[str, Path]],
+    cluster: dict,
+    sparklibs: list,
+    pytest_args: list,
+    main_script: str,
+) -> str:
+    """Fingerprint of the inputs that are shared by all tasks of a run."""
+    digest = hashlib.sha256()
+    for wheel in sorted(Path(w) for w in wheels):
+        _hash_file(digest, wheel, wheel.name)
+    digest.update(
+        json.dumps(
+            dict(cluster=cluster, sparklibs=sparklibs, pytest_args=pytest_args),
+            sort_keys=True,
+        ).encode()
+    )
+    digest.update(main_script.encode())
+    return digest.hexdigest()
+
+
+def _imported_files(graph: ImportGraph, task_path: Path) -> Set[Path]:
+    """The files of all modules that the python files of the task import,
+    directly or indirectly."""
+    sources = [task_path] if task_path.is_file() else task_path.rglob("*.py")
+    todo = [name for source in sources for name in graph.imports_of(source)]
+    seen = set()
+    while todo:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo.extend(graph.imports[name] - seen)
+    return {graph.files[name] for name in seen}
+
+
+def _task_folders_next_to(task_path: Path) -> List[Path]:
+    """The folders next to the task that are tasks themselves when the task
+    folders are discovered, like with --tasks-from."""
+    return [
+        folder
+        for folder in task_path.parent.iterdir()
+        if folder.is_dir() and not folder.name.startswith("_") and folder != task_path
+    ]
+
+
+def task_fingerprint(
+    test_path: str,
+    task: str,
+    shared_fingerprint: str,
+    graph: ImportGraph = None,
+    file_hashes: Dict[Path, str] = None,
+) -> str:
+    """Fingerprint of a task given relative to the parent of the test archive,
+    combined with the fingerprint of the shared inputs.
+
+    All files of the test archive go into the fingerprint, like shared helpers and
+    conftest files, except those in the other task folders next to the task,
+    unless the task imports them. So the fingerprint does not depend on which
+    other tasks are in the run. Pass the import graph of the test archive and a
+    dict for the file hashes to reuse them for several tasks."""
+    test_archive = Path(test_path).resolve()
+    base = test_archive.parent
+    task_path = (base / task).resolve()
+    other_tasks = _task_folders_next_to(task_path)
+    if graph is None:
+        graph = ImportGraph([test_archive])
+    if file_hashes is None:
+        file_hashes = {}
+    imported = _imported_files(graph, task_path)
+
+    digest = hashlib.sha256(shared_fingerprint.encode())
+    digest.update(task.encode() + b"\0")
+
+    for path in sorted(test_archive.rglob("*")):
+        if not path.is_file() or "__pycache__" in path.parts:
+            continue
+        in_other_task = any(other in path.parents for other in other_tasks)
+        if in_other_task and path not in imported:
+            continue
+        if path not in file_hashes:
+            file_digest = hashlib.sha256()
+            _hash_file(file_digest, path, path.relative_to(base).as_posix())
+            file_hashes[path] = file_digest.hexdigest()
+        digest.update(file_hashes[path].encode())
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """The fingerprints of passed tasks, stored in a local or dbfs json file."""
+
+    VERSION = 1
+
+    def __init__(self, location: str):
+        self.location = location
+        self.passed: Dict[str, dict] = self._load()
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.passed
+
+    @property
+    def is_remote(self) -> bool:
+        return self.location.startswith("dbfs:")
+
+    def _read(self) -> Optional[bytes]:
+        if self.is_remote:
+            return DbCli().read_dbfs_file(self.location)
+        try:
+            return Path(self.location).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, data: bytes):
+        if self.is_remote:
+            DbCli().write_dbfs_file(self.location, data)
+            return
+
+        # write to a temporary file first so that readers never see half a cache
+        target = Path(self.location).resolve()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def _load(self) -> Dict[str, dict]:
+        data = self._read()
+        if not data:
+            return {}
+        try:
+            content = json.loads(data)
+        except ValueError:
+            print(f"WARNING: Ignoring the unreadable result cache {self.location}")
+            return {}
+        if content.get("version") != self.VERSION:
+            return {}
+        return content.get("passed", {})
+
+    def record_passes(self, fingerprints: Dict[str, str], run_id: int = None):
+        """Add the passed tasks, given as task key to fingerprint, to the cache."""
+        if not fingerprints:
+            return
+
+        # others may have added to the cache since it was loaded
+        self.passed = {**self._load(), **self.passed}
+        now = datetime.datetime.now().isoformat()
+        for task_key, fingerprint in fingerprints.items():
+            self.passed[fingerprint] = dict(task_key=task_key, run_id=run_id, time=now)
+
+        self._write(
+            json.dumps(
+                dict(version=self.VERSION, passed=self.passed), indent=1
+            ).encode()
+        )
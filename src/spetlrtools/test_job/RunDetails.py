@@ -27,14 +27,19 @@ class RunDetails:
         self.refresh()
 
         print(f"Getting stdout for {task_key}")
+        return self.task_output(self._db, self.details, task_key)
+
+    @staticmethod
+    def task_output(db: DbCli, details: jobs.Run, task_key: str) -> str:
+        """Return the driver stdout of the latest attempt of a task in the run."""
         task: jobs.RunTask
 
         # get latest attempt for all tasks of this key
         # this allows fetch to succeed in case a "repair" fixed a transient task failure
-        tasks_for_key = (t for t in self.details.tasks if t.task_key == task_key)
+        tasks_for_key = (t for t in details.tasks if t.task_key == task_key)
         # sort by negative attempt number
         task = sorted(tasks_for_key, key=lambda t: -t.attempt_number)[0]
 
         task_id = task.run_id
-        output = self._db.get_run_output(task_id)
+        output = db.get_run_output(task_id)
         return output.logs or task.status.termination_details.message
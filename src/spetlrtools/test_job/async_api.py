@@ -0,0 +1,91 @@
+"""
+Asyncio interface to submit and follow test runs from python.
+
+Unlike the cli functions, nothing here prints or exits the interpreter, so many
+runs can be submitted and watched concurrently from one process:
+
+    run_ids = await asyncio.gather(*(submit_async(...) for ... in ...))
+    async for state in watch(run_ids[0]):
+        ...
+
+All calls go through the shared, thread-safe DbCli client. Blocking api calls are
+executed in the default executor of the running event loop.
+"""
+
+import asyncio
+import io
+from typing import AsyncIterator, List
+
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.fetch import MultiTaskState
+from spetlrtools.test_job.RunDetails import RunDetails
+from spetlrtools.test_job.submit import submit_run
+
+
+async def submit_async(
+    test_path: str,
+    cluster: dict,
+    wheels: str,
+    tasks: List[str] = None,
+    tasks_from: List[str] = None,
+    requirement: List[str] = None,
+    sparklibs: List[dict] = None,
+    main_script: str = None,
+    pytest_args: List[str] = None,
+    upload_to="dbfs",
+) -> int:
+    """Stage, upload and submit a test run. Returns the run ID.
+    The parameters are those of submit(), except that main_script is the
+    source code of the main script rather than an open file."""
+    return await asyncio.to_thread(
+        submit_run,
+        test_path=test_path,
+        cluster=cluster,
+        wheels=wheels,
+        tasks=tasks,
+        tasks_from=tasks_from,
+        requirement=requirement,
+        sparklibs=sparklibs,
+        main_script=io.StringIO(main_script) if main_script else None,
+        pytest_args=pytest_args,
+        upload_to=upload_to,
+    )
+
+
+async def get_state(run_id: int) -> MultiTaskState:
+    """Return the current state of the run."""
+    details = await asyncio.to_thread(DbCli().get_run, run_id)
+    return MultiTaskState.fromRun(details)
+
+
+async def watch(
+    run_id: int, poll_interval: float = 5, changes_only=True
+) -> AsyncIterator[MultiTaskState]:
+    """Poll the run and yield its state until the run has ended.
+    With changes_only, a state is only yielded when it differs from the last one.
+    The final state is always yielded."""
+    last_state = None
+    while True:
+        state = await get_state(run_id)
+        if not changes_only or state != last_state:
+            last_state = state
+            yield state
+
+        if state.overall.ended:
+            return
+        await asyncio.sleep(poll_interval)
+
+
+async def task_output(run_id: int, task_key: str) -> str:
+    """Return the driver stdout of the latest attempt of a task in the run."""
+
+    def _get():
+        db = DbCli()
+        return RunDetails.task_output(db, db.get_run(run_id), task_key)
+
+    return await asyncio.to_thread(_get)
+
+
+async def cancel(run_id: int) -> None:
+    """Cancel the run on databricks."""
+    await asyncio.to_thread(DbCli().cancel_run, run_id)
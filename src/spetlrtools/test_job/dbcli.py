@@ -1,11 +1,70 @@
+import base64
+import io
 import os
+import random
 import shutil
 import sys
-from typing import Any, Iterator, Optional
+import threading
+import time
+import uuid
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional, TypeVar
 
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.config import Config
+from databricks.sdk.errors import (
+    DatabricksError,
+    DeadlineExceeded,
+    InternalError,
+    NotFound,
+    TemporarilyUnavailable,
+    TooManyRequests,
+)
 from databricks.sdk.service import jobs
 from databricks.sdk.service.compute import InstancePoolAndStats
+from databricks.sdk.version import __version__ as sdk_version
+from packaging.specifiers import SpecifierSet
+
+T = TypeVar("T")
+
+_UNSET = object()
+
+# errors that are worth trying again: 429 and the transient 5xx family
+RETRYABLE_ERRORS = (
+    TooManyRequests,
+    InternalError,
+    TemporarilyUnavailable,
+    DeadlineExceeded,
+)
+
+
+# the sdk versions whose request internals DbCli._retry_requests is tested with.
+# With other versions, the sdk retries requests itself, and DbCli retries calls.
+PATCHED_SDK_VERSIONS = SpecifierSet(">=0.153,<0.154")
+
+# where the retry-after hint of an api error is kept for DbCli._backoff
+_RETRY_AFTER = "spetlr_retry_after_secs"
+
+
+class _RetryAfterHint:
+    """Keeps the retry-after header of an api error out of sight of the sdk retry
+    loop, which retries every error with a hint. The sdk also assumes one second
+    when the header is missing, which DbCli leaves to its own backoff."""
+
+    def customize_error(self, response, kwargs: dict):
+        retry_after = response.headers.get("Retry-After", "")
+        kwargs["retry_after_secs"] = None
+        if retry_after.isdigit():
+            kwargs[_RETRY_AFTER] = int(retry_after)
+
+
+# the number of attempts recorded on each thread, see DbCli._retrying
+_local = threading.local()
+
+
+def _attempts_on_thread() -> int:
+    return getattr(_local, "attempts", 0)
 
 
 def _try_resolve(obj: Any, key: str):
@@ -15,29 +74,326 @@ def _try_resolve(obj: Any, key: str):
         return obj
 
 
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of api calls.
+    Tokens are refilled continuously at `rate` per second up to `capacity`.
+    Each call to .acquire() takes one token, blocking until one is available."""
+
+    def __init__(self, rate: float, capacity: int = None):
+        if rate <= 0:
+            raise ValueError("The rate of a token bucket must be positive.")
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token. Returns the number of seconds spent waiting for it."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                missing = (1 - self._tokens) / self.rate
+            time.sleep(missing)
+            waited += missing
+
+
+@dataclass
+class CallStats:
+    """Thread-safe counters of the api calls made through DbCli."""
+
+    calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+    latency: float = 0.0
+    max_latency: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, latency: float, retried=False, throttled=False, failed=False):
+        with self._lock:
+            self.calls += 1
+            self.retries += int(retried)
+            self.throttled += int(throttled)
+            self.failures += int(failed)
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.retries = self.throttled = self.failures = 0
+            self.latency = self.max_latency = 0.0
+
+    def summary(self) -> str:
+        """One line describing the api usage, suitable for printing."""
+        with self._lock:
+            mean = self.latency / self.calls if self.calls else 0.0
+            return (
+                f"API calls: {self.calls} | retries: {self.retries}"
+                f" | throttled: {self.throttled} | failures: {self.failures}"
+                f" | mean latency: {mean:.3f}s | max latency: {self.max_latency:.3f}s"
+            )
+
+
 class DbCli:
+    """Shared access to the databricks workspace api.
+
+    All instances share one WorkspaceClient whose http connection pool is sized
+    by `pool_size`, so that the client can be used from many threads at once.
+    The requests of the client are rate limited by a token bucket and are retried
+    with jittered exponential backoff on 429 and transient 5xx errors, as are the
+    functions passed to .call(). Counters of all requests are kept in `DbCli.stats`.
+    With sdk versions outside PATCHED_SDK_VERSIONS, whole calls are rate limited,
+    retried and counted instead."""
+
     w: Optional[WorkspaceClient] = None
 
+    pool_size: int = 20
+    max_calls_per_second: Optional[float] = 20.0
+    max_retries: int = 5
+    backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 30.0
+
+    stats = CallStats()
+
+    # whether the requests of the client are retried one by one, see _retry_requests
+    retries_requests: bool = True
+
+    _lock = threading.Lock()
+    _bucket: Optional[TokenBucket] = None
+
+    @classmethod
+    def configure(
+        cls,
+        pool_size: int = None,
+        max_calls_per_second: Optional[float] = _UNSET,
+        max_retries: int = None,
+        backoff_seconds: float = None,
+    ) -> None:
+        """Change the client settings. A new client is created on the next call.
+        Pass max_calls_per_second=None to disable rate limiting."""
+        with cls._lock:
+            if pool_size is not None:
+                cls.pool_size = pool_size
+                cls.w = None
+            if max_calls_per_second is not _UNSET:
+                cls.max_calls_per_second = max_calls_per_second
+                cls._bucket = None
+            if max_retries is not None:
+                cls.max_retries = max_retries
+            if backoff_seconds is not None:
+                cls.backoff_seconds = backoff_seconds
+
+    @classmethod
+    def make_client(cls, **config) -> WorkspaceClient:
+        """A new WorkspaceClient with the pool size of DbCli, whose requests are
+        rate limited, retried and counted by DbCli where the sdk version allows."""
+        client = WorkspaceClient(
+            config=Config(
+                max_connection_pools=cls.pool_size,
+                max_connections_per_pool=cls.pool_size,
+                **config,
+            )
+        )
+        cls._retry_requests(client)
+        return client
+
+    @staticmethod
+    def _request_internals(client: WorkspaceClient):
+        """The internal api client of the sdk, if it has the tested internals."""
+        if sdk_version not in PATCHED_SDK_VERSIONS:
+            return None
+        api = getattr(client.api_client, "_api_client", None)
+        names = ["_perform", "_is_retryable", "_is_seekable_stream", "_error_parser"]
+        if not all(hasattr(api, name) for name in names) or not hasattr(
+            api._error_parser, "_error_customizers"
+        ):
+            return None
+        return api
+
+    @classmethod
+    def _retry_requests(cls, client: WorkspaceClient) -> None:
+        """The sdk retries throttled and transient api errors itself, with its own
+        backoff, for up to retry_timeout_seconds. Instead, each request is retried
+        here, and the sdk retry loop passes api errors on at once.
+        Network errors are still retried by the sdk.
+
+        This relies on internals of the sdk. With untested sdk versions, the sdk
+        keeps retrying requests, and DbCli.call retries and rate limits whole calls."""
+        api = cls._request_internals(client)
+        if api is None:
+            warnings.warn(
+                f"databricks-sdk {sdk_version} is not in {PATCHED_SDK_VERSIONS}. "
+                "The sdk retries throttled requests itself."
+            )
+            cls.retries_requests = False
+            return
+        cls.retries_requests = True
+
+        api._error_parser._error_customizers.append(_RetryAfterHint())
+        perform = api._perform
+        is_retryable = api._is_retryable
+
+        def perform_with_retries(*args, data=None, **kwargs):
+            if data is None:
+                return cls()._retrying(perform, *args, **kwargs)
+            if not api._is_seekable_stream(data):
+                # a stream that cannot be rewound cannot be sent again
+                return cls()._retrying(
+                    perform, *args, data=data, max_retries=0, **kwargs
+                )
+            position = data.tell()
+
+            def rewound(*args, **kwargs):
+                data.seek(position)
+                return perform(*args, data=data, **kwargs)
+
+            return cls()._retrying(rewound, *args, **kwargs)
+
+        api._perform = perform_with_retries
+        api._is_retryable = lambda err: (
+            None if isinstance(err, DatabricksError) else is_retryable(err)
+        )
+
     @classmethod
     def get_client(cls) -> WorkspaceClient:
         if cls.w is None:
-            cls.w = WorkspaceClient()
+            with cls._lock:
+                if cls.w is None:
+                    cls.w = cls.make_client()
         return cls.w
 
+    @classmethod
+    def _get_bucket(cls) -> Optional[TokenBucket]:
+        if cls.max_calls_per_second is None:
+            return None
+        if cls._bucket is None:
+            with cls._lock:
+                if cls._bucket is None:
+                    cls._bucket = TokenBucket(cls.max_calls_per_second)
+        return cls._bucket
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full jitter exponential backoff, respecting any retry-after hint."""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        delay = random.uniform(0, delay)
+        retry_after = getattr(error, "kwargs", {}).get(_RETRY_AFTER) or getattr(
+            error, "retry_after_secs", None
+        )
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _retrying(
+        self,
+        fn: Callable[..., T],
+        *args,
+        rate_limited: bool = True,
+        max_retries: int = None,
+        **kwargs,
+    ) -> T:
+        """Call fn with rate limiting, retries and statistics. If fn made requests
+        through the client of DbCli, those were retried and counted one by one,
+        and fn is neither retried nor counted again."""
+        bucket = self._get_bucket() if rate_limited else None
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            before = _attempts_on_thread()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if _attempts_on_thread() > before:
+                    raise
+                throttled = isinstance(e, TooManyRequests)
+                if attempt >= max_retries:
+                    self._record(
+                        time.perf_counter() - start, throttled=throttled, failed=True
+                    )
+                    raise
+                self._record(
+                    time.perf_counter() - start, retried=True, throttled=throttled
+                )
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            except Exception:
+                if _attempts_on_thread() == before:
+                    self._record(time.perf_counter() - start, failed=True)
+                raise
+            if _attempts_on_thread() == before:
+                self._record(time.perf_counter() - start)
+            return result
+
+    def _record(self, latency: float, **kwargs):
+        _local.attempts = _attempts_on_thread() + 1
+        self.stats.record(latency, **kwargs)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Execute an api call with retries and statistics. Each request of the
+        client of DbCli is also rate limited, and retried on its own, so that a call
+        of several requests, like an upload, only repeats the failed request.
+        Otherwise, the call as a whole is rate limited."""
+        return self._retrying(
+            fn, *args, rate_limited=not self.retries_requests, **kwargs
+        )
+
     def whoami(self) -> str:
-        return self.get_client().current_user.me().user_name
+        return self.call(self.get_client().current_user.me).user_name
 
     def cancel_run(self, run_id: int) -> None:
-        self.get_client().jobs.cancel_run(run_id)
+        self.call(self.get_client().jobs.cancel_run, run_id)
 
     def get_run(self, run_id: int) -> jobs.Run:
-        return self.get_client().jobs.get_run(run_id)
+        return self.call(self.get_client().jobs.get_run, run_id)
 
     def get_run_output(self, run_id: int) -> jobs.RunOutput:
-        return self.get_client().jobs.get_run_output(run_id)
+        return self.call(self.get_client().jobs.get_run_output, run_id)
 
     def list_instance_pools(self) -> Iterator[InstancePoolAndStats]:
-        return self.get_client().instance_pools.list()
+        # the listing is paginated lazily, so we materialize it inside the call
+        return iter(self.call(lambda: list(self.get_client().instance_pools.list())))
+
+    def read_dbfs_file(self, path: str) -> Optional[bytes]:
+        """Return the contents of a dbfs file, or None if it does not exist."""
+        # the rest api takes plain absolute paths
+        if path.startswith("dbfs:"):
+            path = path[len("dbfs:") :]
+        data = b""
+        while True:
+            try:
+                response = self.call(
+                    self.get_client().dbfs.read, path, offset=len(data), length=2**20
+                )
+            except NotFound:
+                return None
+            if not response.bytes_read:
+                return data
+            data += base64.b64decode(response.data)
+
+    def write_dbfs_file(self, path: str, data: bytes) -> None:
+        """Create or overwrite a dbfs file."""
+        f = io.BytesIO(data)
+
+        def upload():
+            # a retried upload must start from the beginning of the file again
+            f.seek(0)
+            self.get_client().dbfs.upload(path=path, src=f, overwrite=True)
+
+        self.call(upload)
 
     def submit(self, workflow: dict, dry_run=False) -> int:
         if dry_run:
@@ -46,8 +402,14 @@ class DbCli:
             print("Dry run ends here.")
             sys.exit(0)
 
-        return self.get_client().jobs._api.do(
-            "POST", "/api/2.1/jobs/runs/submit", body=workflow
+        # the token makes retries safe: if a run was created, but the reply was
+        # lost, the retry returns the same run instead of starting another one
+        workflow = {"idempotency_token": str(uuid.uuid4()), **workflow}
+        return self.call(
+            self.get_client().jobs._api.do,
+            "POST",
+            "/api/2.1/jobs/runs/submit",
+            body=workflow,
         )["run_id"]
 
     def execv_run_file(self, file_path: str, dry_run=False):
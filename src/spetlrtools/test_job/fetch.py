@@ -11,11 +11,12 @@ import json
 import sys
 import time
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import IO, List, Optional
+from dataclasses import dataclass, field
+from typing import IO, Dict, List, Optional
 
 from databricks.sdk.service import jobs
 
+from spetlrtools.test_job.ResultCache import ResultCache
 from spetlrtools.test_job.RunDetails import RunDetails
 
 
@@ -59,6 +60,13 @@ def setup_fetch_parser(subparsers):
         help="Stop and cancel job on first failed task.",
     )
 
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        help="Seconds between queries of the run state.",
+        default=5,
+    )
+
 
 def collect_args(args):
     """Post process the arguments of the ."""
@@ -76,25 +84,58 @@ def fetch_main(args):
     """
 
     # Post process the arguments
+    run_info = {}
     if args.runid is None:
-        args.runid = json.load(args.runid_json)["run_id"]
-
-    if fetch(args.runid, args.stdout, args.failfast):
+        run_info = json.load(args.runid_json)
+        args.runid = run_info["run_id"]
+
+    if fetch(
+        args.runid,
+        args.stdout,
+        args.failfast,
+        args.poll_interval,
+        cached_tasks=run_info.get("cached_tasks"),
+        result_cache=run_info.get("result_cache"),
+        fingerprints=run_info.get("fingerprints"),
+    ):
         print("Run failed")
         sys.exit(-1)
 
 
-def fetch(run_id: int, stdout_file: IO[str] = None, failfast=False):
+def fetch(
+    run_id: Optional[int],
+    stdout_file: IO[str] = None,
+    failfast=False,
+    poll_interval: float = 5,
+    cached_tasks: List[str] = None,
+    result_cache: str = None,
+    fingerprints: Dict[str, str] = None,
+):
     """Fetch main function.
     See the cli help for parameter descriptions and functionality.
-    Can be used programmatically."""
+    Can be used programmatically.
+
+    The cached tasks, the result cache and the fingerprints of the submitted tasks
+    are those written to the run ID json by submit with a result cache. Tasks that
+    pass are then added to the result cache."""
+    cached_tasks = cached_tasks or []
+    if cached_tasks:
+        print(
+            "Cached tasks that passed before with identical inputs:",
+            ", ".join(cached_tasks),
+        )
+
+    if run_id is None:
+        # submit skipped all tasks
+        print("Run result SUCCESS!")
+        return 0
 
     run = RunDetails(run_id)
 
     last_state = None
     stdouts = {}
     while True:
-        state = MultiTaskState.fromRun(run.details)
+        state = MultiTaskState.fromRun(run.details, cached_tasks)
         # state = MultiTaskState.fromJson(run.details.as_dict())
         if last_state is None or state != last_state:
             last_state = state
@@ -113,7 +154,7 @@ def fetch(run_id: int, stdout_file: IO[str] = None, failfast=False):
 
         if state.overall.ended:
             break
-        time.sleep(5)
+        time.sleep(poll_interval)
         run.refresh()
 
     if stdout_file is not None:
@@ -121,6 +162,14 @@ def fetch(run_id: int, stdout_file: IO[str] = None, failfast=False):
             stdout_file.write("=" * 50 + f"\nTask Output from {k}\n" + "=" * 50 + "\n")
             stdout_file.write(v)
 
+    if result_cache and fingerprints:
+        passed = {
+            task.task_key: fingerprints[task.task_key]
+            for task in last_state.tasks
+            if task.ended and task.success and task.task_key in fingerprints
+        }
+        ResultCache(result_cache).record_passes(passed, run_id)
+
     if last_state.overall.success:
         print("Run result SUCCESS!")
         return 0
@@ -196,15 +245,18 @@ class MultiTaskState:
 
     overall: Optional[TaskState]
     tasks: List[TaskState]
+    # task keys of tasks skipped since they passed before with identical inputs
+    cached: List[str] = field(default_factory=list)
 
     @classmethod
-    def fromRun(cls, run: jobs.Run):
+    def fromRun(cls, run: jobs.Run, cached: List[str] = None):
         """Create the Result state of a multiTask workflow from the json object returned
         by the databricks api."""
 
         return cls(
             overall=TaskState.fromRun(run),
             tasks=[TaskState.fromTask(task) for task in run.tasks],
+            cached=list(cached or []),
         )
 
     def accumulate(self):
@@ -213,6 +265,8 @@ class MultiTaskState:
         counts = defaultdict(int)
         for task in self.tasks:
             counts[task.result] += 1
+        if self.cached:
+            counts["CACHED"] = len(self.cached)
         return counts
 
     def print_status(self):
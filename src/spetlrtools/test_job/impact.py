@@ -0,0 +1,268 @@
+"""
+Test impact analysis for spetlr-test-job submit.
+
+Given a git diff range, the changed files are mapped to python modules. A static
+import graph of the source roots and the test archive then gives all modules that
+depend on the changes, and only those test tasks are scheduled whose folders
+contain a changed or dependent file.
+
+The import graph is built from the source files without importing anything.
+Parse results are kept in a json cache keyed by the hash of each file, so that
+repeated analyses only parse the files that changed since the last run.
+
+A change is considered to affect every task below it if it is
+- a conftest.py or __init__.py in the test archive, or
+- a non-python file in the test archive outside of all task folders.
+Non-python files in a source root count as a change of the containing package.
+Other files, like documentation, affect no tasks.
+"""
+
+import ast
+import hashlib
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+from spetlrtools.helpers import ModuleHelper
+
+CACHE_VERSION = 1
+
+
+def changed_files(diff_range: str) -> List[Path]:
+    """The files changed in the git diff range, relative to the working directory.
+    The range can be anything accepted by git diff, e.g. 'origin/main...HEAD'.
+    A renamed file is listed with both its old and its new path."""
+    result = subprocess.run(
+        ["git", "diff", "--name-only", "--relative", "--no-renames", diff_range],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return [Path(line) for line in result.stdout.splitlines() if line.strip()]
+
+
+def _resolve_imports(module_name: str, is_package: bool, source: bytes) -> List[str]:
+    """Absolute names of everything imported by the source code.
+    Both 'a.b' and 'a.b.c' are listed for 'from a.b import c', since c may be
+    either a module or a member of a.b."""
+    tree = ast.parse(source)
+    package_parts = module_name.split(".")
+    if not is_package:
+        package_parts = package_parts[:-1]
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base_parts = package_parts[: len(package_parts) - node.level + 1]
+                base = ".".join(base_parts + ([node.module] if node.module else []))
+            else:
+                base = node.module
+            if not base:
+                continue
+            names.add(base)
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+
+    return sorted(names)
+
+
+class ImportGraph:
+    """Static import graph of all modules found in the given locations.
+    Each location is either a package directory or a directory on the python path,
+    see ModuleHelper.get_module_files."""
+
+    def __init__(
+        self, locations: Iterable[Union[str, Path]], cache_file: Union[str, Path] = None
+    ):
+        self.files: Dict[str, Path] = {}
+        self.locations = [Path(location).resolve() for location in locations]
+        for location in locations:
+            for name, path in ModuleHelper.get_module_files(location).items():
+                self.files[name] = path.resolve()
+        self._modules_by_file = {path: name for name, path in self.files.items()}
+
+        self.imports: Dict[str, Set[str]] = {}
+        # everything each module imports, also names that are not in the graph
+        self.imported_names: Dict[str, Set[str]] = {}
+        self._build(Path(cache_file) if cache_file else None)
+
+        self.importers: Dict[str, Set[str]] = {name: set() for name in self.files}
+        for name, imported in self.imports.items():
+            for other in imported:
+                self.importers[other].add(name)
+
+    def _build(self, cache_file: Path = None):
+        cache = {}
+        if cache_file is not None and cache_file.exists():
+            try:
+                with open(cache_file) as f:
+                    content = json.load(f)
+                if content.get("version") == CACHE_VERSION:
+                    cache = content["files"]
+            except (ValueError, KeyError):
+                # a broken cache is simply rebuilt
+                cache = {}
+
+        new_cache = {}
+        for name, path in self.files.items():
+            source = path.read_bytes()
+            digest = hashlib.sha1(source).hexdigest()
+            key = f"{name}:{path}"
+
+            entry = cache.get(key)
+            if entry is None or entry["hash"] != digest:
+                try:
+                    names = _resolve_imports(name, path.name == "__init__.py", source)
+                except SyntaxError:
+                    names = []
+                entry = {"hash": digest, "imports": names}
+            new_cache[key] = entry
+
+            self.imported_names[name] = set(entry["imports"])
+            self.imports[name] = self._known_modules(entry["imports"]) - {name}
+
+        if cache_file is not None and new_cache != cache:
+            with open(cache_file, "w") as f:
+                json.dump({"version": CACHE_VERSION, "files": new_cache}, f)
+
+    def _known_modules(self, names: Iterable[str]) -> Set[str]:
+        """Restrict imported names to modules in the graph. Importing a module
+        also executes all its parent packages, so those are included."""
+        known = set()
+        for name in names:
+            parts = name.split(".")
+            for i in range(1, len(parts) + 1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.files:
+                    known.add(prefix)
+        return known
+
+    def module_of(self, path: Union[str, Path]) -> Union[str, None]:
+        """The name of the module whose source is the given file, if any."""
+        return self._modules_by_file.get(Path(path).resolve())
+
+    def imports_of(self, path: Union[str, Path]) -> Set[str]:
+        """The modules in the graph that a python file imports, also if the file
+        itself is not a module of the graph, like a test outside of a package."""
+        path = Path(path).resolve()
+        name = self.module_of(path)
+        if name is not None:
+            return self.imports[name]
+        try:
+            names = _resolve_imports(path.stem, False, path.read_bytes())
+        except SyntaxError:
+            return set()
+        return self._known_modules(names)
+
+    def module_name(self, path: Union[str, Path]) -> Union[str, None]:
+        """The name that a python file in one of the locations has, or had before
+        it was deleted."""
+        path = Path(path).resolve()
+        for location in self.locations:
+            if location not in path.parents:
+                continue
+            parts = list(path.relative_to(location).with_suffix("").parts)
+            if parts[-1] == "__init__":
+                parts.pop()
+            if (location / "__init__.py").exists():
+                parts.insert(0, location.name)
+            return ".".join(parts) or None
+        return None
+
+    def importers_of(self, name: str) -> Set[str]:
+        """The modules that import the module name, or anything below it, also if
+        it is no longer in the graph."""
+        return {
+            module
+            for module, imported in self.imported_names.items()
+            if any(i == name or i.startswith(f"{name}.") for i in imported)
+        }
+
+    def package_of(self, path: Union[str, Path]) -> Union[str, None]:
+        """The name of the innermost package containing the given file, if any."""
+        for parent in Path(path).resolve().parents:
+            name = self._modules_by_file.get(parent / "__init__.py")
+            if name is not None:
+                return name
+        return None
+
+    def dependents(self, modules: Iterable[str]) -> Set[str]:
+        """All modules that import any of the given modules, directly or
+        indirectly, including the given modules themselves."""
+        result = set()
+        todo = [m for m in modules if m in self.files]
+        while todo:
+            module = todo.pop()
+            if module in result:
+                continue
+            result.add(module)
+            todo.extend(self.importers[module] - result)
+        return result
+
+
+def affected_tasks(
+    tasks: List[str],
+    test_path: str,
+    changed: Iterable[Union[str, Path]],
+    source_roots: Iterable[Union[str, Path]] = ("src",),
+    cache_file: Union[str, Path] = None,
+) -> List[str]:
+    """Return the subset of tasks that is affected by the changed files.
+
+    :param tasks: task folders relative to the parent of the test archive,
+        as returned by discover_job_tasks
+    :param test_path: the test archive folder
+    :param changed: the changed files, relative to the working directory
+    :param source_roots: directories on the python path that hold the source code
+    :param cache_file: optional json file to keep the parsed imports in
+    """
+    test_archive = Path(test_path).resolve()
+    source_roots = [Path(root).resolve() for root in source_roots]
+    graph = ImportGraph(
+        [root for root in source_roots if root.exists()] + [test_archive],
+        cache_file=cache_file,
+    )
+
+    task_dirs = {task: (test_archive.parent / task).resolve() for task in tasks}
+
+    changed_paths = [Path(path).resolve() for path in changed]
+    changed_modules = set()
+    affected_paths = set(changed_paths)
+    # folders whose complete content is affected
+    affected_dirs = set()
+
+    for path in changed_paths:
+        in_tests = test_archive == path or test_archive in path.parents
+        if path.suffix == ".py":
+            module = graph.module_of(path)
+            if module is not None:
+                changed_modules.add(module)
+            elif not path.exists():
+                # a deleted or renamed module breaks everything that imported it
+                name = graph.module_name(path)
+                if name is not None:
+                    changed_modules.update(graph.importers_of(name))
+            if in_tests and path.name in ("conftest.py", "__init__.py"):
+                affected_dirs.add(path.parent)
+        elif in_tests:
+            if not any(d == path or d in path.parents for d in task_dirs.values()):
+                affected_dirs.add(test_archive)
+        elif any(root in path.parents for root in source_roots):
+            package = graph.package_of(path)
+            if package is not None:
+                changed_modules.add(package)
+
+    affected_paths.update(
+        graph.files[module] for module in graph.dependents(changed_modules)
+    )
+
+    result = []
+    for task, task_dir in task_dirs.items():
+        if any(d == task_dir or d in task_dir.parents for d in affected_dirs) or any(
+            task_dir == p or task_dir in p.parents for p in affected_paths
+        ):
+            result.append(task)
+    return result
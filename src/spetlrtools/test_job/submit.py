@@ -32,29 +32,45 @@ optional arguments:
   --upload-to {workspace,dbfs}
                         Where to upload test job files.
   --wait-for-job        After submission, wait for result using cli v2.
+  --impact-range IMPACT_RANGE
+                        Only submit the tasks affected by the changes in this git diff range.
+  --source-root SOURCE_ROOT
+                        Directory with the source code for the impact analysis.
+  --impact-cache IMPACT_CACHE
+                        File to cache the import graph of the impact analysis in.
+  --result-cache RESULT_CACHE
+                        Local or dbfs:/ json file of passed tasks. Tasks that passed with identical inputs are skipped.
 
 
 """
 
 import argparse
 import inspect
+import io
 import json
 import re
 import shutil
 import subprocess
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path, PosixPath
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Tuple, Union
 from typing.io import IO
 
 from spetlrtools.test_job import test_main
 from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.impact import ImportGraph, affected_tasks, changed_files
 from spetlrtools.test_job.RemoteLocation import (
     DbfsLocation,
     RemoteLocation,
     StageArea,
     WorkspaceLocation,
 )
+from spetlrtools.test_job.ResultCache import (
+    ResultCache,
+    inputs_fingerprint,
+    task_fingerprint,
+)
 
 
 # Custom action to handle the deprecation warning
@@ -174,6 +190,28 @@ def setup_submit_parser(subparsers):
     )
     parser.add_argument("--wait", action=DeprecatedAction, help=argparse.SUPPRESS)
 
+    parser.add_argument(
+        "--impact-range",
+        help="Only submit the tasks affected by the changes in this git diff range.",
+    )
+    parser.add_argument(
+        "--source-root",
+        action="append",
+        help="Directory with the source code for the impact analysis.",
+    )
+    parser.add_argument(
+        "--impact-cache",
+        help="File to cache the import graph of the impact analysis in.",
+    )
+
+    parser.add_argument(
+        "--result-cache",
+        help=(
+            "Local or dbfs:/ json file of passed tasks. "
+            "Tasks that passed with identical inputs are skipped."
+        ),
+    )
+
     return
 
 
@@ -227,6 +265,10 @@ def submit_main(args):
         dry_run=args.dry_run,
         upload_to=args.upload_to,
         wait_for_job=args.wait_for_job,
+        impact_range=args.impact_range,
+        source_roots=args.source_root,
+        impact_cache=args.impact_cache,
+        result_cache=args.result_cache,
     )
 
 
@@ -267,6 +309,83 @@ def discover_job_tasks(test_path: str, folder: str):
     return subfolders
 
 
+class NoAffectedTasks(ValueError):
+    """Raised when the impact analysis finds that no test task needs to run."""
+
+
+def resolve_tasks(
+    test_path: str,
+    tasks: List[str] = None,
+    tasks_from: List[str] = None,
+    impact_range: str = None,
+    source_roots: List[str] = None,
+    impact_cache: str = None,
+) -> List[str]:
+    """Resolve the given tasks and task folders to the list of tasks to run.
+    With an impact_range, only the tasks affected by the changes in that git diff
+    range are returned."""
+    if tasks is None:
+        tasks = []
+    if tasks_from is None:
+        tasks_from = []
+    if not (tasks or tasks_from):
+        raise ValueError("No tasks given")
+
+    resolved_tasks = [verify_and_resolve_task(test_path, task) for task in tasks]
+    for task in tasks_from:
+        # subtasks will be ['tests/cluster/job1', 'tests/cluster/job2'] or similar
+        resolved_tasks += discover_job_tasks(test_path, task)
+
+    if impact_range:
+        resolved_tasks = affected_tasks(
+            resolved_tasks,
+            test_path,
+            changed_files(impact_range),
+            source_roots=source_roots or ["src"],
+            cache_file=impact_cache,
+        )
+        if not resolved_tasks:
+            raise NoAffectedTasks(f"No test tasks are affected by {impact_range}")
+
+    return resolved_tasks
+
+
+def task_key_of(task: str) -> str:
+    """construct a task name from the test task file path"""
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", task)
+
+
+def skip_cached_tasks(
+    cache: ResultCache,
+    test_path: str,
+    tasks: List[str],
+    cluster: dict,
+    wheels: str,
+    sparklibs: List[dict],
+    main_source: str,
+    pytest_args: List[str],
+) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """Split the resolved tasks by whether they passed before with identical inputs.
+    Returns the tasks to run, the task keys of the cached tasks and the
+    fingerprints of the tasks to run by task key."""
+    shared = inputs_fingerprint(
+        Path().glob(wheels), cluster, sparklibs, pytest_args, main_source
+    )
+
+    graph = ImportGraph([test_path])
+    file_hashes = {}
+    to_run, cached, fingerprints = [], [], {}
+    for task in tasks:
+        fingerprint = task_fingerprint(test_path, task, shared, graph, file_hashes)
+        if fingerprint in cache:
+            cached.append(task_key_of(task))
+        else:
+            to_run.append(task)
+            fingerprints[task_key_of(task)] = fingerprint
+
+    return to_run, cached, fingerprints
+
+
 class PoolBoy:
     """Hold a list of available instance pools and replace the by-name reference with an id if possible."""
 
@@ -306,6 +425,10 @@ def submit(
     dry_run=False,
     upload_to="dbfs",
     wait_for_job=False,
+    impact_range: str = None,
+    source_roots: List[str] = None,
+    impact_cache: str = None,
+    result_cache: str = None,
 ):
     """
     --dry-run             Don't do anything, only report
@@ -333,19 +456,168 @@ def submit(
     --upload-to {workspace,dbfs}
                           Where to upload test job files.
     --wait-for-job        After submission, wait for result using cli v2.
+    --impact-range IMPACT_RANGE
+                          Only submit the tasks affected by the changes in this git diff range.
+    --source-root SOURCE_ROOT
+                          Directory with the source code for the impact analysis.
+    --impact-cache IMPACT_CACHE
+                          File to cache the import graph of the impact analysis in.
+    --result-cache RESULT_CACHE
+                          Local or dbfs:/ json file of passed tasks. Tasks that passed with identical inputs are skipped.
     """
+    dbcli = DbCli()
+
+    try:
+        # resolved up front so that nothing is staged if no task is affected
+        tasks = resolve_tasks(
+            test_path,
+            tasks,
+            tasks_from,
+            impact_range=impact_range,
+            source_roots=source_roots,
+            impact_cache=impact_cache,
+        )
+    except NoAffectedTasks:
+        print("No test tasks are affected by the changes.")
+        return
+
+    run_info = {}
+    if result_cache:
+        if main_script:
+            main_source = main_script.read()
+            main_script = io.StringIO(main_source)
+        else:
+            main_source = inspect.getsource(test_main)
+
+        tasks, cached_tasks, fingerprints = skip_cached_tasks(
+            ResultCache(result_cache),
+            test_path,
+            tasks,
+            cluster=cluster,
+            wheels=wheels,
+            sparklibs=(sparklibs or [])
+            + [{"pypi": {"package": r}} for r in requirement or []],
+            main_source=main_source,
+            pytest_args=pytest_args or [],
+        )
+        run_info.update(
+            result_cache=result_cache,
+            fingerprints=fingerprints,
+            cached_tasks=cached_tasks,
+        )
+        if cached_tasks:
+            print(
+                f"Skipping {len(cached_tasks)} test tasks that passed before "
+                "with identical inputs:",
+                ", ".join(cached_tasks),
+            )
+        if not tasks:
+            print("All test tasks passed before. Nothing to submit.")
+            if out_json:
+                json.dump({"run_id": None, **run_info}, out_json)
+            return
+
+    with staged_workflow(
+        test_path=test_path,
+        cluster=cluster,
+        wheels=wheels,
+        tasks=tasks,
+        requirement=requirement,
+        sparklibs=sparklibs,
+        main_script=main_script,
+        pytest_args=pytest_args,
+        dry_run=dry_run,
+        upload_to=upload_to,
+    ) as (workflow, jobfile):
+        if wait_for_job:
+            print("handing control to databricks jobs submit ...")
+            dbcli.execv_run_file(jobfile, dry_run=dry_run)
+            # the above function ends python and does not return
+            return
+
+        try:
+            print("Submitting job...")
+            run_id = dbcli.submit(workflow, dry_run=dry_run)
+        except subprocess.CalledProcessError:
+            print("Json contents:")
+            print(json.dumps(workflow, indent=4))
+            raise
+
+    # now we have the run_id
+    print(f"Started run with ID {run_id}")
+    print(f"Follow job details at {dbcli.get_run(run_id).run_page_url}")
+
+    if out_json:
+        json.dump({"run_id": run_id, **run_info}, out_json)
+
+
+def submit_run(
+    test_path: str,
+    cluster: dict,
+    wheels: str,
+    tasks: List[str] = None,
+    tasks_from: List[str] = None,
+    requirement: List[str] = None,
+    sparklibs: List[dict] = None,
+    main_script: IO[str] = None,
+    pytest_args: List[str] = None,
+    upload_to="dbfs",
+    verbose=False,
+    impact_range: str = None,
+    source_roots: List[str] = None,
+    impact_cache: str = None,
+) -> int:
+    """Stage, upload and submit a test run like submit(), but return the run ID.
+    Nothing is printed unless verbose is set, and the interpreter is never exited.
+    Raises NoAffectedTasks if an impact_range is given and no task is affected.
+    Safe to call from several threads at once."""
+    tasks = resolve_tasks(
+        test_path,
+        tasks,
+        tasks_from,
+        impact_range=impact_range,
+        source_roots=source_roots,
+        impact_cache=impact_cache,
+    )
+    with staged_workflow(
+        test_path=test_path,
+        cluster=cluster,
+        wheels=wheels,
+        tasks=tasks,
+        requirement=requirement,
+        sparklibs=sparklibs,
+        main_script=main_script,
+        pytest_args=pytest_args,
+        upload_to=upload_to,
+        verbose=verbose,
+    ) as (workflow, _):
+        return DbCli().submit(workflow)
+
+
+@contextmanager
+def staged_workflow(
+    test_path: str,
+    cluster: dict,
+    wheels: str,
+    tasks: List[str],
+    requirement: List[str] = None,
+    sparklibs: List[dict] = None,
+    main_script: IO[str] = None,
+    pytest_args: List[str] = None,
+    dry_run=False,
+    upload_to="dbfs",
+    verbose=True,
+) -> Iterator[Tuple[dict, str]]:
+    """Prepare the stage area, upload it and yield the workflow object together
+    with the local path of its json file. The stage area lives until the end of
+    the with-block. The tasks are the resolved tasks, see resolve_tasks.
+    See submit() for a description of the other parameters."""
     if requirement is None:
         requirement = []
     if sparklibs is None:
         sparklibs = []
     if pytest_args is None:
         pytest_args = []
-    if tasks is None:
-        tasks = []
-    if tasks_from is None:
-        tasks_from = []
-    if not (tasks or tasks_from):
-        raise ValueError("No tasks given")
     upload_to = upload_to.lower()
 
     # check the structure of the cluster object
@@ -356,11 +628,13 @@ def submit(
     if not isinstance(sparklibs, list):
         raise AssertionError("invalid sparklibs specification")
 
+    # copies, so that concurrent submissions can share the caller's objects
+    cluster = dict(cluster)
+    sparklibs = list(sparklibs)
+
     for py_requirement in requirement:
         sparklibs.append({"pypi": {"package": py_requirement}})
 
-    dbcli = DbCli()
-
     # create everything in a temporary directory.
     # for dry-runs, keep make it a local directory and keep it
     with StageArea(dry_run) as stage:
@@ -375,16 +649,11 @@ def submit(
         for wheel in wheels:
             sparklibs.append({"whl": wheel})
 
-        prepare_archive(test_path, remote)
-        main_file = prepare_main_file(remote, main_script)
-
-        resolved_tasks = [verify_and_resolve_task(test_path, task) for task in tasks]
-        for task in tasks_from:
-            # subtasks will be ['tests/cluster/job1', 'tests/cluster/job2'] or similar
-            resolved_tasks += discover_job_tasks(test_path, task)
+        prepare_archive(test_path, remote, verbose=verbose)
+        main_file = prepare_main_file(remote, main_script, verbose=verbose)
 
         if dry_run:
-            print(resolved_tasks)
+            print(tasks)
 
         if "instance_pool_id" in cluster:
             cluster["instance_pool_id"] = PoolBoy().lookup(cluster["instance_pool_id"])
@@ -392,13 +661,10 @@ def submit(
         # construct the workflow object
         workflow = dict(run_name="Testing Run", format="MULTI_TASK", tasks=[])
 
-        for task in resolved_tasks:
-            # construct a task name from the test task file path
-            task_sub = re.sub(r"[^a-zA-Z0-9_-]", "_", task)
-
+        for task in tasks:
             workflow["tasks"].append(
                 dict(
-                    task_key=task_sub,
+                    task_key=task_key_of(task),
                     libraries=sparklibs,
                     spark_python_task=dict(
                         python_file=main_file,
@@ -422,28 +688,9 @@ def submit(
         with open(jobfile, "w") as f:
             json.dump(workflow, f, indent=2)
 
-        remote.upload(dry_run)
-
-        if wait_for_job:
-            print("handing control to databricks jobs submit ...")
-            dbcli.execv_run_file(jobfile, dry_run=dry_run)
-            # the above function ends python and does not return
-            return
-
-        try:
-            print("Submitting job...")
-            run_id = dbcli.submit(workflow, dry_run=dry_run)
-        except subprocess.CalledProcessError:
-            print("Json contents:")
-            print(json.dumps(workflow, indent=4))
-            raise
+        remote.upload(dry_run, verbose=verbose)
 
-    # now we have the run_id
-    print(f"Started run with ID {run_id}")
-    print(f"Follow job details at {dbcli.get_run(run_id).run_page_url}")
-
-    if out_json:
-        json.dump({"run_id": run_id}, out_json)
+        yield workflow, jobfile
 
 
 def discover_wheels(globpath: str, remote: RemoteLocation) -> List[str]:
@@ -455,9 +702,10 @@ def discover_wheels(globpath: str, remote: RemoteLocation) -> List[str]:
     return result
 
 
-def prepare_archive(test_path: str, remote: RemoteLocation):
+def prepare_archive(test_path: str, remote: RemoteLocation, verbose=True):
     """Zip the test archive and add it to the staging area"""
-    print(f"now archiving {test_path}")
+    if verbose:
+        print(f"now archiving {test_path}")
 
     with tempfile.TemporaryDirectory() as tempdir:
         real_archive_path = shutil.make_archive(
@@ -475,8 +723,11 @@ def prepare_archive(test_path: str, remote: RemoteLocation):
         return remote.add_local_path(str(renamed_archive_path))
 
 
-def prepare_main_file(remote: RemoteLocation, main_script: IO[str] = None) -> str:
-    print("now preparing test main file")
+def prepare_main_file(
+    remote: RemoteLocation, main_script: IO[str] = None, verbose=True
+) -> str:
+    if verbose:
+        print("now preparing test main file")
 
     main_ref = remote.new_local_file("main.py")
 
@@ -484,7 +735,8 @@ def prepare_main_file(remote: RemoteLocation, main_script: IO[str] = None) -> st
         if main_script:
             f.write(main_script.read())
         else:
-            print("Using default main script test_main.py")
+            if verbose:
+                print("Using default main script test_main.py")
             f.write(inspect.getsource(test_main))
 
     return main_ref.remote
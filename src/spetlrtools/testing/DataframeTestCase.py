@@ -1,11 +1,94 @@
 import datetime
 import unittest
-from typing import Any, Iterable
+from functools import reduce
+from typing import Any, Dict, Iterable, List, Union
 
 from pyspark.sql import DataFrame
-from pyspark.sql.types import ArrayType, StructField, StructType
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    ArrayType,
+    DataType,
+    LongType,
+    MapType,
+    StructField,
+    StructType,
+)
+from pyspark.sql.utils import AnalysisException
 
-from spetlrtools.testing.TupleComparer import TupleComparer
+from spetlrtools.testing.arrow_collect import collect_as_tuples
+from spetlrtools.testing.normalize import compile_row_normalizer
+from spetlrtools.testing.row_diff import (
+    ChangedRow,
+    RowDiff,
+    diff_ordered_rows,
+    diff_rows,
+    first_order_difference,
+)
+from spetlrtools.testing.schema_diff import schema_differences
+from spetlrtools.testing.tolerance import (
+    Tolerance,
+    column_tolerances,
+    compile_matchers,
+    spark_match,
+)
+from spetlrtools.testing.TupleComparer import null_safe_key
+
+_ROW_INDEX = "__spetlr_row_index"
+
+
+def _nullable(data_type: DataType) -> DataType:
+    """The data type with all fields, elements and values made nullable."""
+    if isinstance(data_type, StructType):
+        return StructType(
+            [
+                StructField(f.name, _nullable(f.dataType), True, f.metadata)
+                for f in data_type.fields
+            ]
+        )
+    if isinstance(data_type, ArrayType):
+        return ArrayType(_nullable(data_type.elementType), True)
+    if isinstance(data_type, MapType):
+        return MapType(
+            _nullable(data_type.keyType), _nullable(data_type.valueType), True
+        )
+    return data_type
+
+
+def _comparable(df: DataFrame) -> DataFrame:
+    """Replace map columns by their sorted entries, which support set operations."""
+    return df.select(
+        *[
+            (
+                F.array_sort(F.map_entries(F.col(f"`{f.name}`"))).alias(f.name)
+                if isinstance(f.dataType, MapType)
+                else F.col(f"`{f.name}`")
+            )
+            for f in df.schema.fields
+        ]
+    )
+
+
+def _with_row_index(df: DataFrame) -> DataFrame:
+    """Add the position of each row as a column. The rows are numbered within
+    each partition, offset by the number of rows in the partitions before it."""
+    partition = "__spetlr_partition"
+    indexed = df.select(
+        "*",
+        F.spark_partition_id().alias(partition),
+        F.monotonically_increasing_id().alias(_ROW_INDEX),
+    )
+    counts = dict(indexed.groupBy(partition).count().collect())
+    if not counts:
+        return indexed.drop(partition)
+    offsets, total = [], 0
+    for p in sorted(counts):
+        offsets += [F.lit(p), F.lit(total)]
+        total += counts[p]
+
+    # monotonically_increasing_id puts the partition id in the upper 31 bits
+    position = F.col(_ROW_INDEX) - F.col(partition).cast(LongType()) * (1 << 33)
+    offset = F.element_at(F.create_map(*offsets), F.col(partition))
+    return indexed.withColumn(_ROW_INDEX, position + offset).drop(partition)
 
 
 class DataframeTestCase(unittest.TestCase):
@@ -15,6 +98,12 @@ class DataframeTestCase(unittest.TestCase):
         columns: Iterable[str] = None,
         expected_data: Iterable[Iterable[Any]] = None,
         assert_order=False,
+        method="collect",
+        max_diff_rows=10,
+        key_columns: Iterable[str] = None,
+        rel_tol: Union[float, Dict[str, float]] = None,
+        abs_tol: Union[float, Dict[str, float]] = None,
+        timestamp_tol: Union[datetime.timedelta, Dict[str, datetime.timedelta]] = None,
     ):
         """
         Args:
@@ -22,6 +111,27 @@ class DataframeTestCase(unittest.TestCase):
             columns: the column names in the expected data. In case of None, all df column are used.
             expected_data: expected data, for the selected columns.
                     This necessary argument has a default value because columns can be set to default.
+            assert_order: also require the rows to be in the same order.
+            method: "collect" compares the collected rows in python.
+                    "arrow" does the same, but collects the dataframe through arrow
+                    and sorts it in columnar form, which is much faster for larger
+                    dataframes. It falls back to "collect" if pyarrow is missing or
+                    the column types cannot be converted to arrow.
+                    "spark" turns the expected data into a dataframe and compares with
+                    exceptAll in both directions, so that the dataframe is never
+                    collected. Only up to max_diff_rows mismatching rows are collected
+                    for the failure message.
+            max_diff_rows: the number of mismatching rows shown in the failure message.
+            key_columns: columns that identify a row. Mismatching rows with the same
+                    key are reported as changed, showing the differing columns.
+            rel_tol: relative tolerance of float and double values, for all columns
+                    or as a dict by column name. Values match like in math.isclose.
+            abs_tol: absolute tolerance of float and double values, for all columns
+                    or as a dict by column name.
+            timestamp_tol: a timedelta by which timestamps may differ, for all
+                    columns or as a dict by column name.
+                    With tolerances, the "spark" method pairs rows by key_columns,
+                    or by position if assert_order is set, and requires one of them.
 
         Returns:
             None
@@ -33,90 +143,253 @@ class DataframeTestCase(unittest.TestCase):
             raise ValueError("No match assert value provided")
         if columns is None:
             columns = df.schema.fieldNames()
+        columns = list(columns)
+        tolerances = column_tolerances(columns, rel_tol, abs_tol, timestamp_tol)
+
+        if method == "spark":
+            return self._assertDataframeMatchesSpark(
+                df,
+                columns,
+                expected_data,
+                assert_order,
+                max_diff_rows,
+                key_columns,
+                tolerances,
+            )
+        if method not in ("collect", "arrow"):
+            raise ValueError(f"Unknown comparison method {method}")
 
-        schema_fields = {f.name: f for f in df.schema.fields}
+        selected = df.select(*columns)
 
-        assert_df = [list(row) for row in df.select(*columns).collect()]
+        assert_df = None
+        if method == "arrow":
+            assert_df = collect_as_tuples(selected, sort=not assert_order)
+        if assert_df is None:
+            assert_df = self._collectRows(df, columns, assert_order)
+
+        # the expected values are normalized like the collected ones, e.g. every
+        # datetime is moved to UTC time zone. This allows for exact comparison
+        normalize = compile_row_normalizer(selected.schema)
+        expected_data = [normalize(row) for row in expected_data]
+
+        if not assert_order:
+            expected_data = sorted(expected_data, key=null_safe_key)
+
+        if expected_data == assert_df:
+            return
+
+        matchers = compile_matchers(selected.schema, tolerances)
+        if not any(matchers):
+            diff = diff_rows(expected_data, assert_df, columns, key_columns)
+            if not diff:
+                self.fail(first_order_difference(expected_data, assert_df))
+        elif assert_order and not key_columns:
+            diff = diff_ordered_rows(expected_data, assert_df, columns, matchers)
+        else:
+            diff = diff_rows(expected_data, assert_df, columns, key_columns, matchers)
+        if not diff:
+            return
+        self.fail(
+            f"The dataframe does not match the expected data "
+            f"({len(expected_data)} expected rows, {len(assert_df)} actual rows).\n"
+            + diff.format(max_diff_rows)
+        )
+
+    def _collectRows(
+        self, df: DataFrame, columns: List[str], assert_order: bool
+    ) -> List[tuple]:
+        """Collect the columns of the dataframe as normalized tuples."""
+        selected = df.select(*columns)
+        normalize = compile_row_normalizer(selected.schema)
+        rows = [normalize(row) for row in selected.collect()]
+        if not assert_order:
+            rows.sort(key=null_safe_key)
+        return rows
+
+    def _assertDataframeMatchesSpark(
+        self,
+        df: DataFrame,
+        columns: List[str],
+        expected_data: Iterable[Iterable[Any]],
+        assert_order: bool,
+        max_diff_rows: int,
+        key_columns: Iterable[str] = None,
+        tolerances: List[Tolerance] = None,
+    ):
+        """Compare the dataframe to the expected data without collecting it."""
+        tolerant = any(tolerances or [])
+        if tolerant and not (key_columns or assert_order):
+            raise ValueError(
+                "Tolerances in the spark comparison need key_columns or assert_order"
+            )
 
         try:
-            # we need to handle array types
-            # this code should grow to handle more general types of data-frames in the future
-            for i, col in enumerate(columns):
-                if isinstance(schema_fields[col].dataType, ArrayType):
-                    for row in assert_df:
-                        if row[i] is None:
-                            continue
-                        elif isinstance(
-                            schema_fields[col].dataType.elementType, StructType
-                        ):
-                            row[i] = [
-                                tuple(
-                                    (
-                                        field.astimezone(datetime.timezone.utc)
-                                        if isinstance(field, datetime.datetime)
-                                        else field
-                                    )
-                                    for field in sub_row
-                                )
-                                for sub_row in row[i]
-                            ]
-
-                # move every datetime item to UTC time zone. This allows for exact comparison
-                for row in assert_df:
-                    if isinstance(row[i], datetime.datetime):
-                        row[i] = row[i].astimezone(datetime.timezone.utc)
-
-            assert_df = [tuple(row) for row in assert_df]
-
-            if not assert_order:
-                assert_df = sorted(assert_df, key=TupleComparer)
-
-        except KeyError as e:
+            actual_df = df.select(*columns)
+        except AnalysisException as e:
             raise KeyError(
-                f'Could not find "{e.args[0]}" column in dataframe schema: {list(schema_fields)}'
+                f"Could not find all of {columns} in dataframe schema: {df.columns}"
+            ) from e
+
+        # the expected values are normalized like in the other methods, e.g.
+        # decimals given as floats. Expected values may be null even where the
+        # dataframe column is not.
+        normalize = compile_row_normalizer(actual_df.schema)
+        try:
+            expected_df = df.sparkSession.createDataFrame(
+                [normalize(row) for row in expected_data],
+                schema=_nullable(actual_df.schema),
             )
+        except (TypeError, ValueError) as e:
+            self.fail(f"The expected data does not fit the dataframe schema: {e}")
 
-        # move every datetime item to UTC time zone. This allows for exact comparison
-        expected_data = [list(row) for row in expected_data]
-        for row in expected_data:
-            for i, item in enumerate(row):
-                if isinstance(row[i], datetime.datetime):
-                    row[i] = row[i].astimezone(datetime.timezone.utc)
-        expected_data = [tuple(row) for row in expected_data]
+        # maps cannot be compared by set operations, but their sorted entries can
+        actual_df = _comparable(actual_df)
+        expected_df = _comparable(expected_df)
 
-        if not assert_order:
-            expected_data = sorted(expected_data, key=TupleComparer)
+        if assert_order:
+            actual_df = _with_row_index(actual_df)
+            expected_df = _with_row_index(expected_df)
 
-        self.assertEqual(expected_data, assert_df)
+        if tolerant:
+            return self._assertJoinedMatch(
+                expected_df,
+                actual_df,
+                tolerances,
+                list(key_columns) if key_columns else [_ROW_INDEX],
+                max_diff_rows,
+            )
+
+        missing = expected_df.exceptAll(actual_df)
+        unexpected = actual_df.exceptAll(expected_df)
+        n_missing = missing.count()
+        n_unexpected = unexpected.count()
+        if not (n_missing or n_unexpected):
+            return
+
+        if assert_order:
+            columns = columns + [_ROW_INDEX]
+        diff = diff_rows(
+            [tuple(row) for row in missing.limit(max_diff_rows).collect()],
+            [tuple(row) for row in unexpected.limit(max_diff_rows).collect()],
+            columns,
+            key_columns,
+        )
+        self.fail(
+            f"The dataframe does not match the expected data: {n_missing} expected "
+            f"rows are missing and {n_unexpected} rows were not expected. "
+            f"Up to {max_diff_rows} of each:\n" + diff.format(max_diff_rows)
+        )
+
+    def _assertJoinedMatch(
+        self,
+        expected_df: DataFrame,
+        actual_df: DataFrame,
+        tolerances: List[Tolerance],
+        key_columns: List[str],
+        max_diff_rows: int,
+    ):
+        """Pair the rows by key in one full outer join and compare the other
+        columns within the tolerances. The keys must identify rows uniquely."""
+        columns = actual_df.columns
+        try:
+            key_positions = [columns.index(c) for c in key_columns]
+        except ValueError:
+            raise KeyError(f"The key columns {key_columns} must be among {columns}")
+        tolerances = tolerances + [Tolerance()] * (len(columns) - len(tolerances))
+
+        def renamed(df: DataFrame, prefix: str) -> DataFrame:
+            return df.select(
+                *[F.col(f"`{c}`").alias(f"{prefix}{i}") for i, c in enumerate(columns)],
+                F.lit(True).alias(f"{prefix}_present"),
+            )
+
+        joined = renamed(expected_df, "e").join(
+            renamed(actual_df, "a"),
+            on=reduce(
+                lambda x, y: x & y,
+                [F.col(f"e{i}").eqNullSafe(F.col(f"a{i}")) for i in key_positions],
+            ),
+            how="full_outer",
+        )
+
+        differs = [
+            ~spark_match(f.dataType, F.col(f"e{i}"), F.col(f"a{i}"), tol)
+            for i, (f, tol) in enumerate(zip(actual_df.schema.fields, tolerances))
+        ]
+        status = (
+            F.when(F.col("a_present").isNull(), "missing")
+            .when(F.col("e_present").isNull(), "unexpected")
+            .when(reduce(lambda x, y: x | y, differs, F.lit(False)), "changed")
+        )
+        diffs = joined.select(
+            status.alias("status"),
+            *[F.col(f"e{i}") for i in range(len(columns))],
+            *[F.col(f"a{i}") for i in range(len(columns))],
+            *[d.alias(f"d{i}") for i, d in enumerate(differs)],
+        ).where(F.col("status").isNotNull())
+
+        counts = {row[0]: row[1] for row in diffs.groupBy("status").count().collect()}
+        if not counts:
+            return
+
+        def sample(kind: str) -> List[tuple]:
+            if kind not in counts:
+                return []
+            rows = diffs.where(F.col("status") == kind).limit(max_diff_rows).collect()
+            return [
+                (
+                    tuple(row[f"e{i}"] for i in range(len(columns))),
+                    tuple(row[f"a{i}"] for i in range(len(columns))),
+                    [i for i in range(len(columns)) if row[f"d{i}"]],
+                )
+                for row in rows
+            ]
+
+        diff = RowDiff(
+            columns=columns,
+            missing=[e for e, _, _ in sample("missing")],
+            unexpected=[a for _, a, _ in sample("unexpected")],
+            changed=[
+                ChangedRow(
+                    key=tuple(e[i] for i in key_positions),
+                    expected=e,
+                    actual=a,
+                    changed=changed,
+                )
+                for e, a, changed in sample("changed")
+            ],
+        )
+        self.fail(
+            f"The dataframe does not match the expected data: "
+            f"{counts.get('missing', 0)} expected rows are missing, "
+            f"{counts.get('unexpected', 0)} rows were not expected and "
+            f"{counts.get('changed', 0)} rows differ. "
+            f"Up to {max_diff_rows} of each:\n" + diff.format(max_diff_rows)
+        )
 
     def assertEqualSchema(
-        self, schema1: StructType, schema2: StructType, compare_nullability=False
+        self,
+        schema1: StructType,
+        schema2: StructType,
+        compare_nullability=False,
+        compare_metadata=True,
+        compare_field_order=True,
     ):
         """
         Comparing pyspark schemas can fail due to unequal nullability.
-        This method allows the user to ignore this aspect of the StructType.
+        This method allows the user to ignore this aspect of the StructType,
+        as well as field metadata and the order of fields. On failure, the
+        message lists each difference with the path of the field.
         """
-        json1 = schema1.jsonValue()
-        json2 = schema2.jsonValue()
-
-        if not compare_nullability:
-            # create a function     for recursive clearing
-            def clear_nullable(field: StructField):
-                del field["nullable"]
-                if not field["metadata"]:
-                    del field["metadata"]
-                if field["type"] == "struct":
-                    for item in field["fields"]:
-                        clear_nullable(item)
-                elif (
-                    field["type"] == "array"
-                    and field["elementType"]["type"] == "struct"
-                ):
-                    for item in field["elementType"]["fields"]:
-                        clear_nullable(item)
-
-            for j in [json1, json2]:
-                for item in j["fields"]:
-                    clear_nullable(item)
-
-        self.assertEqual(json1, json2)
+        differences = schema_differences(
+            schema1,
+            schema2,
+            compare_nullability=compare_nullability,
+            compare_metadata=compare_metadata,
+            compare_field_order=compare_field_order,
+        )
+        if differences:
+            self.fail(
+                f"The schemas differ in {len(differences)} places:\n"
+                + "\n".join(f"    {d}" for d in differences)
+            )
@@ -1,4 +1,5 @@
 from functools import total_ordering
+from typing import Any, Tuple
 
 
 @total_ordering
@@ -47,3 +48,31 @@ class TupleComparer(object):
 
     def __eq__(self, other):
         return self.data == other.data
+
+
+_NESTED = (tuple, list, dict)
+
+
+def null_safe_key(data: Any) -> Tuple:
+    """Sort key for potentially nested tuples that may contain None.
+    Gives the same order as TupleComparer, but maps each row only once to a
+    tuple that python can compare natively, so sorted(rows, key=null_safe_key)
+    runs many times faster than sorted(rows, key=TupleComparer).
+    None sorts before everything else. Tuples and lists are compared element
+    wise, and dicts by their sorted items."""
+    if isinstance(data, dict):
+        return tuple(sorted(null_safe_key(item) for item in data.items()))
+    if not isinstance(data, (tuple, list)):
+        data = (data,)
+
+    # each element becomes a flag and a value. The values are only compared if
+    # the flags are equal, so None never needs to be compared to anything.
+    key = []
+    for item in data:
+        if item is None:
+            key += (0, 0)
+        elif isinstance(item, _NESTED):
+            key += (1, null_safe_key(item))
+        else:
+            key += (1, item)
+    return tuple(key)
@@ -0,0 +1,120 @@
+"""
+Collect a dataframe through arrow instead of as Row objects.
+
+The rows are sorted in columnar form, and only the final rows are converted to
+python tuples, normalized like in the collect path of assertDataframeMatches.
+pyarrow is optional. Without it, or for types that spark cannot send as arrow,
+collect_as_tuples returns None so that the caller can fall back to .collect().
+"""
+
+import datetime
+from typing import List, Optional, Tuple
+
+from pyspark.sql import DataFrame
+
+from spetlrtools.testing.normalize import compile_column_converters
+from spetlrtools.testing.TupleComparer import null_safe_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover
+    pa = None
+
+_UTC = datetime.timezone.utc
+_UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=_UTC)
+
+
+def collect_as_tuples(df: DataFrame, sort=True) -> Optional[List[Tuple]]:
+    """Collect the dataframe as tuples, sorted in the order of null_safe_key if sort is
+    set. Returns None if the dataframe cannot be collected as arrow."""
+    table = _collect_as_arrow(df)
+    if table is None:
+        return None
+
+    # nested values cannot be sorted in arrow
+    columnar_sort = sort and all(_is_sortable(t) for t in table.schema.types)
+    if columnar_sort:
+        if table.num_columns and table.num_rows:
+            keys = [f"c{i}" for i in range(table.num_columns)]
+            indices = pc.sort_indices(
+                table.rename_columns(keys),
+                sort_keys=[(key, "ascending") for key in keys],
+                null_placement="at_start",
+            )
+            table = table.take(indices)
+
+    columns = []
+    converters = compile_column_converters(df.schema)
+    for column, converter in zip(table.columns, converters):
+        if pa.types.is_timestamp(column.type) and column.type.tz:
+            columns.append(_utc_datetimes(column))
+            continue
+        values = column.to_pylist()
+        if converter is not None:
+            values = [converter(v) for v in values]
+        columns.append(values)
+
+    rows = list(zip(*columns)) if columns else [()] * table.num_rows
+    if sort and not columnar_sort:
+        rows = sorted(rows, key=null_safe_key)
+    return rows
+
+
+def _collect_as_arrow(df: DataFrame) -> Optional["pa.Table"]:
+    if pa is None:
+        return None
+    try:
+        if hasattr(df, "toArrow"):
+            # pyspark 4
+            return df.toArrow()
+        batches = df._collect_as_arrow()
+    except Exception:
+        # e.g. types that are not supported by the arrow conversion
+        return None
+    if not batches:
+        return _empty_table(df)
+    return pa.Table.from_batches(batches)
+
+
+def _empty_table(df: DataFrame) -> Optional["pa.Table"]:
+    try:
+        from pyspark.sql.pandas.types import to_arrow_schema
+
+        return to_arrow_schema(df.schema).empty_table()
+    except Exception:
+        return None
+
+
+def _utc_datetimes(column: "pa.ChunkedArray") -> List[Optional[datetime.datetime]]:
+    """Aware UTC datetimes of a timestamp column. Building them from the epoch
+    offsets is many times faster than letting arrow resolve the time zone."""
+    to_micros = {"s": 10**6, "ms": 10**3, "us": 1}.get(column.type.unit)
+    offsets = column.cast(pa.int64()).to_pylist()
+    if to_micros is None:
+        # nanoseconds, which python datetimes cannot hold anyway
+        offsets = [None if o is None else o // 1000 for o in offsets]
+        to_micros = 1
+    return [
+        (
+            None
+            if o is None
+            else _UTC_EPOCH + datetime.timedelta(microseconds=o * to_micros)
+        )
+        for o in offsets
+    ]
+
+
+def _is_sortable(t: "pa.DataType") -> bool:
+    return (
+        pa.types.is_integer(t)
+        or pa.types.is_floating(t)
+        or pa.types.is_decimal(t)
+        or pa.types.is_boolean(t)
+        or pa.types.is_string(t)
+        or pa.types.is_large_string(t)
+        or pa.types.is_binary(t)
+        or pa.types.is_large_binary(t)
+        or pa.types.is_temporal(t)
+        or pa.types.is_null(t)
+    )
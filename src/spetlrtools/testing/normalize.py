@@ -0,0 +1,136 @@
+"""
+Schema driven normalization of row values, so that collected rows and expected
+rows can be compared exactly.
+
+For each column, a converter function is compiled once from its spark data type.
+The same converters are applied to the collected and to the expected values:
+- timestamps become aware datetimes in UTC. Naive datetimes are taken as local time,
+- decimals become Decimal, also when given as int, float or str,
+- binary values become bytes,
+- arrays become lists, maps become dicts and structs become tuples,
+  also when a struct is given as a dict by field name,
+all the way down into nested types.
+"""
+
+import datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence
+
+from pyspark.sql.types import (
+    ArrayType,
+    BinaryType,
+    DataType,
+    DecimalType,
+    MapType,
+    StructType,
+    TimestampType,
+)
+
+try:
+    from pyspark.sql.types import TimestampNTZType
+except ImportError:  # pragma: no cover
+    TimestampNTZType = TimestampType
+
+Converter = Callable[[Any], Any]
+
+_UTC = datetime.timezone.utc
+
+
+def _timestamp(v):
+    if isinstance(v, datetime.datetime) and v.tzinfo is not _UTC:
+        return v.astimezone(_UTC)
+    return v
+
+
+def _decimal(v):
+    if isinstance(v, float):
+        # the shortest repr gives the decimal the user most likely meant
+        return Decimal(repr(v))
+    if isinstance(v, (int, str)) and not isinstance(v, bool):
+        return Decimal(v)
+    return v
+
+
+def _binary(v):
+    if isinstance(v, (bytearray, memoryview)):
+        return bytes(v)
+    return v
+
+
+def compile_converter(data_type: DataType) -> Optional[Converter]:
+    """The converter for values of the data type, or None if no conversion is
+    needed. Converters map None to None."""
+    if isinstance(data_type, (TimestampType, TimestampNTZType)):
+        return lambda v: None if v is None else _timestamp(v)
+
+    if isinstance(data_type, DecimalType):
+        return lambda v: None if v is None else _decimal(v)
+
+    if isinstance(data_type, BinaryType):
+        return lambda v: None if v is None else _binary(v)
+
+    if isinstance(data_type, ArrayType):
+        element = compile_converter(data_type.elementType)
+        if element is None:
+            return lambda v: v if v is None or isinstance(v, list) else list(v)
+        return lambda v: None if v is None else [element(x) for x in v]
+
+    if isinstance(data_type, MapType):
+        key = compile_converter(data_type.keyType) or _identity
+        value = compile_converter(data_type.valueType) or _identity
+
+        def convert_map(v):
+            if v is None:
+                return None
+            # arrow gives maps as lists of pairs
+            items = v.items() if isinstance(v, dict) else v
+            return {key(k): value(x) for k, x in items}
+
+        return convert_map
+
+    if isinstance(data_type, StructType):
+        names = data_type.fieldNames()
+        fields = [compile_converter(f.dataType) or _identity for f in data_type.fields]
+
+        def convert_struct(v):
+            if v is None:
+                return None
+            if isinstance(v, dict):
+                # arrow gives structs as dicts, and users may write them that way
+                return tuple(c(v.get(name)) for name, c in zip(names, fields))
+            if len(v) != len(fields):
+                # leave it to the comparison to report
+                return tuple(v)
+            return tuple(c(x) for c, x in zip(fields, v))
+
+        return convert_struct
+
+    return None
+
+
+def _identity(v):
+    return v
+
+
+def compile_column_converters(schema: StructType) -> List[Optional[Converter]]:
+    """One converter per column of the schema, None where no conversion is needed."""
+    return [compile_converter(f.dataType) for f in schema.fields]
+
+
+def compile_row_normalizer(schema: StructType) -> Callable[[Sequence], tuple]:
+    """A function that normalizes a whole row of the schema into a tuple.
+    Rows of the wrong length are returned as they are, for the comparison to report."""
+    converters = [
+        (i, c) for i, c in enumerate(compile_column_converters(schema)) if c is not None
+    ]
+    width = len(schema.fields)
+
+    def normalize(row: Sequence) -> tuple:
+        if len(row) != width:
+            return tuple(row)
+        row = list(row)
+        for i, convert in converters:
+            row[i] = convert(row[i])
+        return tuple(row)
+
+    return normalize
@@ -0,0 +1,242 @@
+"""
+Row level differences between expected and actual rows, for assertion messages.
+
+Rows are matched by hashing, so the diff takes linear time, unlike the difflib
+based diff of unittest's assertEqual on long lists. With key columns, rows with
+the same key are compared column by column and reported as changed, otherwise
+the diff consists of missing and unexpected rows only.
+
+With matchers, as compiled in the tolerance module, values within tolerance
+count as equal. Rows that are not exactly equal are then paired by key, or by
+the values of the columns without tolerance, and only pairs with values outside
+the tolerance are reported.
+"""
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Matchers = Sequence[Optional[Callable[[Any, Any], bool]]]
+
+
+def hashable(value: Any) -> Any:
+    """A hashable stand-in for a value, equal for equal values."""
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable(v) for v in value)
+    if isinstance(value, dict):
+        return frozenset((hashable(k), hashable(v)) for k, v in value.items())
+    if isinstance(value, bytearray):
+        return bytes(value)
+    if isinstance(value, set):
+        return frozenset(hashable(v) for v in value)
+    return value
+
+
+@dataclass
+class ChangedRow:
+    key: Optional[Tuple]
+    expected: Tuple
+    actual: Tuple
+    # positions of the columns whose values differ
+    changed: List[int]
+    # the row number, for rows that are compared by position instead of key
+    position: Optional[int] = None
+
+
+@dataclass
+class RowDiff:
+    """The rows that are missing, unexpected or changed."""
+
+    columns: List[str]
+    missing: List[Tuple] = field(default_factory=list)
+    unexpected: List[Tuple] = field(default_factory=list)
+    changed: List[ChangedRow] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.missing or self.unexpected or self.changed)
+
+    def format(self, max_rows: int = 10) -> str:
+        """Describe the differences, showing at most max_rows rows of each kind."""
+        lines = []
+        for title, rows in [
+            ("expected rows are missing", self.missing),
+            ("rows were not expected", self.unexpected),
+        ]:
+            if rows:
+                lines.append(f"{len(rows)} {title}:")
+                lines.extend(f"    {row!r}" for row in rows[:max_rows])
+                lines.extend(self._more(rows, max_rows))
+
+        if self.changed:
+            lines.append(f"{len(self.changed)} rows differ:")
+            for row in self.changed[:max_rows]:
+                if row.key is None:
+                    lines.append(f"    at row {row.position}:")
+                else:
+                    lines.append(f"    at key {row.key!r}:")
+                lines.extend(
+                    f"        {self.columns[i]}: expected {row.expected[i]!r},"
+                    f" got {row.actual[i]!r}"
+                    for i in row.changed
+                )
+            lines.extend(self._more(self.changed, max_rows))
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _more(rows: list, max_rows: int) -> List[str]:
+        if len(rows) > max_rows:
+            return [f"    ... and {len(rows) - max_rows} more"]
+        return []
+
+
+def _multiset_difference(
+    left: Iterable[Tuple], right: Iterable[Tuple]
+) -> Tuple[List[Tuple], List[Tuple]]:
+    """The rows only in left and the rows only in right, counting duplicates."""
+    left = list(left)
+    right = list(right)
+    counts = Counter(hashable(row) for row in right)
+    only_left = []
+    for row in left:
+        h = hashable(row)
+        if counts[h]:
+            counts[h] -= 1
+        else:
+            only_left.append(row)
+
+    counts = Counter(hashable(row) for row in left)
+    only_right = []
+    for row in right:
+        h = hashable(row)
+        if counts[h]:
+            counts[h] -= 1
+        else:
+            only_right.append(row)
+
+    return only_left, only_right
+
+
+def _changed_columns(
+    expected: Tuple, actual: Tuple, matchers: Matchers = None
+) -> Optional[List[int]]:
+    """The positions of the columns that differ, or None if the rows have
+    different widths."""
+    if len(expected) != len(actual):
+        return None
+    changed = []
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        match = matchers[i] if matchers else None
+        if not (match(a, b) if match else hashable(a) == hashable(b)):
+            changed.append(i)
+    return changed
+
+
+def diff_rows(
+    expected: Sequence[Tuple],
+    actual: Sequence[Tuple],
+    columns: Sequence[str],
+    key_columns: Sequence[str] = None,
+    matchers: Matchers = None,
+) -> RowDiff:
+    """Compare the rows regardless of their order.
+    Rows of equal key that differ in other columns are reported as changed.
+    With matchers, rows whose values all match are not reported. Without key
+    columns, such rows are searched among the rows with equal values in the
+    columns without a matcher, so that the pairing does not depend on the order
+    of values within tolerance."""
+    columns = list(columns)
+    missing, unexpected = _multiset_difference(expected, actual)
+    diff = RowDiff(columns=columns)
+    if not key_columns:
+        if not any(matchers or []):
+            diff.missing, diff.unexpected = missing, unexpected
+            return diff
+        exact = [i for i, match in enumerate(matchers) if match is None]
+
+        def exact_values(row: Tuple) -> Any:
+            return hashable(tuple(row[i] for i in exact if i < len(row)))
+
+        unexpected_by_values: Dict[Any, List[Tuple]] = defaultdict(list)
+        for row in unexpected:
+            unexpected_by_values[exact_values(row)].append(row)
+
+        for row in missing:
+            candidates = unexpected_by_values.get(exact_values(row), [])
+            for i, other in enumerate(candidates):
+                if _changed_columns(row, other, matchers) == []:
+                    del candidates[i]
+                    break
+            else:
+                diff.missing.append(row)
+
+        diff.unexpected = [
+            row for rows in unexpected_by_values.values() for row in rows
+        ]
+        return diff
+
+    try:
+        key_positions = [columns.index(c) for c in key_columns]
+    except ValueError:
+        raise KeyError(f"The key columns {key_columns} must be among {columns}")
+
+    def key_of(row: Tuple) -> Tuple:
+        return tuple(row[i] for i in key_positions)
+
+    unexpected_by_key: Dict[Any, List[Tuple]] = defaultdict(list)
+    for row in unexpected:
+        unexpected_by_key[hashable(key_of(row))].append(row)
+
+    for row in missing:
+        candidates = unexpected_by_key.get(hashable(key_of(row)))
+        if not candidates:
+            diff.missing.append(row)
+            continue
+        other = candidates.pop(0)
+        changed = _changed_columns(row, other, matchers)
+        if changed is None:
+            diff.missing.append(row)
+            candidates.insert(0, other)
+        elif changed:
+            diff.changed.append(
+                ChangedRow(key=key_of(row), expected=row, actual=other, changed=changed)
+            )
+
+    diff.unexpected = [row for rows in unexpected_by_key.values() for row in rows]
+    return diff
+
+
+def diff_ordered_rows(
+    expected: Sequence[Tuple],
+    actual: Sequence[Tuple],
+    columns: Sequence[str],
+    matchers: Matchers = None,
+) -> RowDiff:
+    """Compare the rows at each position. Rows beyond the end of the other list
+    are reported as missing or unexpected."""
+    diff = RowDiff(columns=list(columns))
+    for i, (row, other) in enumerate(zip(expected, actual)):
+        changed = _changed_columns(row, other, matchers)
+        if changed is None:
+            changed = list(range(min(len(row), len(other))))
+        if changed or len(row) != len(other):
+            diff.changed.append(
+                ChangedRow(
+                    key=None, expected=row, actual=other, changed=changed, position=i
+                )
+            )
+    diff.missing = list(expected[len(actual) :])
+    diff.unexpected = list(actual[len(expected) :])
+    return diff
+
+
+def first_order_difference(expected: Sequence[Tuple], actual: Sequence[Tuple]) -> str:
+    """Describe the first position at which two lists of the same rows differ."""
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if hashable(a) != hashable(b):
+            return (
+                f"The rows are in a different order. First difference at row {i}:\n"
+                f"    expected {a!r}\n"
+                f"    got      {b!r}"
+            )
+    return "The rows are in a different order."
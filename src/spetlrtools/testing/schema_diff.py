@@ -0,0 +1,91 @@
+"""
+Structural comparison of spark schemas.
+
+Both schemas are walked once, side by side, and each difference is reported with
+the path of the field where it occurs, e.g. "items[].price" for a field in the
+structs of an array, or "tags{value}" for the values of a map. Nested structs,
+arrays and maps are compared at any depth.
+"""
+
+from typing import List
+
+from pyspark.sql.types import ArrayType, DataType, MapType, StructType
+
+
+def schema_differences(
+    schema1: StructType,
+    schema2: StructType,
+    compare_nullability=False,
+    compare_metadata=True,
+    compare_field_order=True,
+) -> List[str]:
+    """The differences between the schemas, one line per difference."""
+    differences = []
+
+    def walk(path: str, type1: DataType, type2: DataType):
+        if isinstance(type1, StructType) and isinstance(type2, StructType):
+            fields1 = {f.name: f for f in type1.fields}
+            fields2 = {f.name: f for f in type2.fields}
+            for name in fields1:
+                if name not in fields2:
+                    differences.append(f"{_join(path, name)}: only in the first schema")
+            for name in fields2:
+                if name not in fields1:
+                    differences.append(
+                        f"{_join(path, name)}: only in the second schema"
+                    )
+
+            common1 = [name for name in fields1 if name in fields2]
+            common2 = [name for name in fields2 if name in fields1]
+            if compare_field_order and common1 != common2:
+                differences.append(
+                    f"{path or '<root>'}: field order {common1} != {common2}"
+                )
+
+            for name in common1:
+                f1, f2 = fields1[name], fields2[name]
+                field_path = _join(path, name)
+                if compare_nullability and f1.nullable != f2.nullable:
+                    differences.append(
+                        f"{field_path}: nullable {f1.nullable} != {f2.nullable}"
+                    )
+                if compare_metadata and (f1.metadata or {}) != (f2.metadata or {}):
+                    differences.append(
+                        f"{field_path}: metadata {f1.metadata} != {f2.metadata}"
+                    )
+                walk(field_path, f1.dataType, f2.dataType)
+            return
+
+        if isinstance(type1, ArrayType) and isinstance(type2, ArrayType):
+            if compare_nullability and type1.containsNull != type2.containsNull:
+                differences.append(
+                    f"{path}: containsNull {type1.containsNull} != {type2.containsNull}"
+                )
+            walk(f"{path}[]", type1.elementType, type2.elementType)
+            return
+
+        if isinstance(type1, MapType) and isinstance(type2, MapType):
+            if (
+                compare_nullability
+                and type1.valueContainsNull != type2.valueContainsNull
+            ):
+                differences.append(
+                    f"{path}: valueContainsNull "
+                    f"{type1.valueContainsNull} != {type2.valueContainsNull}"
+                )
+            walk(f"{path}{{key}}", type1.keyType, type2.keyType)
+            walk(f"{path}{{value}}", type1.valueType, type2.valueType)
+            return
+
+        if type1 != type2:
+            differences.append(
+                f"{path or '<root>'}: "
+                f"{type1.simpleString()} != {type2.simpleString()}"
+            )
+
+    walk("", schema1, schema2)
+    return differences
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
@@ -0,0 +1,208 @@
+"""
+Approximate comparison of float and timestamp values in DataframeTestCase.
+
+Tolerances are given either as one value for all float (or timestamp) columns,
+or as a dict from column name to value. For each column, a matcher function is
+compiled once from its spark data type, that compares two values with the
+tolerances at any depth of nesting. For the spark comparison, the same rules
+are expressed as a column expression, with higher order functions for nested
+values.
+
+Two floats a and b match if abs(a - b) <= max(abs_tol, rel_tol * max(abs(a), abs(b))),
+like math.isclose, and two timestamps match if they are at most timestamp_tol apart.
+"""
+
+import datetime
+import math
+from dataclasses import dataclass
+from functools import reduce
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pyspark.sql import Column
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    ArrayType,
+    DataType,
+    DoubleType,
+    FloatType,
+    MapType,
+    StructType,
+    TimestampType,
+)
+
+try:
+    from pyspark.sql.types import TimestampNTZType
+except ImportError:  # pragma: no cover
+    TimestampNTZType = TimestampType
+
+Matcher = Callable[[Any, Any], bool]
+
+PerColumn = Union[None, float, Dict[str, float]]
+
+
+@dataclass
+class Tolerance:
+    rel_tol: float = 0.0
+    abs_tol: float = 0.0
+    timestamp_tol: Optional[datetime.timedelta] = None
+
+    def __bool__(self):
+        return bool(self.rel_tol or self.abs_tol or self.timestamp_tol)
+
+
+def column_tolerances(
+    columns: List[str],
+    rel_tol: PerColumn = None,
+    abs_tol: PerColumn = None,
+    timestamp_tol: Union[
+        None, datetime.timedelta, Dict[str, datetime.timedelta]
+    ] = None,
+) -> List[Tolerance]:
+    """The tolerance of each column, from single values or dicts by column name."""
+    for tol in [rel_tol, abs_tol, timestamp_tol]:
+        if isinstance(tol, dict):
+            unknown = set(tol) - set(columns)
+            if unknown:
+                raise KeyError(f"Tolerances given for unknown columns {unknown}")
+
+    def of(tol, column):
+        return tol.get(column) if isinstance(tol, dict) else tol
+
+    return [
+        Tolerance(
+            rel_tol=of(rel_tol, c) or 0.0,
+            abs_tol=of(abs_tol, c) or 0.0,
+            timestamp_tol=of(timestamp_tol, c),
+        )
+        for c in columns
+    ]
+
+
+def compile_matcher(data_type: DataType, tol: Tolerance) -> Optional[Matcher]:
+    """A function telling if two values of the data type match within the
+    tolerance, or None if the values must be equal."""
+    if not tol:
+        return None
+
+    if isinstance(data_type, (FloatType, DoubleType)):
+        if not (tol.rel_tol or tol.abs_tol):
+            return None
+
+        def match_float(a, b):
+            if a is None or b is None:
+                return a is b
+            if math.isnan(a) or math.isnan(b):
+                return math.isnan(a) and math.isnan(b)
+            return math.isclose(a, b, rel_tol=tol.rel_tol, abs_tol=tol.abs_tol)
+
+        return match_float
+
+    if isinstance(data_type, (TimestampType, TimestampNTZType)):
+        if not tol.timestamp_tol:
+            return None
+        return lambda a, b: (
+            a is b if a is None or b is None else abs(a - b) <= tol.timestamp_tol
+        )
+
+    if isinstance(data_type, ArrayType):
+        element = compile_matcher(data_type.elementType, tol)
+        if element is None:
+            return None
+        return lambda a, b: (
+            a is b
+            if a is None or b is None
+            else len(a) == len(b) and all(element(x, y) for x, y in zip(a, b))
+        )
+
+    if isinstance(data_type, MapType):
+        value = compile_matcher(data_type.valueType, tol)
+        if value is None:
+            return None
+        return lambda a, b: (
+            a is b
+            if a is None or b is None
+            else a.keys() == b.keys() and all(value(a[k], b[k]) for k in a)
+        )
+
+    if isinstance(data_type, StructType):
+        fields = [compile_matcher(f.dataType, tol) for f in data_type.fields]
+        if not any(fields):
+            return None
+        fields = [f or _equal for f in fields]
+        return lambda a, b: (
+            a is b
+            if a is None or b is None
+            else len(a) == len(b) and all(m(x, y) for m, x, y in zip(fields, a, b))
+        )
+
+    return None
+
+
+def _equal(a, b) -> bool:
+    return a == b
+
+
+def compile_matchers(
+    schema: StructType, tolerances: List[Tolerance]
+) -> List[Optional[Matcher]]:
+    """One matcher per column of the schema, None where values must be equal."""
+    return [compile_matcher(f.dataType, t) for f, t in zip(schema.fields, tolerances)]
+
+
+def spark_match(
+    data_type: DataType, expected: Column, actual: Column, tol: Tolerance
+) -> Column:
+    """Column expression telling if the two values match within the tolerance,
+    with the same rules as compile_matcher, also inside arrays, maps and structs."""
+    if compile_matcher(data_type, tol) is None:
+        return expected.eqNullSafe(actual)
+
+    both_nan = F.lit(False)
+    if isinstance(data_type, (FloatType, DoubleType)):
+        bound = F.greatest(
+            F.lit(tol.abs_tol),
+            F.lit(tol.rel_tol) * F.greatest(F.abs(expected), F.abs(actual)),
+        )
+        close = F.abs(expected - actual) <= bound
+        both_nan = F.isnan(expected) & F.isnan(actual)
+    elif isinstance(data_type, (TimestampType, TimestampNTZType)):
+        micros = tol.timestamp_tol // datetime.timedelta(microseconds=1)
+        close = (
+            F.abs(
+                F.unix_micros(expected.cast("timestamp"))
+                - F.unix_micros(actual.cast("timestamp"))
+            )
+            <= micros
+        )
+    elif isinstance(data_type, ArrayType):
+        element = data_type.elementType
+        close = (F.size(expected) == F.size(actual)) & F.forall(
+            F.zip_with(expected, actual, lambda x, y: spark_match(element, x, y, tol)),
+            lambda matches: matches,
+        )
+    elif isinstance(data_type, MapType):
+        value = data_type.valueType
+        close = (
+            F.array_sort(F.map_keys(expected)) == F.array_sort(F.map_keys(actual))
+        ) & F.forall(
+            F.map_keys(expected),
+            lambda k: spark_match(
+                value, F.element_at(expected, k), F.element_at(actual, k), tol
+            ),
+        )
+    else:
+        close = reduce(
+            lambda x, y: x & y,
+            [
+                spark_match(
+                    f.dataType, expected.getField(f.name), actual.getField(f.name), tol
+                )
+                for f in data_type.fields
+            ],
+        )
+
+    return (
+        F.when(expected.isNull() | actual.isNull(), expected.isNull() & actual.isNull())
+        .when(both_nan, True)
+        .otherwise(F.coalesce(close, F.lit(False)))
+    )
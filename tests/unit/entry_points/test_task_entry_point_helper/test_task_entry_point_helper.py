@@ -34,6 +34,25 @@ class TestModuleHelper(unittest.TestCase):
 
         self.assertEqual(entry_points, expected_output)
 
+    def test_get_all_task_entry_points_static(self):
+        entry_points = TaskEntryPointHelper.get_all_task_entry_points(
+            [self.test_path_1, self.test_path_2],
+            entry_point_objects=["TaskEntryPoint", "OtherBaseClass"],
+            static=True,
+        )
+
+        expected_output = {
+            "spetlrtools.task_entry_points": [
+                f"{self.test_path_1}.foo.A = " + f"{self.test_path_1}.foo:A.task",
+                f"{self.test_path_1}.submodule.bar.B = "
+                + f"{self.test_path_1}.submodule.bar:B.task",
+                f"{self.test_path_2}.foo.A = {self.test_path_2}.foo:A.task",
+                f"{self.test_path_2}.foo.B = {self.test_path_2}.foo:B.task",
+            ]
+        }
+
+        self.assertEqual(entry_points, expected_output)
+
     def test_type_error(self):
         with self.assertRaises(TypeError):
             TaskEntryPointHelper.get_all_task_entry_points(
@@ -0,0 +1,6 @@
+# a part of the test for the ModuleHelper
+from collections import OrderedDict as Ordered
+
+
+class Settings(Ordered):
+    pass
@@ -0,0 +1,13 @@
+# a part of the test for the ModuleHelper
+from collections import OrderedDict
+
+
+def make_base():
+    return OrderedDict
+
+
+Base = make_base()
+
+
+class Dynamic(Base):
+    pass
@@ -1,5 +1,8 @@
+import importlib
 import sys
 import unittest
+from collections import OrderedDict
+from unittest.mock import patch
 
 from spetlrtools.helpers import ModuleHelper
 
@@ -93,6 +96,62 @@ class TestModuleHelper(unittest.TestCase):
             "unit.helpers.module_helper.test_module_helper.ModuleTwo" in classes
         )
 
+    def test_find_classes_of_type(self):
+        classes = ModuleHelper.find_classes_of_type(self.test_module, DummyType)
+
+        self.assertEqual(
+            sorted(classes),
+            [
+                "unit.helpers.module_helper.test_module_helper.DummyType",
+                "unit.helpers.module_helper.test_module_helper.ModuleOne",
+                "unit.helpers.module_helper.test_module_helper.ModuleTwo",
+            ],
+        )
+
+    def test_find_classes_of_type_imports_only_ambiguous_modules(self):
+        package = "unit.helpers.module_helper.dummy_module"
+        with patch(
+            "spetlrtools.helpers.module_helper.importlib.import_module",
+            wraps=importlib.import_module,
+        ) as import_module:
+            classes = ModuleHelper.find_classes_of_type(
+                package, OrderedDict, main_classes=False
+            )
+
+        # the aliased base is resolved from the source, the base that is the
+        # result of a function call needs the module to be imported
+        self.assertEqual(
+            classes,
+            {
+                f"{package}.baz.Settings": {
+                    "module_name": f"{package}.baz",
+                    "cls_name": "Settings",
+                    "path": ModuleHelper.get_module_files(
+                        "tests/unit/helpers/module_helper/dummy_module"
+                    )["dummy_module.baz"],
+                },
+                f"{package}.submodule.dynamic.Dynamic": {
+                    "module_name": f"{package}.submodule.dynamic",
+                    "cls_name": "Dynamic",
+                    "path": ModuleHelper.get_module_files(
+                        "tests/unit/helpers/module_helper/dummy_module"
+                    )["dummy_module.submodule.dynamic"],
+                },
+            },
+        )
+        import_module.assert_called_once_with(f"{package}.submodule.dynamic")
+
+    def test_find_classes_of_type_in_parallel(self):
+        classes = ModuleHelper.find_classes_of_type(
+            "unit.helpers.module_helper.dummy_module", "OrderedDict", workers=2
+        )
+
+        self.assertEqual(len(classes), 2)
+
+    def test_find_classes_of_type_with_invalid_package(self):
+        with self.assertRaises(ModuleNotFoundError):
+            ModuleHelper.find_classes_of_type("invalid_package_name", DummyType)
+
 
 if __name__ == "__main__":
     unittest.main()
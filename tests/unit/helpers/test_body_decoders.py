@@ -0,0 +1,49 @@
+import gzip
+import json
+import unittest
+
+from pyspark.sql.types import LongType, StringType, StructField, StructType
+from spetlr.spark import Spark
+
+from spetlrtools.helpers.body_decoders import GzipDecoder
+from spetlrtools.helpers.ExtractEncodedBody import ExtractEncodedBody
+from spetlrtools.helpers.ExtractEncodedBodyUC import ExtractEncodedBodyUC
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class BodyDecoderTests(unittest.TestCase):
+    bodies = [{"a": "text", "b": 1}, {"a": "text2", "b": 2}]
+    expected_schema = StructType(
+        [StructField("a", StringType(), True), StructField("b", LongType(), True)]
+    )
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.df = Spark.get().createDataFrame(
+            [(gzip.compress(json.dumps(b).encode("utf-8")),) for b in cls.bodies]
+            + [(None,)],
+            "Body binary",
+        )
+
+    @unittest.skipIf(pyarrow is None, "pandas udfs need pyarrow")
+    def test_01_gzip(self):
+        for extractor in [
+            ExtractEncodedBody(body_decoder=GzipDecoder()),
+            ExtractEncodedBodyUC(body_decoder=GzipDecoder()),
+        ]:
+            with self.subTest(extractor=type(extractor).__name__):
+                df = extractor.transform_df(self.df)
+                self.assertEqual(self.expected_schema, df.schema["Body"].dataType)
+                rows = df.collect()
+                self.assertEqual(
+                    [("text", 1), ("text2", 2), None],
+                    [None if r["Body"] is None else tuple(r["Body"]) for r in rows],
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
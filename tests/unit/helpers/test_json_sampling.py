@@ -0,0 +1,63 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import pyspark.sql.functions as f
+from spetlr.spark import Spark
+
+from spetlrtools.helpers.ExtractEncodedBody import ExtractEncodedBody
+from spetlrtools.helpers.json_sampling import (
+    FractionSampling,
+    LimitSampling,
+    PartitionSampling,
+    ReservoirSampling,
+    TimeWindowSampling,
+)
+
+
+class JsonSamplingTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.df = Spark.get().range(0, 100, numPartitions=4)
+
+    def test_01_partition_sampling(self):
+        rows = PartitionSampling(2).apply(self.df).collect()
+        self.assertEqual([0, 1, 25, 26, 50, 51, 75, 76], sorted(r.id for r in rows))
+
+    def test_02_random_sampling(self):
+        reservoir = ReservoirSampling(5, seed=1)
+        ids = [r.id for r in reservoir.apply(self.df).collect()]
+        self.assertEqual(5, len(set(ids)))
+        self.assertEqual(ids, [r.id for r in reservoir.apply(self.df).collect()])
+
+        sampled = FractionSampling(0.5, seed=1).apply(self.df).count()
+        self.assertTrue(20 < sampled < 80)
+        self.assertEqual(3, LimitSampling(3).apply(self.df).count())
+
+    def test_03_time_window(self):
+        end = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        df = self.df.withColumn(
+            "enqueuedTime",
+            f.lit(end) - f.expr("make_interval(0, 0, 0, 0, id, 0, 0)"),
+        )
+        sampling = TimeWindowSampling("enqueuedTime", timedelta(hours=3), end=end)
+        self.assertEqual([0, 1, 2], sorted(r.id for r in sampling.apply(df).collect()))
+
+    def test_04_late_fields_are_found(self):
+        # the field only appears at the start of the last partition
+        bodies = [{"a": i} if i != 75 else {"a": i, "late": True} for i in range(100)]
+        rows = [(json.dumps(b).encode("utf-8"),) for b in bodies]
+        spark = Spark.get()
+        df = spark.createDataFrame(
+            spark.sparkContext.parallelize(rows, 4), "Body binary"
+        )
+
+        first_rows = ExtractEncodedBody(data_limit=5).extract_schema(df)
+        self.assertEqual(["a"], first_rows.fieldNames())
+
+        extractor = ExtractEncodedBody(sampling=PartitionSampling(1))
+        self.assertEqual(["a", "late"], extractor.extract_schema(df).fieldNames())
+
+
+if __name__ == "__main__":
+    unittest.main()
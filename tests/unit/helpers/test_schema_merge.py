@@ -0,0 +1,54 @@
+import unittest
+
+import pyspark.sql.types as T
+
+from spetlrtools.helpers.schema_merge import merge_schemas
+
+
+class SchemaMergeTests(unittest.TestCase):
+    def test_01_merge(self):
+        first = T.StructType(
+            [
+                T.StructField("a", T.LongType()),
+                T.StructField(
+                    "items",
+                    T.ArrayType(T.StructType([T.StructField("x", T.LongType())])),
+                ),
+            ]
+        )
+        second = T.StructType(
+            [
+                T.StructField("b", T.StringType()),
+                T.StructField("a", T.StringType()),
+                T.StructField(
+                    "items",
+                    T.ArrayType(T.StructType([T.StructField("y", T.DoubleType())])),
+                ),
+            ]
+        )
+        self.assertEqual(
+            T.StructType(
+                [
+                    # the first schema wins on conflicts
+                    T.StructField("a", T.LongType()),
+                    T.StructField(
+                        "items",
+                        T.ArrayType(
+                            T.StructType(
+                                [
+                                    T.StructField("x", T.LongType()),
+                                    T.StructField("y", T.DoubleType()),
+                                ]
+                            )
+                        ),
+                    ),
+                    T.StructField("b", T.StringType()),
+                ]
+            ),
+            merge_schemas([first, second]),
+        )
+        self.assertEqual(T.StructType([]), merge_schemas([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 
 from pyspark.sql import Row
 
-from spetlrtools.testing.TupleComparer import TupleComparer
+from spetlrtools.testing.TupleComparer import TupleComparer, null_safe_key
 
 
 class TestTupleComparer(unittest.TestCase):
@@ -14,6 +14,11 @@ class TestTupleComparer(unittest.TestCase):
         self.assertGreater(tc1, tc2)
 
     def test_02_sort(self):
+        for key in [TupleComparer, null_safe_key]:
+            with self.subTest(key=key):
+                self._test_sort(key)
+
+    def _test_sort(self, key):
         # Sort all rows even if they contain Nulls
         now = datetime.now()
         later = now + timedelta(hours=1)
@@ -30,7 +35,7 @@ class TestTupleComparer(unittest.TestCase):
             Row(a=None, b=None, c=None, d=(None, True)),
         ]
 
-        s = sorted(rows, key=TupleComparer)
+        s = sorted(rows, key=key)
         self.assertEqual(
             s,
             [
@@ -46,3 +51,21 @@ class TestTupleComparer(unittest.TestCase):
                 Row(a=later, b=None, c=None, d=None),
             ],
         )
+
+    def test_03_null_safe_key_nested(self):
+        rows = [
+            (1, [(2, None), (1, "b")], {"b": 2, "a": None}),
+            (1, [(2, None), (1, None)], {"a": 1}),
+            (1, None, {"a": None, "b": 2}),
+            (None, [], {}),
+            (1, [(2, None)], None),
+        ]
+        self.assertEqual(
+            [rows[3], rows[2], rows[4], rows[1], rows[0]],
+            sorted(rows, key=null_safe_key),
+        )
+        # dicts are compared by content, not by insertion order
+        self.assertEqual(
+            null_safe_key((1, {"a": None, "b": 2})),
+            null_safe_key((1, {"b": 2, "a": None})),
+        )
@@ -3,6 +3,7 @@ import unittest
 from pyspark.sql.types import StringType, StructField, StructType
 from spetlr.spark import Spark
 
+from spetlrtools.format.naming import validate_names
 from spetlrtools.format.validate_camelcased_cols import validate_camelcased_cols
 
 
@@ -169,3 +170,16 @@ class CamelCaseTest(unittest.TestCase):
 
         self.assertFalse(validate_camelcased_cols(df, print_result=True))
         self.assertTrue(validate_camelcased_cols(df, ["camelCased"], print_result=True))
+
+    def test_10_same_rule_as_validate_names(self):
+        names = ["camelCased", "abc_def", "abc-def", "col1", "colA1", "notCamelCAsed"]
+        schema = StructType([StructField(n, StringType(), True) for n in names])
+        df = Spark.get().createDataFrame([tuple(None for _ in names)], schema)
+
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    validate_names(df, cols_to_check=[name]).passed,
+                    validate_camelcased_cols(df, [name]),
+                )
+        self.assertFalse(validate_camelcased_cols(df, ["abc_def"]))
@@ -0,0 +1,64 @@
+import asyncio
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from spetlrtools.test_job.async_api import submit_async, task_output, watch
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.FakeWorkspace import FakeWorkspace
+from spetlrtools.test_job.RemoteLocation import RemoteLocation
+
+
+class AsyncApiTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._client = DbCli.w
+        self._date = RemoteLocation.date
+        # other tests fix the time stamp of the remote location
+        RemoteLocation.date = None
+        self._cwd = os.getcwd()
+        self._tmpdir = TemporaryDirectory()
+        os.chdir(self._tmpdir.name)
+        for job in ["jobA", "jobB"]:
+            Path("tests", "cluster", job).mkdir(parents=True)
+            Path("tests", "cluster", job, "test_it.py").write_text("assert True\n")
+
+    def tearDown(self) -> None:
+        DbCli.w = self._client
+        RemoteLocation.date = self._date
+        os.chdir(self._cwd)
+        self._tmpdir.cleanup()
+
+    def test_01_concurrent_runs(self):
+        async def run_one(i: int):
+            run_id = await submit_async(
+                test_path="tests",
+                cluster={"num_workers": i},
+                wheels="dist/*.whl",
+                tasks_from=["tests/cluster"],
+            )
+            states = [state async for state in watch(run_id, poll_interval=0.05)]
+            return run_id, states
+
+        async def run_all():
+            return await asyncio.gather(*(run_one(i) for i in range(5)))
+
+        out = io.StringIO()
+        with FakeWorkspace(task_duration=0.2) as fake, redirect_stdout(out):
+            fake.connect()
+            results = asyncio.run(run_all())
+            logs = asyncio.run(task_output(results[0][0], "tests_cluster_jobA"))
+
+        # nothing is printed
+        self.assertEqual("", out.getvalue())
+
+        self.assertEqual(5, len({run_id for run_id, _ in results}))
+        for _, states in results:
+            self.assertTrue(states[-1].overall.success)
+            self.assertEqual(2, len(states[-1].tasks))
+
+        # each submission got its own remote folder
+        self.assertEqual(5, len({Path(p).parent for p in fake.dbfs if "main.py" in p}))
+        self.assertIn("tests_cluster_jobA", logs)
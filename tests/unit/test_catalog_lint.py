@@ -0,0 +1,99 @@
+import datetime
+import unittest
+
+from pyspark.sql.types import ArrayType, MapType, NullType, StructField, StructType
+from spetlr.spark import Spark
+
+from spetlrtools.format.catalog_lint import TypeRule, lint_catalog, parse_type_names
+from spetlrtools.format.naming import SNAKE_CASE
+
+
+class CatalogLintTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        Spark.get().createDataFrame(
+            [
+                ("dev", "sales", "orders", "orderId", "bigint"),
+                ("dev", "sales", "orders", "TotalAmount", "double"),
+                (
+                    "dev",
+                    "sales",
+                    "orders",
+                    "lines",
+                    "array<struct<unitPrice:decimal(10,2),Item_Name:string>>",
+                ),
+                ("dev", "information_schema", "columns", "Bad_Name", "string"),
+                ("prod", "sales", "orders", "Bad_Name", "string"),
+            ],
+            "table_catalog string, table_schema string, table_name string, "
+            "column_name string, full_data_type string",
+        ).createOrReplaceTempView("lint_columns")
+
+    def test_01_parse_type_names(self):
+        self.assertEqual(
+            parse_type_names(
+                "struct<a:int,`b c`:array<struct<d:decimal(10, 2) NOT NULL>>,"
+                "e:map<string,struct<f:string>>>"
+            ),
+            StructType(
+                [
+                    StructField("a", NullType()),
+                    StructField(
+                        "b c",
+                        ArrayType(StructType([StructField("d", NullType())])),
+                    ),
+                    StructField(
+                        "e",
+                        MapType(NullType(), StructType([StructField("f", NullType())])),
+                    ),
+                ]
+            ),
+        )
+        self.assertEqual(parse_type_names("bigint"), NullType())
+
+    def test_02_lint(self):
+        result = lint_catalog(
+            catalog_pattern="d*",
+            type_rules=[TypeRule("no float amounts", "float|double", ".*Amount")],
+            columns_table="lint_columns",
+        )
+        rows = sorted(
+            (r.table_name, r.path, r.rule, r.suggestion) for r in result.collect()
+        )
+        self.assertEqual(
+            rows,
+            [
+                ("orders", "TotalAmount", "camelCase", "totalAmount"),
+                ("orders", "TotalAmount", "no float amounts", None),
+                ("orders", "lines[].Item_Name", "camelCase", "itemName"),
+            ],
+        )
+
+    def test_03_other_convention(self):
+        result = lint_catalog(
+            catalog_pattern="dev",
+            schema_pattern="sales",
+            convention=SNAKE_CASE,
+            columns_table="lint_columns",
+        )
+        self.assertEqual(
+            sorted(r.path for r in result.collect()),
+            ["TotalAmount", "lines[].Item_Name", "lines[].unitPrice", "orderId"],
+        )
+
+    def test_04_linted_at_in_other_session_time_zone(self):
+        spark = Spark.get()
+        time_zone = spark.conf.get("spark.sql.session.timeZone")
+        spark.conf.set("spark.sql.session.timeZone", "Asia/Tokyo")
+        try:
+            rows = lint_catalog(catalog_pattern="prod", columns_table="lint_columns")
+            rows = rows.collect()
+        finally:
+            spark.conf.set("spark.sql.session.timeZone", time_zone)
+
+        self.assertEqual(1, len(rows))
+        self.assertEqual(1, len({r.run_id for r in rows}))
+        # collected timestamps are naive local times
+        linted_at = rows[0].linted_at.astimezone(datetime.timezone.utc)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.assertLess(abs(now - linted_at), datetime.timedelta(minutes=5))
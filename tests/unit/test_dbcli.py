@@ -0,0 +1,140 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from databricks.sdk.errors import NotFound, TemporarilyUnavailable, TooManyRequests
+from packaging.specifiers import SpecifierSet
+
+from spetlrtools.test_job.dbcli import DbCli, TokenBucket
+from spetlrtools.test_job.FakeWorkspace import FakeWorkspace
+
+
+class DbCliTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._settings = (
+            DbCli.max_calls_per_second,
+            DbCli.max_retries,
+            DbCli.backoff_seconds,
+        )
+        DbCli.configure(max_calls_per_second=None, max_retries=3, backoff_seconds=0)
+        DbCli.stats.reset()
+
+    def tearDown(self) -> None:
+        rate, retries, backoff = self._settings
+        DbCli.configure(
+            max_calls_per_second=rate, max_retries=retries, backoff_seconds=backoff
+        )
+        DbCli.stats.reset()
+
+    def test_01_retry_on_throttling(self):
+        errors = [TooManyRequests("slow down"), TemporarilyUnavailable("busy")]
+
+        def flaky():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        self.assertEqual("ok", DbCli().call(flaky))
+        self.assertEqual(3, DbCli.stats.calls)
+        self.assertEqual(2, DbCli.stats.retries)
+        self.assertEqual(1, DbCli.stats.throttled)
+        self.assertEqual(0, DbCli.stats.failures)
+
+    def test_02_give_up_after_max_retries(self):
+        def always_throttled():
+            raise TooManyRequests("slow down")
+
+        with self.assertRaises(TooManyRequests):
+            DbCli().call(always_throttled)
+        self.assertEqual(4, DbCli.stats.calls)
+        self.assertEqual(3, DbCli.stats.retries)
+        self.assertEqual(1, DbCli.stats.failures)
+
+    def test_03_no_retry_on_client_errors(self):
+        def missing():
+            raise NotFound("nope")
+
+        with self.assertRaises(NotFound):
+            DbCli().call(missing)
+        self.assertEqual(1, DbCli.stats.calls)
+        self.assertEqual(0, DbCli.stats.retries)
+
+    def test_04_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda _: bucket.acquire(), range(11)))
+        # one token is available up front, the other ten arrive at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_05_concurrent_counters(self):
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: DbCli().call(lambda: None), range(200)))
+        self.assertEqual(200, DbCli.stats.calls)
+        self.assertIn("API calls: 200", DbCli.stats.summary())
+
+    def test_06_retries_of_a_real_client(self):
+        client = DbCli.w
+        try:
+            with FakeWorkspace(throttle_every=3) as fake:
+                fake.connect()
+                DbCli.stats.reset()
+                start = time.monotonic()
+                for _ in range(6):
+                    self.assertEqual(fake.user_name, DbCli().whoami())
+                elapsed = time.monotonic() - start
+        finally:
+            DbCli.w = client
+
+        # the throttled calls are retried by DbCli, not inside the sdk
+        self.assertGreater(fake.throttled, 0)
+        self.assertEqual(fake.throttled, DbCli.stats.throttled)
+        self.assertEqual(fake.throttled, DbCli.stats.retries)
+        self.assertEqual(6 + fake.throttled, DbCli.stats.calls)
+        # without the retry-after second that the sdk assumes for each 429
+        self.assertLess(elapsed, fake.throttled)
+
+    def test_07_submit_retries_with_the_same_token(self):
+        bodies = []
+
+        class FakeApi:
+            def do(self, method, path, body):
+                bodies.append(body)
+                if len(bodies) == 1:
+                    raise TemporarilyUnavailable("reply lost")
+                return {"run_id": 42}
+
+        client = DbCli.w
+        try:
+            DbCli.w = type("FakeClient", (), {})()
+            DbCli.w.jobs = type("FakeJobs", (), {})()
+            DbCli.w.jobs._api = FakeApi()
+            self.assertEqual(42, DbCli().submit({"run_name": "x"}))
+        finally:
+            DbCli.w = client
+
+        self.assertEqual(2, len(bodies))
+        self.assertIs(bodies[0], bodies[1])
+        self.assertTrue(bodies[0]["idempotency_token"])
+
+    def test_08_untested_sdk_version(self):
+        """With an sdk version whose internals are not tested, the client is left
+        to retry its requests itself, and DbCli only counts the calls."""
+        client = DbCli.w
+        try:
+            with mock.patch(
+                "spetlrtools.test_job.dbcli.PATCHED_SDK_VERSIONS", SpecifierSet("<0")
+            ), FakeWorkspace(throttle_every=3) as fake:
+                with self.assertWarns(UserWarning):
+                    fake.connect()
+                DbCli.stats.reset()
+                for _ in range(3):
+                    self.assertEqual(fake.user_name, DbCli().whoami())
+        finally:
+            DbCli.w = client
+            DbCli.retries_requests = True
+
+        self.assertEqual(1, fake.throttled)
+        self.assertEqual(3, DbCli.stats.calls)
+        self.assertEqual(0, DbCli.stats.retries)
@@ -1,6 +1,11 @@
 import json
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
 
+import pyspark.sql.functions as f
+from pyspark.sql import Observation
 from pyspark.sql.types import (
     BinaryType,
     BooleanType,
@@ -14,6 +19,8 @@ from pyspark.sql.types import (
 from spetlr.spark import Spark
 
 from spetlrtools.helpers.ExtractEncodedBody import ExtractEncodedBody
+from spetlrtools.helpers.json_parsing import split_corrupt_records
+from spetlrtools.helpers.SchemaRegistry import FileSchemaRegistry
 
 
 class ExtractEncodedBodyTest(unittest.TestCase):
@@ -247,3 +254,165 @@ class ExtractEncodedBodyTest(unittest.TestCase):
         self.assertEqual(
             self.expected_transformed_schema_w_new_col_keep_orignal, df_unpacked.schema
         )
+
+    def test_07_schema_registry(self):
+        """The schema is inferred once, and new fields are merged from the rows
+        that do not fit the stored schema."""
+        with TemporaryDirectory() as tmp:
+            registry = FileSchemaRegistry(Path(tmp) / "schemas.json")
+            extractor = ExtractEncodedBody(
+                schema_registry=registry, registry_key="topic"
+            )
+
+            df_unpacked = extractor.transform_df(self.df_input)
+            self.assertEqual(self.expected_transformed_schema, df_unpacked.schema)
+            self.assertEqual(self.body_pyspark_schema, registry.get("topic"))
+
+            # the stored schema is reused
+            with mock.patch.object(
+                ExtractEncodedBody, "extract_schema", side_effect=AssertionError
+            ) as extract_schema:
+                extractor = ExtractEncodedBody(
+                    schema_registry=registry,
+                    registry_key="topic",
+                    merge_new_fields=False,
+                )
+                df_unpacked = extractor.transform_df(self.df_input)
+                self.assertEqual(self.expected_transformed_schema, df_unpacked.schema)
+                extract_schema.assert_not_called()
+
+            # a new field is merged into the stored schema
+            df_new = Spark.get().createDataFrame(
+                [(json.dumps({"a": "text3", "e": [1]}).encode("utf-8"),)],
+                self.schema1,
+            )
+            extractor = ExtractEncodedBody(
+                schema_registry=registry, registry_key="topic"
+            )
+            with self.assertWarns(UserWarning):
+                df_unpacked = extractor.transform_df(self.df_input.union(df_new))
+            self.assertEqual(
+                ["a", "b", "c", "d", "e"], registry.get("topic").fieldNames()
+            )
+            self.assertEqual(
+                [1], df_unpacked.where("Body.a = 'text3'").collect()[0]["Body"]["e"]
+            )
+
+            # only the sampled rows are checked for new fields
+            df_late = Spark.get().createDataFrame(
+                [(json.dumps({"a": "text4", "f": 1}).encode("utf-8"),)],
+                self.schema1,
+            )
+            extractor = ExtractEncodedBody(
+                schema_registry=registry, registry_key="topic", data_limit=1
+            )
+            extractor.transform_df(self.df_input.union(df_late))
+            self.assertNotIn("f", registry.get("topic").fieldNames())
+
+    def test_08_inference_in_jvm(self):
+        """The schema is inferred in the JVM, with the same result as the rdd path."""
+        jvm_schema = self.extractor.extract_schema(self.df_input)
+        strings = self.df_input.select(f.col("Body").cast("string").alias("value"))
+        rdd_schema = Spark.get().read.json(strings.rdd.map(lambda row: row.value))
+        self.assertEqual(rdd_schema.schema, jvm_schema)
+
+    def test_08b_no_jvm(self):
+        """Without access to the JVM, e.g. with spark connect, the inference fails
+        with a pointer to ExtractEncodedBodyUC."""
+        strings = mock.Mock(sparkSession=mock.Mock(spec=[]))
+        with self.assertRaises(ValueError) as cm:
+            ExtractEncodedBody._infer(strings)
+        self.assertIn("ExtractEncodedBodyUC", str(cm.exception))
+
+    def test_09_message_types(self):
+        """Each message type gets its own schema, and each body is parsed only
+        against the schema of its type."""
+        bodies = [
+            {"type": "order", "id": 1, "amount": 2.5},
+            {"type": "customer", "id": "c1", "name": "Ann"},
+            {"type": "order", "id": 2, "lines": [{"sku": "x"}]},
+            {"id": 3},
+        ]
+        df = Spark.get().createDataFrame(
+            [(json.dumps(b).encode("utf-8"),) for b in bodies], self.schema1
+        )
+        extractor = ExtractEncodedBody(new_column_w_extracted_body="Message")
+
+        schemas = extractor.extract_schemas_by_type(df)
+        self.assertEqual(["customer", "order"], sorted(schemas))
+        self.assertEqual(
+            ["amount", "id", "lines", "type"], schemas["order"].fieldNames()
+        )
+        self.assertEqual(StringType(), schemas["customer"]["id"].dataType)
+        self.assertEqual(LongType(), schemas["order"]["id"].dataType)
+
+        rows = extractor.transform_df_by_type(df, schemas=schemas).collect()
+        self.assertEqual(["Message"], list(rows[0].asDict()))
+        self.assertEqual(1, rows[0]["Message"]["order"]["id"])
+        self.assertIsNone(rows[0]["Message"]["customer"])
+        self.assertEqual("Ann", rows[1]["Message"]["customer"]["name"])
+        self.assertEqual(Row(customer=None, order=None), rows[3]["Message"])
+
+        separate = extractor.transform_df_by_type(df, separate=True)
+        self.assertEqual(2, separate["order"].count())
+        self.assertEqual(
+            ["Ann"], [r["Message"]["name"] for r in separate["customer"].collect()]
+        )
+
+    def test_10_corrupt_records(self):
+        """Bodies that fail to parse are kept aside and counted in the same pass."""
+        bad_bodies = [b'{"a": "x", "b": "not a number"}', b"{broken"]
+        df = self.df_input.union(
+            Spark.get().createDataFrame(
+                [(body,) for body in bad_bodies] + [(None,)], self.schema1
+            )
+        )
+        extractor = ExtractEncodedBody(
+            schema_registry=mock.Mock(get=lambda key: self.body_pyspark_schema),
+            merge_new_fields=False,
+        )
+        metrics = Observation()
+        parsed = extractor.transform_df(
+            df, corrupt_record_column="corrupt", metrics=metrics
+        ).cache()
+        rows = parsed.collect()
+
+        self.assertEqual(["Body", "corrupt"], parsed.columns)
+        self.assertEqual(
+            {"{broken", '{"a": "x", "b": "not a number"}'},
+            {r["corrupt"] for r in rows if r["corrupt"] is not None},
+        )
+        self.assertEqual(
+            dict(
+                rows=5,
+                rows_parsed=2,
+                rows_failed=2,
+                bytes=sum(len(b) for b in [self.binary_data1, self.binary_data2])
+                + sum(len(b) for b in bad_bodies),
+            ),
+            metrics.get,
+        )
+
+        good, failed = split_corrupt_records(parsed, "corrupt")
+        self.assertEqual(["Body"], good.columns)
+        self.assertEqual(3, good.count())
+        self.assertEqual({None}, {r["Body"] for r in failed.collect()})
+
+    def test_10b_schema_with_corrupt_record_field(self):
+        """A schema that has a _corrupt_record field keeps it in the output."""
+        schema = StructType(
+            self.body_pyspark_schema.fields
+            + [StructField("_corrupt_record", StringType(), True)]
+        )
+        df = self.df_input.union(
+            Spark.get().createDataFrame([(b"{broken",)], self.schema1)
+        )
+        extractor = ExtractEncodedBody(
+            schema_registry=mock.Mock(get=lambda key: schema),
+            merge_new_fields=False,
+        )
+        rows = extractor.transform_df(df).collect()
+        self.assertEqual(schema, extractor.transform_df(df).schema["Body"].dataType)
+        self.assertEqual(
+            [None, None, "{broken"], [r["Body"]["_corrupt_record"] for r in rows]
+        )
@@ -2,6 +2,7 @@ import json
 import unittest
 
 from pyspark.sql.types import (
+    ArrayType,
     BinaryType,
     BooleanType,
     DoubleType,
@@ -267,3 +268,83 @@ class ExtractEncodedBodyTestUC(unittest.TestCase):
         self.assertEqual(
             self.expected_transformed_schema_w_new_col_keep_orignal, df_unpacked.schema
         )
+
+    def test_07_merged_sample_schema(self):
+        """Fields that are missing in the first row are inferred from later rows,
+        and the schema is inferred only once."""
+        df = Spark.get().createDataFrame(
+            [
+                (json.dumps(body).encode("utf-8"),)
+                for body in [{"a": 1}, {"a": 2.5, "b": "x"}, {"c": [{"d": True}]}]
+            ],
+            self.schema1,
+        )
+        extractor = ExtractEncodedBodyUC()
+        self.assertEqual(
+            StructType(
+                [
+                    StructField("a", DoubleType(), True),
+                    StructField("b", StringType(), True),
+                    StructField(
+                        "c",
+                        ArrayType(
+                            StructType([StructField("d", BooleanType(), True)]), True
+                        ),
+                        True,
+                    ),
+                ]
+            ),
+            extractor.extract_schema(df)["Body"].dataType,
+        )
+
+        # the cached schema is used, even for a dataframe without rows
+        self.assertEqual(
+            extractor.extract_schema(df), extractor.extract_schema(df.limit(0))
+        )
+        self.assertEqual(
+            Row(a=2.5, b="x", c=None),
+            extractor.transform_df(df).collect()[1]["Body"],
+        )
+
+    def test_08_corrupt_records(self):
+        """Bodies that do not fit the schema are kept in the corrupt record column."""
+        df = self.df_input.union(
+            Spark.get().createDataFrame([(b'{"b": "x"}',)], self.schema1)
+        )
+        rows = (
+            ExtractEncodedBodyUC(data_limit=2)
+            .transform_df(df, corrupt_record_column="corrupt")
+            .collect()
+        )
+        self.assertEqual([None, None, '{"b": "x"}'], [r["corrupt"] for r in rows])
+        self.assertIsNone(rows[2]["Body"])
+
+    def test_09_malformed_bodies_in_the_sample(self):
+        """Malformed bodies are left out of the sample, and not parsed."""
+        df = Spark.get().createDataFrame(
+            [(b'{"a":1}',), (b'{"b":"x"}',), (b"not json",), (b"[1, 2]",)],
+            self.schema1,
+        )
+        extractor = ExtractEncodedBodyUC(new_column_w_extracted_body="parsed")
+        rows = extractor.transform_df(df, corrupt_record_column="corrupt").collect()
+
+        self.assertEqual(["a", "b"], extractor.extract_schema(df)[0].dataType.names)
+        self.assertEqual(
+            [Row(a=1, b=None), Row(a=None, b="x"), None, None],
+            [r["parsed"] for r in rows],
+        )
+        self.assertEqual([None, None, "not json"], [r["corrupt"] for r in rows][:3])
+
+    def test_10_sample_bytes_are_capped(self):
+        """Only the bodies up to MAX_SAMPLE_BYTES go into the sample."""
+        df = Spark.get().createDataFrame(
+            [(b'{"a":1}',), (b'{"b":"x"}',), (b'{"c":true}',)], self.schema1
+        )
+        extractor = ExtractEncodedBodyUC()
+        extractor.MAX_SAMPLE_BYTES = 20
+        self.assertEqual(["a", "b"], extractor.extract_schema(df)[0].dataType.names)
+
+        # a single body is kept, however long it is
+        extractor = ExtractEncodedBodyUC()
+        extractor.MAX_SAMPLE_BYTES = 1
+        self.assertEqual(["a"], extractor.extract_schema(df)[0].dataType.names)
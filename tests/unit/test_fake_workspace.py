@@ -0,0 +1,67 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.FakeWorkspace import FakeWorkspace
+from spetlrtools.test_job.fetch import fetch
+from spetlrtools.test_job.submit import submit
+
+
+class FakeWorkspaceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._client = DbCli.w
+        self._cwd = os.getcwd()
+        self._tmpdir = TemporaryDirectory()
+        os.chdir(self._tmpdir.name)
+        for job in ["jobA", "jobB"]:
+            Path("tests", "cluster", job).mkdir(parents=True)
+            Path("tests", "cluster", job, "test_it.py").write_text("assert True\n")
+        Path("dist").mkdir()
+        Path("dist", "dummy.whl").write_bytes(b"Some data")
+
+    def tearDown(self) -> None:
+        DbCli.w = self._client
+        os.chdir(self._cwd)
+        self._tmpdir.cleanup()
+
+    def _submit_and_fetch(self, fake: FakeWorkspace, upload_to: str) -> int:
+        fake.connect()
+        with redirect_stdout(io.StringIO()):
+            submit(
+                test_path="tests",
+                cluster={"num_workers": 0},
+                wheels="dist/*.whl",
+                tasks_from=["tests/cluster"],
+                upload_to=upload_to,
+            )
+            return fetch(max(fake.runs), poll_interval=0.05)
+
+    def test_01_dbfs_round_trip(self):
+        with FakeWorkspace(task_duration=0.2) as fake:
+            self.assertEqual(0, self._submit_and_fetch(fake, "dbfs"))
+
+        uploaded = {Path(p).name for p in fake.dbfs}
+        self.assertEqual(
+            {"tests.archive", "main.py", "job.json", "dummy.whl"}, uploaded
+        )
+        (run,) = fake.runs.values()
+        self.assertEqual(
+            ["tests_cluster_jobA", "tests_cluster_jobB"],
+            sorted(task.task_key for task in run.tasks),
+        )
+        self.assertEqual(1, fake.calls["POST /api/jobs/runs/submit"])
+
+    def test_02_workspace_failing_task(self):
+        with FakeWorkspace(
+            task_duration=0.2, failing_tasks={"tests_cluster_jobA"}
+        ) as fake:
+            self.assertEqual(1, self._submit_and_fetch(fake, "workspace"))
+
+        self.assertIn(
+            f"/Workspace/Users/{fake.user_name}",
+            next(iter(fake.workspace)),
+        )
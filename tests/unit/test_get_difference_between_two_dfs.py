@@ -6,6 +6,7 @@ from spetlr.spark import Spark
 
 from spetlrtools.helpers.get_difference_between_two_dfs import (
     get_difference_between_two_dfs,
+    get_difference_summary,
 )
 
 
@@ -76,13 +77,19 @@ class DifferenceBetweenTwoDfsTest(unittest.TestCase):
         )
 
     def test_01b_all_match_can_print(self):
-        """There should be no difference between df1 compared with itself."""
-        self.assertEqual(
-            0,
-            get_difference_between_two_dfs(
-                self.df1, self.df1, join_cols=["col1"], print_result=True
-            ).count(),
+        """There should be no difference between df1 compared with itself.
+        The result is only kept persisted when asked to."""
+        result = get_difference_between_two_dfs(
+            self.df1, self.df1, join_cols=["col1"], print_result=True
+        )
+        self.assertEqual(0, result.count())
+        self.assertFalse(result.is_cached)
+
+        result = get_difference_between_two_dfs(
+            self.df1, self.df1, join_cols=["col1"], print_result=True, persist=True
         )
+        self.assertTrue(result.is_cached)
+        result.unpersist()
 
     def test_02_has_difference(self):
         """There should be difference between df1 and df2."""
@@ -122,3 +129,102 @@ class DifferenceBetweenTwoDfsTest(unittest.TestCase):
                 "Some of the columns in df2 is not in df1",
                 str(warning_list[1].message),
             )
+
+    schema5 = "id int, a string, b string, m map<string,int>, raw binary"
+    df5 = Spark.get().createDataFrame(
+        [
+            (1, None, "x", {"k": 1}, b"1"),
+            (2, "a||b", "c", None, None),
+            (3, "same", "same", {"k": 1}, b"1"),
+            (4, "gone", None, None, None),
+            (None, "null key", None, None, None),
+        ],
+        schema5,
+    )
+    df6 = Spark.get().createDataFrame(
+        [
+            (1, "", "x", {"k": 1}, b"1"),
+            (2, "a", "b||c", None, None),
+            (3, "same", "same", {"k": 1}, b"1"),
+            (5, "new", None, None, None),
+            (None, "null key", None, None, None),
+        ],
+        schema5,
+    )
+
+    def test_05_null_safe_and_full_outer(self):
+        df1, df2 = self.df5, self.df6
+        for hash_function, salted in [
+            ("xxhash64", False),
+            ("sha2", False),
+            ("xxhash64", True),
+        ]:
+            with self.subTest(hash_function=hash_function, salted=salted):
+                result = {
+                    row["id"]: row
+                    for row in get_difference_between_two_dfs(
+                        df1,
+                        df2,
+                        join_cols=["id"],
+                        hash_function=hash_function,
+                        salted=salted,
+                    ).collect()
+                }
+                self.assertEqual({1, 2, 4, 5}, set(result))
+                self.assertEqual("changed", result[1]["change_type"])
+                self.assertEqual("changed", result[2]["change_type"])
+                self.assertEqual("removed", result[4]["change_type"])
+                self.assertEqual("added", result[5]["change_type"])
+                self.assertEqual(
+                    [True, False, False, False],
+                    [result[1][f"{c}_differs"] for c in ["a", "b", "m", "raw"]],
+                )
+                self.assertEqual(
+                    [True, True, False, False],
+                    [result[2][f"{c}_differs"] for c in ["a", "b", "m", "raw"]],
+                )
+
+        with self.assertRaises(ValueError):
+            get_difference_between_two_dfs(df1, df2, ["id"], hash_function="md5")
+
+    def test_05b_salted_equals_unsalted(self):
+        """With unique join columns, salting does not change the result."""
+
+        def diff(salted: bool):
+            result = get_difference_between_two_dfs(
+                self.df5, self.df6, join_cols=["id"], salted=salted
+            ).drop("df1_m", "df2_m")
+            return sorted((tuple(row) for row in result.collect()), key=repr)
+
+        self.assertEqual(diff(salted=False), diff(salted=True))
+
+    def test_06_partition_filter_and_persist(self):
+        result = get_difference_between_two_dfs(
+            self.df5, self.df6, ["id"], partition_filter="id >= 3", persist=True
+        )
+        self.assertTrue(result.is_cached)
+        self.assertEqual(
+            [(4, "removed"), (5, "added")],
+            sorted(tuple(row) for row in result.select("id", "change_type").collect()),
+        )
+        result.unpersist()
+
+    def test_07_summary(self):
+        summary = get_difference_summary(self.df5, self.df6, ["id"], ignore_cols=["m"])
+        self.assertEqual(
+            (1, 1, 2), (summary["added"], summary["removed"], summary["changed"])
+        )
+        self.assertEqual(["a", "b", "raw"], list(summary["columns"]))
+        self.assertEqual(
+            {"mismatches": 2, "null_count_change": -1, "example_key": (1,)},
+            summary["columns"]["a"],
+        )
+        # 4 had a null b, 5 has one
+        self.assertEqual(
+            {"mismatches": 1, "null_count_change": 0, "example_key": (2,)},
+            summary["columns"]["b"],
+        )
+        self.assertEqual(
+            {"mismatches": 0, "null_count_change": 0, "example_key": None},
+            summary["columns"]["raw"],
+        )
@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from spetlrtools.test_job.impact import ImportGraph, affected_tasks, changed_files
+from spetlrtools.test_job.submit import NoAffectedTasks, resolve_tasks, submit
+
+FILES = {
+    "src/mypkg/__init__.py": "",
+    "src/mypkg/core.py": "VALUE = 1\n",
+    "src/mypkg/util.py": "from .core import VALUE\n",
+    "src/mypkg/other.py": "import json\n",
+    "src/mypkg/data/config.yml": "a: 1\n",
+    "tests/__init__.py": "",
+    "tests/cluster/__init__.py": "",
+    "tests/cluster/job1/__init__.py": "",
+    "tests/cluster/job1/test_core.py": "from mypkg.core import VALUE\n",
+    "tests/cluster/job2/__init__.py": "",
+    "tests/cluster/job2/test_util.py": "from mypkg import util\n",
+    "tests/cluster/job3/__init__.py": "",
+    "tests/cluster/job3/test_other.py": "import mypkg.other\n",
+    "tests/cluster/job3/test_helper.py": "from tests.shared import helper\n",
+    "tests/shared/__init__.py": "",
+    "tests/shared/helper.py": "",
+}
+
+ALL_TASKS = ["tests/cluster/job1", "tests/cluster/job2", "tests/cluster/job3"]
+
+
+class ImpactTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._cwd = os.getcwd()
+        self._tmpdir = TemporaryDirectory()
+        os.chdir(self._tmpdir.name)
+        for name, content in FILES.items():
+            Path(name).parent.mkdir(parents=True, exist_ok=True)
+            Path(name).write_text(content)
+
+    def tearDown(self) -> None:
+        os.chdir(self._cwd)
+        self._tmpdir.cleanup()
+
+    def affected(self, *changed: str):
+        return affected_tasks(ALL_TASKS, "tests", changed)
+
+    def test_01_import_graph(self):
+        graph = ImportGraph(["src", "tests"])
+        self.assertEqual({"mypkg", "mypkg.core"}, graph.imports["mypkg.util"])
+        self.assertEqual(
+            {"mypkg.core", "mypkg.util", "tests.cluster.job1.test_core"}
+            | {"tests.cluster.job2.test_util"},
+            graph.dependents(["mypkg.core"]) - {"mypkg"},
+        )
+
+    def test_02_affected_tasks(self):
+        self.assertEqual(ALL_TASKS[:2], self.affected("src/mypkg/core.py"))
+        self.assertEqual(ALL_TASKS[1:2], self.affected("src/mypkg/util.py"))
+        self.assertEqual(ALL_TASKS[2:], self.affected("tests/shared/helper.py"))
+        self.assertEqual(
+            ALL_TASKS[2:], self.affected("tests/cluster/job3/test_other.py")
+        )
+        # package data and package init files reach everything importing the package
+        self.assertEqual(ALL_TASKS, self.affected("src/mypkg/data/config.yml"))
+        self.assertEqual(ALL_TASKS, self.affected("src/mypkg/__init__.py"))
+        self.assertEqual(ALL_TASKS, self.affected("tests/conftest.py"))
+        self.assertEqual([], self.affected("README.md"))
+
+    def test_02b_deleted_modules(self):
+        Path("src/mypkg/core.py").unlink()
+        self.assertEqual(ALL_TASKS[:2], self.affected("src/mypkg/core.py"))
+
+        Path("tests/shared/helper.py").rename("tests/shared/helper2.py")
+        self.assertEqual(
+            ALL_TASKS[2:],
+            self.affected("tests/shared/helper.py", "tests/shared/helper2.py"),
+        )
+
+    def test_03_cache(self):
+        ImportGraph(["src"], cache_file="cache.json")
+        with open("cache.json") as f:
+            cache = json.load(f)
+        self.assertEqual(4, len(cache["files"]))
+
+        # a stale entry with a matching hash is trusted without parsing
+        for key, entry in cache["files"].items():
+            if key.startswith("mypkg.other:"):
+                entry["imports"] = ["mypkg.core"]
+        with open("cache.json", "w") as f:
+            json.dump(cache, f)
+
+        graph = ImportGraph(["src"], cache_file="cache.json")
+        self.assertEqual({"mypkg", "mypkg.core"}, graph.imports["mypkg.other"])
+
+        # a changed file is parsed again
+        Path("src/mypkg/other.py").write_text("x = 1\n")
+        graph = ImportGraph(["src"], cache_file="cache.json")
+        self.assertEqual(set(), graph.imports["mypkg.other"])
+
+    def test_04_git_range_and_submit(self):
+        def git(*args):
+            subprocess.run(["git", *args], check=True, capture_output=True)
+
+        git("init", "-q")
+        git("add", ".")
+        git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "one")
+        Path("src/mypkg/util.py").write_text("from .core import VALUE as V\n")
+        Path("docs.md").write_text("# docs\n")
+
+        # untracked files are not part of the diff
+        self.assertEqual([Path("src/mypkg/util.py")], changed_files("HEAD"))
+        self.assertEqual(
+            ALL_TASKS[1:2],
+            resolve_tasks("tests", tasks_from=["tests/cluster"], impact_range="HEAD"),
+        )
+
+        git("checkout", "--", "src")
+        with self.assertRaises(NoAffectedTasks):
+            resolve_tasks("tests", tasks_from=["tests/cluster"], impact_range="HEAD")
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            submit(
+                test_path="tests",
+                cluster={},
+                wheels="dist/*.whl",
+                tasks_from=["tests/cluster"],
+                impact_range="HEAD",
+            )
+        self.assertIn("No test tasks are affected", out.getvalue())
@@ -0,0 +1,99 @@
+import unittest
+
+from pyspark.sql.types import (
+    ArrayType,
+    IntegerType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+)
+
+from spetlrtools.format.naming import (
+    CAMEL_CASE,
+    PASCAL_CASE,
+    SNAKE_CASE,
+    NamingConvention,
+    NamingViolation,
+    split_words,
+    validate_names,
+)
+
+schema = StructType(
+    [
+        StructField("customerId", StringType()),
+        StructField(
+            "orders",
+            ArrayType(
+                StructType(
+                    [
+                        StructField("unitPrice", IntegerType()),
+                        StructField("Item_Name", StringType()),
+                    ]
+                )
+            ),
+        ),
+        StructField(
+            "tags",
+            MapType(StringType(), StructType([StructField("TAGValue", StringType())])),
+        ),
+    ]
+)
+
+
+class NamingTest(unittest.TestCase):
+    def test_01_conventions(self):
+        self.assertTrue(CAMEL_CASE.matches("camelCased2"))
+        self.assertFalse(CAMEL_CASE.matches("notCamelCAsed"))
+        self.assertFalse(CAMEL_CASE.matches("camel_cased"))
+        self.assertTrue(SNAKE_CASE.matches("snake_case_2"))
+        self.assertFalse(SNAKE_CASE.matches("Snake_case"))
+        self.assertTrue(PASCAL_CASE.matches("PascalCase"))
+        self.assertFalse(PASCAL_CASE.matches("pascalCase"))
+
+    def test_02_suggestions(self):
+        self.assertEqual(split_words("HTTPServer_id2"), ["HTTP", "Server", "id", "2"])
+        self.assertEqual(CAMEL_CASE.suggestion("HTTPServer_id"), "httpServerId")
+        self.assertEqual(SNAKE_CASE.suggestion("customerId"), "customer_id")
+        self.assertEqual(PASCAL_CASE.suggestion("customer id"), "CustomerId")
+
+    def test_03_nested(self):
+        report = validate_names(schema)
+        self.assertFalse(report.passed)
+        self.assertEqual(report.checked, 6)
+        self.assertEqual(
+            report.violations,
+            [
+                NamingViolation(
+                    "orders[].Item_Name", "Item_Name", "camelCase", "itemName"
+                ),
+                NamingViolation(
+                    "tags{value}.TAGValue", "TAGValue", "camelCase", "tagValue"
+                ),
+            ],
+        )
+
+    def test_04_top_level_only(self):
+        report = validate_names(schema, nested=False)
+        self.assertTrue(report.passed)
+        self.assertEqual(report.checked, 3)
+
+        report = validate_names(schema, SNAKE_CASE, cols_to_check=["customerId"])
+        self.assertEqual(
+            [(v.path, v.suggestion) for v in report.violations],
+            [("customerId", "customer_id")],
+        )
+
+        with self.assertRaises(ValueError):
+            validate_names(schema, cols_to_check=["missing"])
+
+    def test_05_custom_regex(self):
+        upper = NamingConvention.from_regex("UPPER", r"[A-Z_]+", str.upper)
+        report = validate_names(schema, upper, cols_to_check=["customerId"])
+        self.assertEqual(report.violations[0].suggestion, "CUSTOMERID")
+
+        no_suggest = NamingConvention.from_regex("prefixed", r"c_\w+")
+        report = validate_names(schema, no_suggest, nested=False)
+        self.assertEqual(len(report.violations), 3)
+        self.assertIsNone(report.violations[0].suggestion)
+        self.assertIn("customerId: not prefixed", report.format())
@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.FakeWorkspace import FakeWorkspace
+from spetlrtools.test_job.fetch import fetch
+from spetlrtools.test_job.ResultCache import ResultCache, task_fingerprint
+from spetlrtools.test_job.submit import skip_cached_tasks, submit
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._client = DbCli.w
+        self._cwd = os.getcwd()
+        self._tmpdir = TemporaryDirectory()
+        os.chdir(self._tmpdir.name)
+        for job in ["jobA", "jobB"]:
+            Path("tests", "cluster", job).mkdir(parents=True)
+            Path("tests", "cluster", job, "test_it.py").write_text("assert True\n")
+        Path("dist").mkdir()
+        Path("dist", "dummy.whl").write_bytes(b"Some data")
+
+    def tearDown(self) -> None:
+        DbCli.w = self._client
+        os.chdir(self._cwd)
+        self._tmpdir.cleanup()
+
+    def _run(self, fake: FakeWorkspace, cache: str, cluster: dict = None):
+        """Submit and fetch with the result cache. Returns the run info and the
+        output of fetch."""
+        out_json = io.StringIO()
+        out = io.StringIO()
+        with redirect_stdout(out):
+            submit(
+                test_path="tests",
+                cluster=cluster or {"num_workers": 0},
+                wheels="dist/*.whl",
+                tasks_from=["tests/cluster"],
+                out_json=out_json,
+                result_cache=cache,
+            )
+            run_info = json.loads(out_json.getvalue())
+            result = fetch(
+                run_info["run_id"],
+                stdout_file=io.StringIO(),
+                poll_interval=0.05,
+                cached_tasks=run_info["cached_tasks"],
+                result_cache=run_info["result_cache"],
+                fingerprints=run_info["fingerprints"],
+            )
+        self.assertEqual(0, result)
+        return run_info, out.getvalue()
+
+    def test_01_skip_passed_tasks(self):
+        with FakeWorkspace(task_duration=0.1) as fake:
+            fake.connect()
+
+            run_info, _ = self._run(fake, "cache.json")
+            self.assertEqual([], run_info["cached_tasks"])
+            self.assertEqual(2, len(ResultCache("cache.json").passed))
+
+            # identical inputs: nothing is submitted
+            runs = len(fake.runs)
+            run_info, out = self._run(fake, "cache.json")
+            self.assertIsNone(run_info["run_id"])
+            self.assertEqual(runs, len(fake.runs))
+            self.assertIn("Cached tasks", out)
+
+            # a changed task runs again, the other one is reported as cached
+            Path("tests", "cluster", "jobA", "test_it.py").write_text("x = 1\n")
+            run_info, out = self._run(fake, "cache.json")
+            self.assertEqual(["tests_cluster_jobB"], run_info["cached_tasks"])
+            self.assertEqual(["tests_cluster_jobA"], list(run_info["fingerprints"]))
+            self.assertIn("CACHED: 1", out)
+
+            # a changed cluster invalidates all tasks
+            run_info, _ = self._run(fake, "cache.json", cluster={"num_workers": 1})
+            self.assertEqual([], run_info["cached_tasks"])
+
+    def test_01b_fingerprint_covers_shared_files(self):
+        tasks = ["tests/cluster/jobA", "tests/cluster/jobB"]
+        Path("tests", "shared").mkdir()
+        Path("tests", "shared", "helper.py").write_text("X = 1\n")
+
+        def fingerprints():
+            return [task_fingerprint("tests", task, "shared") for task in tasks]
+
+        before = fingerprints()
+
+        # a shared helper affects all tasks
+        Path("tests", "shared", "helper.py").write_text("X = 2\n")
+        after = fingerprints()
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+        # the folder of another task only matters if the task imports from it
+        Path("tests", "cluster", "jobB", "test_it.py").write_text("assert 1\n")
+        self.assertEqual(after[0], fingerprints()[0])
+
+        for package in ["tests", "tests/cluster", "tests/cluster/jobB"]:
+            Path(package, "__init__.py").touch()
+        Path("tests", "cluster", "jobA", "test_it.py").write_text(
+            "from tests.cluster.jobB import test_it\n"
+        )
+        before = fingerprints()
+        Path("tests", "cluster", "jobB", "test_it.py").write_text("assert 2\n")
+        self.assertNotEqual(before[0], fingerprints()[0])
+
+    def test_01c_fingerprint_ignores_the_selection(self):
+        """A task has the same fingerprint in a full run and in a run of a subset."""
+
+        def fingerprints(tasks):
+            return skip_cached_tasks(
+                ResultCache("cache.json"),
+                "tests",
+                tasks,
+                cluster={},
+                wheels="dist/*.whl",
+                sparklibs=[],
+                main_source="",
+                pytest_args=[],
+            )[2]
+
+        full = fingerprints(["tests/cluster/jobA", "tests/cluster/jobB"])
+        subset = fingerprints(["tests/cluster/jobA"])
+        self.assertEqual(full["tests_cluster_jobA"], subset["tests_cluster_jobA"])
+
+    def test_02_failed_tasks_are_not_cached(self):
+        with FakeWorkspace(
+            task_duration=0.1, failing_tasks={"tests_cluster_jobA"}
+        ) as fake:
+            fake.connect()
+            out_json = io.StringIO()
+            with redirect_stdout(io.StringIO()):
+                submit(
+                    test_path="tests",
+                    cluster={"num_workers": 0},
+                    wheels="dist/*.whl",
+                    tasks_from=["tests/cluster"],
+                    out_json=out_json,
+                    result_cache="dbfs:/spetlr/cache.json",
+                )
+                run_info = json.loads(out_json.getvalue())
+                result = fetch(
+                    run_info["run_id"],
+                    stdout_file=io.StringIO(),
+                    poll_interval=0.05,
+                    result_cache=run_info["result_cache"],
+                    fingerprints=run_info["fingerprints"],
+                )
+            self.assertEqual(1, result)
+
+            passed = ResultCache("dbfs:/spetlr/cache.json").passed
+            self.assertEqual(
+                ["tests_cluster_jobB"], [p["task_key"] for p in passed.values()]
+            )
@@ -3,10 +3,10 @@ import os
 import unittest
 from contextlib import redirect_stdout
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from textwrap import dedent
 from unittest.mock import create_autospec
 
-import git
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.service import jobs
 
@@ -24,8 +24,6 @@ from spetlrtools.test_job.submit import (
     submit,
 )
 
-repoRoot = git.Repo(search_parent_directories=True).working_dir
-
 
 class JobSumitToolTest(unittest.TestCase):
     @classmethod
@@ -35,13 +33,19 @@ class JobSumitToolTest(unittest.TestCase):
 
         RemoteLocation.date = "<<right about now>>"
 
-        os.chdir(repoRoot)
+        # a test folder and a wheel file that will go into the test job
+        cls._cwd = os.getcwd()
+        cls._tmpdir = TemporaryDirectory()
+        os.chdir(cls._tmpdir.name)
+        Path("tests", "unit").mkdir(parents=True)
+        Path("tests", "unit", "test_it.py").write_text("assert True\n")
+        Path("dist").mkdir()
+        Path("dist", "dummy.whl").write_text("Some data")
 
-        # prepare a wheel file that will go into the test job
-        dist = Path(repoRoot) / "dist"
-        dist.mkdir(exist_ok=True)
-        with open(dist / "dummy.whl", "w") as f:
-            f.write("Some data")
+    @classmethod
+    def tearDownClass(cls) -> None:
+        os.chdir(cls._cwd)
+        cls._tmpdir.cleanup()
 
     def test_01_prepare_archive(self):
         with StageArea() as stage:
@@ -94,7 +98,9 @@ class JobSumitToolTest(unittest.TestCase):
             upload_to="dbfs",
         )
         args, kwargs = DbCli.w.jobs._api.do.call_args
-        body_arg = kwargs["body"]
+        body_arg = dict(kwargs["body"])
+        # a fresh token for each submission, so that retries cannot start a second run
+        self.assertTrue(body_arg.pop("idempotency_token"))
         self.assertEquals(
             body_arg,
             dict(
@@ -0,0 +1,355 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pyspark.sql.types as T
+from spetlr.spark import Spark
+
+from spetlrtools.testing import DataframeTestCase
+from spetlrtools.testing.arrow_collect import collect_as_tuples
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class DataframeTestCaseTests(DataframeTestCase):
+    schema = T.StructType(
+        [
+            T.StructField("id", T.IntegerType(), False),
+            T.StructField("name", T.StringType(), True),
+            T.StructField("ts", T.TimestampType(), True),
+            T.StructField(
+                "items",
+                T.ArrayType(T.StructType([T.StructField("n", T.IntegerType(), True)])),
+                True,
+            ),
+            T.StructField("tags", T.MapType(T.StringType(), T.IntegerType()), True),
+        ]
+    )
+
+    ts = datetime(2023, 1, 1, 12, 0, tzinfo=timezone.utc)
+    data = [
+        (1, "a", ts, [(1,), (2,)], {"x": 1, "y": 2}),
+        (2, None, None, None, None),
+        (3, "c", ts, [], {}),
+    ]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.df = Spark.get().createDataFrame(cls.data, cls.schema)
+
+    def test_01_spark_matches(self):
+        # other time zone, other row order
+        other_tz = timezone(timedelta(hours=2))
+        self.assertDataframeMatches(
+            self.df,
+            expected_data=[
+                (3, "c", self.ts, [], {}),
+                (1, "a", self.ts.astimezone(other_tz), [(1,), (2,)], {"y": 2, "x": 1}),
+                (2, None, None, None, None),
+            ],
+            method="spark",
+        )
+        self.assertDataframeMatches(
+            self.df,
+            columns=["name", "id"],
+            expected_data=[("a", 1), (None, 2), ("c", 3)],
+            assert_order=True,
+            method="spark",
+        )
+
+    def test_01b_spark_order_and_normalization(self):
+        """The row order is checked across partitions, and the expected values are
+        normalized like in the other methods."""
+        df = Spark.get().range(100).repartition(7).sortWithinPartitions("id")
+        ordered = [(r.id,) for r in df.collect()]
+        self.assertDataframeMatches(
+            df, expected_data=ordered, assert_order=True, method="spark"
+        )
+        with self.assertRaises(AssertionError):
+            self.assertDataframeMatches(
+                df, expected_data=sorted(ordered), assert_order=True, method="spark"
+            )
+
+        df = Spark.get().createDataFrame(
+            [(Decimal("1.10"),)],
+            T.StructType([T.StructField("d", T.DecimalType(5, 2))]),
+        )
+        for method in ["collect", "spark"]:
+            with self.subTest(method=method):
+                self.assertDataframeMatches(df, expected_data=[(1.1,)], method=method)
+
+    def test_02_spark_mismatch(self):
+        with self.assertRaises(AssertionError) as cm:
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id", "name"],
+                expected_data=[(1, "a"), (2, "b")] + [(i, "x") for i in range(10, 30)],
+                method="spark",
+                max_diff_rows=3,
+            )
+        message = str(cm.exception)
+        self.assertIn("21 expected rows are missing", message)
+        self.assertIn("Up to 3 of each", message)
+        self.assertEqual(3 + 2, message.count("\n    ("))
+        self.assertIn("2 rows were not expected", message)
+
+        with self.assertRaises(AssertionError):
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id"],
+                expected_data=[(2,), (1,), (3,)],
+                assert_order=True,
+                method="spark",
+            )
+
+        # duplicates count
+        with self.assertRaises(AssertionError):
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id"],
+                expected_data=[(1,), (2,), (3,), (3,)],
+                method="spark",
+            )
+
+        # values of the wrong type
+        with self.assertRaises(AssertionError):
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id"],
+                expected_data=[("1",), (2,), (3,)],
+                method="spark",
+            )
+
+    def test_03_collect_matches(self):
+        self.assertDataframeMatches(
+            self.df,
+            columns=["id", "name", "ts", "items"],
+            expected_data=[
+                (3, "c", self.ts, []),
+                (2, None, None, None),
+                (1, "a", self.ts, [(1,), (2,)]),
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            self.assertDataframeMatches(
+                self.df, expected_data=self.data, method="magic"
+            )
+
+    def test_04_arrow_matches(self):
+        other_tz = timezone(timedelta(hours=2))
+        # sorted in columnar form
+        self.assertDataframeMatches(
+            self.df,
+            columns=["id", "name", "ts"],
+            expected_data=[
+                (3, "c", self.ts.astimezone(other_tz)),
+                (2, None, None),
+                (1, "a", self.ts),
+            ],
+            method="arrow",
+        )
+        # nested columns are sorted in python
+        self.assertDataframeMatches(
+            self.df,
+            expected_data=[self.data[2], self.data[0], self.data[1]],
+            method="arrow",
+        )
+        with self.assertRaises(AssertionError):
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id", "name"],
+                expected_data=[(2, None), (1, "a"), (3, "c")],
+                assert_order=True,
+                method="arrow",
+            )
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_05_arrow_equals_collect(self):
+        df = self.df.union(self.df.withColumn("id", self.df.id + 10))
+        for assert_order in [False, True]:
+            self.assertEqual(
+                self._collectRows(df, df.columns, assert_order),
+                collect_as_tuples(df, sort=not assert_order),
+            )
+        self.assertEqual([], collect_as_tuples(self.df.filter("id < 0")))
+
+    def test_06_diff_message(self):
+        with self.assertRaises(AssertionError) as cm:
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id", "name"],
+                expected_data=[(1, "a"), (2, "b"), (4, "d")],
+                key_columns=["id"],
+            )
+        message = str(cm.exception)
+        self.assertIn("1 expected rows are missing:\n    (4, 'd')", message)
+        self.assertIn("1 rows were not expected:\n    (3, 'c')", message)
+        self.assertIn("at key (2,):\n        name: expected 'b', got None", message)
+
+        with self.assertRaises(AssertionError) as cm:
+            self.assertDataframeMatches(
+                self.df,
+                columns=["id"],
+                expected_data=[(1,), (3,), (2,)],
+                assert_order=True,
+            )
+        self.assertIn("First difference at row 1", str(cm.exception))
+
+    def test_07_nested_types(self):
+        schema = T.StructType(
+            [
+                T.StructField("amount", T.DecimalType(10, 2)),
+                T.StructField("raw", T.BinaryType()),
+                T.StructField(
+                    "info",
+                    T.StructType(
+                        [
+                            T.StructField("at", T.TimestampType()),
+                            T.StructField(
+                                "tags", T.MapType(T.StringType(), T.TimestampType())
+                            ),
+                        ]
+                    ),
+                ),
+                T.StructField("grid", T.ArrayType(T.ArrayType(T.TimestampType()))),
+            ]
+        )
+        df = Spark.get().createDataFrame(
+            [
+                (
+                    Decimal("1.25"),
+                    bytearray(b"a"),
+                    (self.ts, {"x": self.ts}),
+                    [[self.ts], []],
+                ),
+                (None, None, None, None),
+            ],
+            schema,
+        )
+        other = self.ts.astimezone(timezone(timedelta(hours=-3)))
+        for method in ["collect", "arrow"]:
+            with self.subTest(method=method):
+                self.assertDataframeMatches(
+                    df,
+                    expected_data=[
+                        (None, None, None, None),
+                        (
+                            1.25,
+                            b"a",
+                            {"at": other, "tags": {"x": other}},
+                            [[other], []],
+                        ),
+                    ],
+                    method=method,
+                )
+
+    def test_08_tolerances(self):
+        schema = T.StructType(
+            [
+                T.StructField("id", T.IntegerType()),
+                T.StructField("value", T.DoubleType()),
+                T.StructField("ts", T.TimestampType()),
+            ]
+        )
+        df = Spark.get().createDataFrame(
+            [(1, 1.0000001, self.ts), (2, 100.0, self.ts), (3, None, None)], schema
+        )
+        close = [
+            (1, 1.0, self.ts + timedelta(milliseconds=2)),
+            (2, 100.0001, self.ts),
+            (3, None, None),
+        ]
+        tolerances = dict(
+            rel_tol={"value": 1e-5}, timestamp_tol=timedelta(milliseconds=5)
+        )
+        for method, options in [
+            ("collect", {}),
+            ("arrow", {}),
+            ("collect", dict(assert_order=True)),
+            ("spark", dict(key_columns=["id"])),
+            ("spark", dict(assert_order=True)),
+        ]:
+            with self.subTest(method=method, **options):
+                self.assertDataframeMatches(
+                    df, expected_data=close, method=method, **options, **tolerances
+                )
+                with self.assertRaises(AssertionError):
+                    self.assertDataframeMatches(
+                        df, expected_data=close, method=method, **options
+                    )
+
+        with self.assertRaises(AssertionError) as cm:
+            self.assertDataframeMatches(
+                df,
+                expected_data=[(1, 1.1, self.ts), (2, 100.0, self.ts), (4, None, None)],
+                key_columns=["id"],
+                method="spark",
+                abs_tol=0.01,
+            )
+        message = str(cm.exception)
+        self.assertIn("1 expected rows are missing, 1 rows were not expected", message)
+        self.assertIn(
+            "at key (1,):\n        value: expected 1.1, got 1.0000001", message
+        )
+
+        with self.assertRaises(ValueError):
+            self.assertDataframeMatches(
+                df, expected_data=close, method="spark", abs_tol=0.01
+            )
+        with self.assertRaises(KeyError):
+            self.assertDataframeMatches(df, expected_data=close, abs_tol={"x": 0.01})
+
+    def test_08b_nested_tolerances(self):
+        """Tolerances apply inside arrays, maps and structs with every method."""
+        schema = T.StructType(
+            [
+                T.StructField("id", T.IntegerType()),
+                T.StructField("values", T.ArrayType(T.DoubleType())),
+                T.StructField("m", T.MapType(T.StringType(), T.DoubleType())),
+                T.StructField("s", T.StructType([T.StructField("x", T.DoubleType())])),
+            ]
+        )
+        df = Spark.get().createDataFrame(
+            [(1, [1.0, 2.0], {"k": 3.0}, (4.0,)), (2, None, None, None)], schema
+        )
+        close = [
+            (1, [1.0000001, 2.0], {"k": 3.0000001}, (4.0000001,)),
+            (2, None, None, None),
+        ]
+        far = [(1, [1.1, 2.0], {"k": 3.0}, (4.0,)), (2, None, None, None)]
+        for method, options in [
+            ("collect", {}),
+            ("arrow", {}),
+            ("spark", dict(key_columns=["id"])),
+            ("spark", dict(assert_order=True)),
+        ]:
+            with self.subTest(method=method, **options):
+                self.assertDataframeMatches(
+                    df, expected_data=close, method=method, rel_tol=1e-5, **options
+                )
+                with self.assertRaises(AssertionError):
+                    self.assertDataframeMatches(
+                        df, expected_data=far, method=method, rel_tol=1e-5, **options
+                    )
+
+    def test_09_schema(self):
+        other = T.StructType(
+            [
+                T.StructField(f.name, f.dataType, not f.nullable)
+                for f in self.schema.fields
+            ]
+        )
+        self.assertEqualSchema(self.schema, other)
+        with self.assertRaises(AssertionError) as cm:
+            self.assertEqualSchema(self.schema, other, compare_nullability=True)
+        self.assertIn(
+            "The schemas differ in 5 places:\n    id: nullable", str(cm.exception)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
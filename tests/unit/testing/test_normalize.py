@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pyspark.sql.types as T
+
+from spetlrtools.testing.normalize import compile_row_normalizer
+
+
+class NormalizeTests(unittest.TestCase):
+    schema = T.StructType(
+        [
+            T.StructField("ts", T.TimestampType()),
+            T.StructField("amount", T.DecimalType(10, 2)),
+            T.StructField("raw", T.BinaryType()),
+            T.StructField(
+                "nested",
+                T.StructType(
+                    [
+                        T.StructField("at", T.TimestampType()),
+                        T.StructField(
+                            "by_day",
+                            T.MapType(T.StringType(), T.ArrayType(T.DecimalType(5, 1))),
+                        ),
+                    ]
+                ),
+            ),
+            T.StructField("matrix", T.ArrayType(T.ArrayType(T.TimestampType()))),
+            T.StructField("name", T.StringType()),
+        ]
+    )
+
+    def test_01_nested_values(self):
+        normalize = compile_row_normalizer(self.schema)
+        ts = datetime(2023, 1, 1, 12, tzinfo=timezone.utc)
+        other = ts.astimezone(timezone(timedelta(hours=-5)))
+
+        expected = normalize(
+            (
+                other,
+                1.5,
+                b"ab",
+                {"at": other, "by_day": {"mon": (1, 2.5)}},
+                ((other,), ()),
+                "x",
+            )
+        )
+        actual = normalize(
+            (
+                ts,
+                Decimal("1.50"),
+                bytearray(b"ab"),
+                (ts, [("mon", [Decimal("1.0"), Decimal("2.5")])]),
+                [[ts], []],
+                "x",
+            )
+        )
+        self.assertEqual(expected, actual)
+        self.assertEqual(hash(expected[3][1]["mon"][1]), hash(actual[3][1]["mon"][1]))
+        self.assertIs(timezone.utc, actual[4][0][0].tzinfo)
+        self.assertIsInstance(actual[2], bytes)
+
+    def test_02_nulls_and_bad_rows(self):
+        normalize = compile_row_normalizer(self.schema)
+        self.assertEqual((None,) * 6, normalize([None] * 6))
+        # rows of the wrong width are left for the comparison to report
+        self.assertEqual((1, 2), normalize([1, 2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
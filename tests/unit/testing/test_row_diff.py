@@ -0,0 +1,49 @@
+import unittest
+
+from spetlrtools.testing.row_diff import diff_rows
+
+
+class RowDiffTests(unittest.TestCase):
+    columns = ["id", "name", "tags"]
+
+    def test_01_without_keys(self):
+        diff = diff_rows(
+            expected=[(1, "a", [1]), (1, "a", [1]), (2, "b", {"x": 1})],
+            actual=[(2, "b", {"x": 1}), (1, "a", [1]), (3, "c", None)],
+            columns=self.columns,
+        )
+        self.assertEqual([(1, "a", [1])], diff.missing)
+        self.assertEqual([(3, "c", None)], diff.unexpected)
+        self.assertEqual([], diff.changed)
+
+        self.assertFalse(diff_rows([(1, "a", [])], [(1, "a", [])], self.columns))
+
+    def test_02_with_keys(self):
+        diff = diff_rows(
+            expected=[(1, "a", [1]), (2, "b", None), (4, "d", None)],
+            actual=[(1, "a", [2]), (2, "B", None), (3, "c", None)],
+            columns=self.columns,
+            key_columns=["id"],
+        )
+        self.assertEqual([(4, "d", None)], diff.missing)
+        self.assertEqual([(3, "c", None)], diff.unexpected)
+        self.assertEqual([(1,), (2,)], [row.key for row in diff.changed])
+        self.assertEqual([[2], [1]], [row.changed for row in diff.changed])
+
+        message = diff.format(max_rows=1)
+        self.assertIn("2 rows differ:", message)
+        self.assertIn("tags: expected [1], got [2]", message)
+        self.assertIn("... and 1 more", message)
+        self.assertNotIn("name: expected", message)
+
+    def test_03_linear_time(self):
+        # this would take ages with difflib
+        expected = [(i, str(i), None) for i in range(100_000)]
+        actual = [(i, str(i) if i % 1000 else "x", None) for i in range(100_000)]
+        diff = diff_rows(expected, actual, self.columns, key_columns=["id"])
+        self.assertEqual(100, len(diff.changed))
+        self.assertLess(len(diff.format().splitlines()), 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
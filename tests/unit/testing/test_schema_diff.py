@@ -0,0 +1,91 @@
+import unittest
+
+import pyspark.sql.types as T
+
+from spetlrtools.testing.schema_diff import schema_differences
+
+
+class SchemaDiffTests(unittest.TestCase):
+    schema = T.StructType(
+        [
+            T.StructField("id", T.IntegerType(), False),
+            T.StructField(
+                "items",
+                T.ArrayType(
+                    T.StructType(
+                        [
+                            T.StructField("price", T.DecimalType(10, 2)),
+                            T.StructField(
+                                "grid", T.ArrayType(T.ArrayType(T.LongType()))
+                            ),
+                        ]
+                    )
+                ),
+            ),
+            T.StructField(
+                "tags",
+                T.MapType(
+                    T.StringType(), T.StructType([T.StructField("n", T.LongType())])
+                ),
+                metadata={"comment": "tags"},
+            ),
+        ]
+    )
+
+    def test_01_equal(self):
+        self.assertEqual([], schema_differences(self.schema, self.schema))
+
+    def test_02_nested_differences(self):
+        other = T.StructType(
+            [
+                T.StructField("name", T.StringType()),
+                T.StructField(
+                    "tags",
+                    T.MapType(
+                        T.StringType(),
+                        T.StructType([T.StructField("n", T.IntegerType())]),
+                        False,
+                    ),
+                ),
+                T.StructField(
+                    "items",
+                    T.ArrayType(
+                        T.StructType(
+                            [
+                                T.StructField("price", T.DecimalType(12, 2)),
+                                T.StructField(
+                                    "grid",
+                                    T.ArrayType(T.ArrayType(T.LongType(), False)),
+                                ),
+                            ]
+                        )
+                    ),
+                ),
+            ]
+        )
+        self.assertEqual(
+            [
+                "id: only in the first schema",
+                "name: only in the second schema",
+                "<root>: field order ['items', 'tags'] != ['tags', 'items']",
+                "items[].price: decimal(10,2) != decimal(12,2)",
+                "tags: metadata {'comment': 'tags'} != {}",
+                "tags{value}.n: bigint != int",
+            ],
+            schema_differences(self.schema, other),
+        )
+        differences = schema_differences(
+            self.schema,
+            other,
+            compare_nullability=True,
+            compare_metadata=False,
+            compare_field_order=False,
+        )
+        self.assertIn("items[].grid[]: containsNull True != False", differences)
+        self.assertIn("tags: valueContainsNull True != False", differences)
+        self.assertNotIn("tags: metadata {'comment': 'tags'} != {}", differences)
+        self.assertEqual(6, len(differences))
+
+
+if __name__ == "__main__":
+    unittest.main()
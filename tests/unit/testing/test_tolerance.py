@@ -0,0 +1,102 @@
+import math
+import unittest
+from datetime import datetime, timedelta
+
+import pyspark.sql.types as T
+
+from spetlrtools.testing.row_diff import diff_ordered_rows, diff_rows
+from spetlrtools.testing.tolerance import (
+    Tolerance,
+    column_tolerances,
+    compile_matcher,
+    compile_matchers,
+)
+
+
+class ToleranceTests(unittest.TestCase):
+    def test_01_floats(self):
+        match = compile_matcher(T.DoubleType(), Tolerance(rel_tol=1e-3))
+        self.assertTrue(match(1000.0, 1000.5))
+        self.assertFalse(match(1000.0, 1002.0))
+        self.assertTrue(match(None, None))
+        self.assertFalse(match(None, 0.0))
+        self.assertTrue(match(math.nan, math.nan))
+        self.assertFalse(match(math.nan, 0.0))
+
+        # equal values need no matcher
+        self.assertIsNone(compile_matcher(T.DoubleType(), Tolerance()))
+        self.assertIsNone(compile_matcher(T.StringType(), Tolerance(abs_tol=1.0)))
+
+    def test_02_nested(self):
+        t = datetime(2023, 1, 1)
+        data_type = T.StructType(
+            [
+                T.StructField("name", T.StringType()),
+                T.StructField("at", T.ArrayType(T.TimestampType())),
+                T.StructField("m", T.MapType(T.StringType(), T.FloatType())),
+            ]
+        )
+        match = compile_matcher(
+            data_type, Tolerance(abs_tol=0.1, timestamp_tol=timedelta(seconds=1))
+        )
+        a = ("x", [t, None], {"k": 1.0})
+        self.assertTrue(match(a, ("x", [t + timedelta(seconds=1), None], {"k": 1.05})))
+        self.assertFalse(match(a, ("y", [t, None], {"k": 1.0})))
+        self.assertFalse(match(a, ("x", [t], {"k": 1.0})))
+        self.assertFalse(match(a, ("x", [t, None], {"j": 1.0})))
+
+    def test_03_per_column(self):
+        tolerances = column_tolerances(
+            ["a", "b"], rel_tol=0.1, abs_tol={"b": 2.0}, timestamp_tol=None
+        )
+        self.assertEqual([Tolerance(0.1, 0.0), Tolerance(0.1, 2.0)], tolerances)
+        with self.assertRaises(KeyError):
+            column_tolerances(["a"], abs_tol={"c": 1.0})
+
+    def test_04_diff_within_tolerance(self):
+        columns = ["id", "value"]
+        schema = T.StructType(
+            [
+                T.StructField(c, t)
+                for c, t in zip(columns, [T.LongType(), T.DoubleType()])
+            ]
+        )
+        matchers = compile_matchers(schema, column_tolerances(columns, abs_tol=0.5))
+        expected = [(1, 1.0), (2, 2.0), (3, 3.0)]
+        actual = [(1, 1.2), (2, 9.0), (4, 4.0)]
+
+        diff = diff_rows(expected, actual, columns, matchers=matchers)
+        self.assertEqual([(2, 2.0), (3, 3.0)], diff.missing)
+        self.assertEqual([(2, 9.0), (4, 4.0)], diff.unexpected)
+
+        diff = diff_rows(expected, actual, columns, ["id"], matchers)
+        self.assertEqual([(2,)], [row.key for row in diff.changed])
+        self.assertEqual([(3, 3.0)], diff.missing)
+
+        diff = diff_ordered_rows(expected, actual[:2], columns, matchers)
+        self.assertEqual([1], [row.position for row in diff.changed])
+        self.assertEqual([(3, 3.0)], diff.missing)
+        self.assertIn("at row 1:\n        value: expected 2.0, got 9.0", diff.format())
+
+    def test_05_pairing_without_keys(self):
+        """Without keys, rows are paired by the columns without tolerance, not by
+        the sort order of the values within tolerance."""
+        columns = ["value", "name"]
+        schema = T.StructType(
+            [
+                T.StructField(c, t)
+                for c, t in zip(columns, [T.DoubleType(), T.StringType()])
+            ]
+        )
+        matchers = compile_matchers(schema, column_tolerances(columns, abs_tol=1e-3))
+        expected = [(1.0, "a"), (1.0000001, "b")]
+        actual = [(1.0000001, "a"), (1.0, "b")]
+        self.assertFalse(diff_rows(expected, actual, columns, matchers=matchers))
+
+        diff = diff_rows(expected, [(1.0, "a"), (1.0, "c")], columns, matchers=matchers)
+        self.assertEqual([(1.0000001, "b")], diff.missing)
+        self.assertEqual([(1.0, "c")], diff.unexpected)
+
+
+if __name__ == "__main__":
+    unittest.main()
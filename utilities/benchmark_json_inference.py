@@ -0,0 +1,67 @@
+"""
+Benchmark inferring the schema of a binary json body column, comparing the rdd
+round trip through python workers with spark.read.json on a Dataset[String],
+as done by ExtractEncodedBody.
+
+Example:
+    python utilities/benchmark_json_inference.py --rows 2000000
+"""
+
+import argparse
+import time
+
+import pyspark.sql.functions as f
+from spetlr.spark import Spark
+
+from spetlrtools.helpers.ExtractEncodedBody import ExtractEncodedBody
+
+
+def make_bodies(n: int):
+    spark = Spark.get()
+    body = f.to_json(
+        f.struct(
+            f.col("id").alias("id"),
+            f.concat(f.lit("name "), f.col("id")).alias("name"),
+            (f.col("id") % 7 == 0).alias("flag"),
+            (f.col("id") / 3).alias("amount"),
+            f.array(f.col("id"), f.col("id") + 1).alias("refs"),
+            f.struct(f.col("id").alias("x"), f.lit("y").alias("y")).alias("nested"),
+        )
+    )
+    return spark.range(n).select(body.cast("binary").alias("Body")).cache()
+
+
+def infer_using_rdd(df):
+    """The schema inferred from an rdd of the bodies, passing them through
+    python workers."""
+    strings = df.select(f.col("Body").cast("string").alias("value"))
+    return Spark.get().read.json(strings.rdd.map(lambda row: row.value)).schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark json schema inference.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Number of rows.")
+    args = parser.parse_args()
+
+    df = make_bodies(args.rows)
+    df.count()
+    extractor = ExtractEncodedBody()
+
+    results = {}
+    for name, infer in [
+        ("rdd", lambda: infer_using_rdd(df)),
+        ("jvm", lambda: extractor.extract_schema(df)),
+    ]:
+        start = time.perf_counter()
+        schema = infer()
+        results[name] = (time.perf_counter() - start, schema)
+
+    base_seconds, base_schema = results["rdd"]
+    print(f"{'inference':<15}{'seconds':>10}{'speedup':>10}")
+    for name, (seconds, schema) in results.items():
+        assert schema == base_schema, f"{name} infers a different schema"
+        print(f"{name:<15}{seconds:>10.3f}{base_seconds / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark spetlr-test-job submit and fetch against a local fake databricks backend.
+Reports the wall-clock time and the number of api calls of each phase, so that
+concurrency and polling settings can be compared without a live workspace.
+
+Example:
+    python utilities/benchmark_test_job.py --tasks 20 --latency 0.05 --task-duration 3
+"""
+
+import argparse
+import io
+import os
+import time
+from contextlib import nullcontext, redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from spetlrtools.test_job.dbcli import DbCli
+from spetlrtools.test_job.FakeWorkspace import FakeWorkspace
+from spetlrtools.test_job.fetch import fetch
+from spetlrtools.test_job.submit import submit
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark test job submit and fetch against a fake backend."
+    )
+    parser.add_argument("--tasks", type=int, default=10, help="Number of test tasks.")
+    parser.add_argument(
+        "--files-per-task", type=int, default=5, help="Test files in each task."
+    )
+    parser.add_argument("--wheels", type=int, default=2, help="Number of wheels.")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Seconds of latency per call."
+    )
+    parser.add_argument(
+        "--task-duration", type=float, default=2, help="Seconds each task runs."
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=1, help="Seconds between polls."
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=DbCli.pool_size, help="Http pool size."
+    )
+    parser.add_argument(
+        "--max-calls-per-second",
+        type=float,
+        default=DbCli.max_calls_per_second,
+        help="Client side rate limit. 0 disables.",
+    )
+    parser.add_argument(
+        "--throttle-every",
+        type=int,
+        default=0,
+        help="Let the fake backend answer every n-th call with 429.",
+    )
+    parser.add_argument("--upload-to", choices=["workspace", "dbfs"], default="dbfs")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the output of submit and fetch."
+    )
+    args = parser.parse_args()
+
+    DbCli.configure(
+        pool_size=args.pool_size,
+        max_calls_per_second=args.max_calls_per_second or None,
+        backoff_seconds=0.1,
+    )
+
+    cwd = os.getcwd()
+    with TemporaryDirectory() as tmpdir, FakeWorkspace(
+        latency=args.latency,
+        task_duration=args.task_duration,
+        throttle_every=args.throttle_every,
+    ) as fake:
+        os.chdir(tmpdir)
+        try:
+            make_test_project(args.tasks, args.files_per_task, args.wheels)
+            fake.connect()
+            results = run_benchmark(fake, args)
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'phase':<8}{'seconds':>10}{'api calls':>12}")
+    for phase, (seconds, calls) in results.items():
+        print(f"{phase:<8}{seconds:>10.2f}{calls:>12}")
+    print(DbCli.stats.summary())
+    print(f"Calls answered with 429 by the backend: {fake.throttled}")
+    print("Calls per endpoint:")
+    for endpoint, count in sorted(fake.calls.items()):
+        print(f"  {count:>6}  {endpoint}")
+
+
+def make_test_project(tasks: int, files_per_task: int, wheels: int):
+    """Create a tests folder with one subfolder per task and some dummy wheels."""
+    for i in range(tasks):
+        task_dir = Path("tests") / "cluster" / f"job{i}"
+        task_dir.mkdir(parents=True)
+        for j in range(files_per_task):
+            (task_dir / f"test_{j}.py").write_text(
+                f"def test_{j}():\n    assert True\n"
+            )
+
+    Path("dist").mkdir()
+    for i in range(wheels):
+        (Path("dist") / f"dummy{i}-0.0.1-py3-none-any.whl").write_bytes(
+            os.urandom(256 * 1024)
+        )
+
+
+def run_benchmark(fake: FakeWorkspace, args) -> dict:
+    out_json = io.StringIO()
+    log = None if args.verbose else io.StringIO()
+
+    results = {}
+    with redirect_stdout(log) if log else nullcontext():
+        calls = fake.total_calls
+        start = time.perf_counter()
+        submit(
+            test_path="tests",
+            cluster={"num_workers": 0},
+            wheels="dist/*.whl",
+            tasks_from=["tests/cluster"],
+            out_json=out_json,
+            upload_to=args.upload_to,
+        )
+        results["submit"] = (time.perf_counter() - start, fake.total_calls - calls)
+
+        run_id = max(fake.runs)
+        calls = fake.total_calls
+        start = time.perf_counter()
+        fetch(run_id, stdout_file=io.StringIO(), poll_interval=args.poll_interval)
+        results["fetch"] = (time.perf_counter() - start, fake.total_calls - calls)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark sorting rows that contain nulls and nested tuples, comparing
+TupleComparer with the null_safe_key sort key used by DataframeTestCase.
+
+Example:
+    python utilities/benchmark_tuple_sort.py --rows 100000
+"""
+
+import argparse
+import random
+import time
+
+from spetlrtools.testing.TupleComparer import TupleComparer, null_safe_key
+
+
+def make_rows(n: int, null_fraction: float, seed: int = 42):
+    rnd = random.Random(seed)
+
+    def maybe(value):
+        return None if rnd.random() < null_fraction else value
+
+    return [
+        (
+            maybe(rnd.randrange(100)),
+            maybe(rnd.choice("abcdefgh") * rnd.randrange(1, 4)),
+            maybe(rnd.random()),
+            maybe((maybe(rnd.randrange(10)), maybe(rnd.random() < 0.5))),
+        )
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark null safe row sorting.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of rows.")
+    parser.add_argument(
+        "--null-fraction", type=float, default=0.2, help="Fraction of null values."
+    )
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.null_fraction)
+
+    results = {}
+    for name, key in [
+        ("TupleComparer", TupleComparer),
+        ("null_safe_key", null_safe_key),
+    ]:
+        start = time.perf_counter()
+        result = sorted(rows, key=key)
+        results[name] = (time.perf_counter() - start, result)
+
+    base_seconds, base_result = results["TupleComparer"]
+    print(f"{'sort key':<15}{'seconds':>10}{'speedup':>10}")
+    for name, (seconds, result) in results.items():
+        assert result == base_result, f"{name} gives a different order"
+        print(f"{name:<15}{seconds:>10.3f}{base_seconds / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()